@@ -1,4 +1,10 @@
-from dash import Dash, html, dcc, callback, Output, Input, State, no_update
+import sys
+from component.Profiler import StartupProfiler
+
+# Time imports and initialisation with --profile-startup
+profiler = StartupProfiler(enabled = '--profile-startup' in sys.argv)
+
+from dash import Dash, html, dcc, callback, ctx, Output, Input, State, no_update, ClientsideFunction, Patch
 from component import Sidebar, Tabs, Modal
 from component.Filter import *
 from component.Chart import *
@@ -7,15 +13,24 @@ from component.Navigation import *
 from component.StyleDataLoader import *
 from component.FigureGrid import *
 from component.Sidebar import Popover
+from component.DataStore import DataStore, store
+from component.ScenarioCatalog import ScenarioCatalog, catalog
+from component.FigureCache import FigureCache, MemoryBackend, DiskBackend
+from component.Instrumentation import CallbackMetrics, stage
 import dash_bootstrap_components as dbc
 from pathlib import Path
+import os
 import pandas as pd
 import numpy as np
-import time
+import importlib.util
+import functools
+import logging
 
 # Get the absolute path of the parent directory containing the current script
 appdir = str(Path(__file__).parent.resolve())
 
+profiler.mark('imports')
+
 # Announce the app and make configuration
 # For more arguments: https://dash.plotly.com/reference
 app = Dash(__name__,
@@ -24,8 +39,14 @@ app = Dash(__name__,
            external_stylesheets = [dbc.themes.COSMO],
            suppress_callback_exceptions = True)
 
+profiler.mark('create app')
+
 # DEFINE LAYOUT
-app.layout = html.Div([
+# - created on the first request instead of at import (the sidebar, figure
+#   and local authority content is only loaded then), once per worker
+@functools.cache
+def serve_layout():
+    return html.Div([
                 Modal.Modal(),
                 html.Div([Navigation.HeadBar(),
                        Sidebar.sidebar(),
@@ -37,7 +58,177 @@ app.layout = html.Div([
                 Navigation.Footer(),]
                 )
 
+app.layout = serve_layout
+
+profiler.mark('define layout')
+
+# SERVE HEXMAP GEOMETRIES
+# - loaded once by the browser and shared by all map panels and figures
+Map.serve_geojson(app.server, '/hexmap.geojson',
+                  app.get_relative_path('/hexmap.geojson'))
+
+# DEFINE FIGURE CACHE
+# - shared by the workers on a machine if a cache directory is given,
+#   otherwise kept in memory for each worker process
+if os.environ.get('FIGURE_CACHE_DIR'):
+    figure_cache = FigureCache(DiskBackend(os.environ['FIGURE_CACHE_DIR']))
+else:
+    figure_cache = FigureCache(MemoryBackend())
+# - figures prerendered for the predefined scenarios (see data/prerender.py)
+prerender_dir = f'{appdir}/data/figures'
+if os.path.isdir(prerender_dir):
+    prerendered = FigureCache(DiskBackend(prerender_dir, max_bytes = None))
+else:
+    prerendered = None
+
+def figure_key(view, scenarios, scen_naming, *options):
+    # scenario labels are part of the figures, data version invalidates
+    # figures if data files change
+    return FigureCache.key(view, scenarios,
+                           [scen_naming.get(s) for s in scenarios],
+                           *options, store.version())
+
+def cached_figure(key, create, *args, progress = None):
+    # use cached or prerendered figures if available, progress (if given) is
+    # called with the percentage done before and after creating the figure
+    with stage('cache'):
+        value = figure_cache.get(key)
+        if value is None and prerendered is not None:
+            value = prerendered.get(key)
+            # prerendered figures are kept in memory for further requests
+            if value is not None:
+                if isinstance(figure_cache.backend, MemoryBackend):
+                    figure_cache.add(key, value)
+                return value
+    if value is None:
+        if progress is not None:
+            progress(10)
+        with stage('build'):
+            value = create(*args)
+        if progress is not None:
+            progress(90)
+        # return the cached dict, so the figure is not encoded again
+        with stage('serialize'):
+            value = figure_cache.set(key, value)
+    return value
+
+# DEFINE INSTRUMENTATION
+# - stage timings and payload sizes of the callbacks, served at /metrics
+#   and logged as JSON lines (set LOG_LEVEL=INFO), requests are profiled
+#   if CALLBACK_PROFILE is 'cprofile' or 'pyinstrument'
+logging.basicConfig(level = os.environ.get('LOG_LEVEL', 'WARNING').upper())
+metrics = CallbackMetrics.from_env(profile_dir = f'{appdir}/profiles')
+metrics.init_app(app.server, '/metrics')
+
+@metrics.collector
+def cache_metrics():
+    caches = [('figure', figure_cache)]
+    if prerendered is not None:
+        caches.append(('prerendered', prerendered))
+    stats = [(name, c.stats()) for name, c in caches]
+    return [('figure_cache_hits_total', 'counter', 'Figure cache hits.',
+             [({'cache': name}, s['hits']) for name, s in stats]),
+            ('figure_cache_misses_total', 'counter', 'Figure cache misses.',
+             [({'cache': name}, s['misses']) for name, s in stats]),
+            ('figure_cache_bytes', 'gauge', 'Size of the figure cache.',
+             [({'cache': name}, s['bytes']) for name, s in stats])]
+
+@metrics.collector
+def store_metrics():
+    memory = store.memory()
+    return [('datastore_bytes', 'gauge', 'Memory used by loaded datasets.',
+             [({'dataset': name}, m['bytes']) for name, m in memory.items()]),
+            ('datastore_saved_bytes', 'gauge',
+             'Memory saved by the dtypes of loaded datasets.',
+             [({'dataset': name}, m['saved']) for name, m in memory.items()])]
+
+# DEFINE BACKGROUND CALLBACKS
+# - heavy figures (maps with many panels, figures for many local
+#   authorities) are created by background callbacks in separate processes
+#   on a local job queue (diskcache) if diskcache, multiprocess and psutil
+#   are installed, unless BACKGROUND_CALLBACKS=off, so they do not block the
+#   web workers for short interactive callbacks
+# - results are cached in the job queue directory (shared by all workers)
+#   for the version of the data files, running jobs are cancelled if the
+#   inputs of the figure or the view change
+background_figures = ['heat_generation_map', 'hcost_maps', 'net-zero_map',
+                      'heat_gen_cost_local_comp', 'heat_inv_comp_loc']
+if (os.environ.get('BACKGROUND_CALLBACKS', 'on') != 'off' and
+    all(importlib.util.find_spec(m) is not None
+        for m in ['diskcache', 'multiprocess', 'psutil'])):
+    import diskcache
+    from dash import DiskcacheManager
+    background_manager = DiskcacheManager(
+        diskcache.Cache(os.environ.get('BACKGROUND_CACHE_DIR',
+                                       f'{appdir}/cache/jobs')),
+        cache_by = [store.version],
+        expire = int(os.environ.get('BACKGROUND_CACHE_EXPIRE', 24*3600)))
+else:
+    background_manager = None
+
+# - jobs are forked from the worker, so the datasets of the figures are
+#   loaded once by the worker instead of by every job: on the first
+#   background callback request of the worker or, with
+#   BACKGROUND_PRELOAD=on, at import (e.g., once in the master process of
+#   gunicorn --preload), the import is kept short otherwise
+background_datasets = (['plot_data_02', 'plot_data_05', 'plot_data_02n'] +
+                       [f'plot_data_04_loc_{s}' for s in ['net', 'dh', 'h2', 'build']] +
+                       [f'plot_data_{e}_{p}' for e in ['11', '12']
+                        for p in ['FL', 'TE', 'DE', 'SD']])
+background_preloaded = False
+
+def preload_background_data():
+    global background_preloaded
+    if not background_preloaded:
+        store.preload(background_datasets)
+        background_preloaded = True
+
+if background_manager is not None:
+    if os.environ.get('BACKGROUND_PRELOAD') == 'on':
+        preload_background_data()
+    else:
+        @app.server.before_request
+        def preload_before_background_callback():
+            from flask import request
+            if (background_preloaded or request.method != 'POST' or
+                not request.path.endswith('/_dash-update-component')):
+                return
+            output = (request.get_json(silent = True) or {}).get('output', '')
+            if any(f'{id}.' in output for id in background_figures):
+                preload_background_data()
+
+def background(id):
+    # True if figure `id` is created by a background callback
+    return background_manager is not None and id in background_figures
+
+def background_options(id):
+    # callback arguments to create figure `id` in the background
+    if not background(id):
+        return dict()
+    return dict(background = True,
+                manager = background_manager,
+                progress = Output(f'{id}_progress', 'value'),
+                running = [(Output(f'{id}_progress', 'style'),
+                            FigureGrid.progress_style(True),
+                            FigureGrid.progress_style(False))],
+                cancel = [Input('tabs', 'value'),
+                          Input('subtabs_1', 'value'),
+                          Input('subtabs_2', 'value')])
+
+def with_progress(id, func):
+    # background callbacks get the function to report progress as first
+    # argument, which is passed to func as keyword argument
+    if not background(id):
+        return func
+    @functools.wraps(func)
+    def wrapper(set_progress, *args):
+        return func(*args, progress = set_progress)
+    return wrapper
+
 # DEFINE OTHER PARAM
+# - year slider of the heat generation map changes the year in the browser
+#   (values of all years are sent with the figure) unless YEAR_SLIDER=server
+clientside_year_slider = os.environ.get('YEAR_SLIDER', 'client') != 'server'
 # - properties for heatcost dropdowns
 heatcost_options_prop = [
                 {'label': 'Flats',
@@ -78,8 +269,7 @@ def modal(n, is_open):
 )
 def update_levers(scenario):
     
-    levers = scenario.split('_')[:-1]
-    levers = {l.split('-')[0]:int(l.split('-')[1]) for l in levers}
+    levers = dict(zip(ScenarioCatalog.levers, catalog.lever_values(scenario)))
     return levers["nz"], levers["hp"], levers["dh"], levers["h2"], levers["lp"]
 
 # updating scenario dropdown style if levers are changed
@@ -94,8 +284,7 @@ def update_levers(scenario):
 )
 def update_dropdown(nz, hp, dh, h2, lp, scen):
     # if levers moved, grey out dropdown
-    scenario = f'nz-{nz}_hp-{hp:02d}_dh-{dh:02d}_lp-{lp:02d}_h2-{h2:02d}_UK|LA|SO'
-    if scenario != scen:
+    if catalog.lever_values(scen) != (nz, hp, dh, lp, h2):
         return {'background-color':'#d3d3d3'}
     
     return {'background-color':'#ffffff'}
@@ -120,15 +309,16 @@ def update_scenario_list(count, scens, ch_scens, nz, hp, dh, h2, lp, name):
     response = ''
     if name == '':
         name = 'Scenario '+ str(count)
-    exscen = [s['value'] for s in scens]
+    exscen = {catalog.lever_values(s['value']) for s in scens}
 
     if len(name) > 24:
         return no_update, no_update, no_update, no_update
 
-    newscen = f'nz-{nz}_hp-{hp:02d}_dh-{dh:02d}_lp-{lp:02d}_h2-{h2:02d}_UK|LA|SO'
+    levers = (nz, hp, dh, lp, h2)
+    newscen = ScenarioCatalog.name(levers)
     chosen_scens = list()
     scenario_names = [i['label']['props']['children'] for i in scens]
-    if  (newscen not in exscen) and (name not in scenario_names):    
+    if  (levers not in exscen) and (name not in scenario_names):    
         response = 'Scenario added to list.'
         scens.append({'label': html.Span(children=name,
                                          style={'color': '#808080',
@@ -141,7 +331,7 @@ def update_scenario_list(count, scens, ch_scens, nz, hp, dh, h2, lp, name):
             chosen_scens = ch_scens + [newscen]
         
     
-    elif newscen in exscen and count > 0:
+    elif levers in exscen and count > 0:
         response = 'Scenario already exists.' 
     
     elif name in scenario_names and count>0:
@@ -149,28 +339,22 @@ def update_scenario_list(count, scens, ch_scens, nz, hp, dh, h2, lp, name):
         
     return scens, chosen_scens, response, response
 
-# Validation message for name
-@callback(
+# Validation message for name (in the browser)
+app.clientside_callback(
+    ClientsideFunction(namespace = 'scenarios', function_name = 'validate_name'),
     Output('scenario_creation_response','children', allow_duplicate = True),
     Input('scenario_name_field', 'value'),
     prevent_initial_call = True
 )
-def update_response(name):
-    if len(name) > 24:
-        return "No more than 24 characters"
-
 
-# the scenario creation response fades out
-@callback(
+# the scenario creation response fades out (cleared by a timer in the
+# browser, so no worker waits for it)
+app.clientside_callback(
+    ClientsideFunction(namespace = 'scenarios', function_name = 'fade_response'),
     Output('scenario_creation_response','children', allow_duplicate = True),
     Input('response_store','data'),
     prevent_initial_call = True
 )
-def update_response(data):
-    if data != '':
-        time.sleep(0.5)
-    
-    return ''
 
 # update chosen scenarios if dropdown changed
 @callback(
@@ -205,84 +389,52 @@ def collapse_dropdown(click):
     return is_open
 
     
+def scenario_selection(scenarios, scen_options):
+    # selected scenarios (default scenario if cleared) and their labels
+    scen_naming = {s['value']:s['label']['props']['children'] for s in scen_options}
+    default = ['nz-2050_hp-00_dh-00_lp-00_h2-00_UK|LA|SO']
+    return (scenarios if scenarios else default), scen_naming
+
+def lad_selection(lads):
+    # selected local authorities (default Hartlepool if cleared)
+    if isinstance(lads, str):
+        lads = [lads]
+    return lads if lads else ['Hartlepool']
+
+# The grid of a view (titles, popovers, facets and empty graphs) is rendered
+# when the view changes, each figure is created by its own callback (see
+# below) depending only on its inputs, so figures are created independently
+# (in parallel by several workers) and shown as soon as they are ready
 @callback(
     Output('figure-area', 'children'),
-    Input('scenario_store','data'),
     Input('tabs', 'value'),
     Input('subtabs_1','value'),
     Input('subtabs_2','value'),
-    Input('local_auth_search','value'),
-    State('chosen_scenario_dropdown', 'options')
 )
-def update_graphs(scenarios, tab, subtab_1, subtab_2, lads, scen_options):
+@metrics.timed
+def update_graphs(tab, subtab_1, subtab_2):
+
+    glist = create_grid(tab, subtab_1, subtab_2)
+
+    return dbc.Container(glist,
+                         fluid = True,
+                         style = {'background':'white'})
+
+def create_grid(tab, subtab_1, subtab_2):
     # - Create popover for graph titles
     # -- Load tooltip data
-    with open(f'{appdir}/content/figures.json') as file:
-        content = json.load(file)
+    content = load_figure_content()
 
-    scen_naming = {s['value']:s['label']['props']['children'] for s in scen_options}
-    
-    # Default scenrio if cleared
-    default = ['nz-2050_hp-00_dh-00_lp-00_h2-00_UK|LA|SO']
-    scenarios = scenarios if len(scenarios) > 0 else default
-    
-    # Check lads value and set default Hartlepool
-    if isinstance(lads, str):
-        lads = [lads]
-    if lads == []:
-        lads = ['Hartlepool']
-  
-      
-    # Create graphs for the chosen tab
+    # Create grid for the chosen tab
     if tab == 'tab-1' and subtab_1 == 'subtab-1-1':
-        
-        df_gen = pd.read_csv(f'{appdir}/data/plot_data_01.csv')
-        df_cost = pd.read_csv(f'{appdir}/data/plot_data_03.csv')
-        df_inst = pd.read_csv(f'{appdir}/data/plot_data_09.csv')
-        df_gen_loc = pd.read_csv(f'{appdir}/data/plot_data_02.csv')
-        
-        year = 2050       
-
-        # Load the style data for the colormap
-        style_loader = ColorMapStyle()
-        cdm = style_loader.construct_cdm()
-        graph6 = Chart.ScenCompGenBarchart(
-                id = "heat_gen_cost_comp",
-                df_gen = df_gen,
-                df_cost = df_cost,
-                year = year,
-                scenarios = scenarios,
-                naming = scen_naming,
-                colormap = cdm)
-        
-        graph10 = Chart.GenericLinechart(
-                id = 'hp_installations',
-                df = df_inst,
-                x="YEAR",
-                y="VALUE",
-                category="RUN",
-                scenarios = scenarios,
-                naming=scen_naming,
-                x_label = "Year",
-                y_label = "Number of HPs installed per year (millions)",
-                l_label = "Scenarios"                            
-                )
-        graph2 = Map.GenericHexmap(
-                id = "heat_generation_map",
-                df = df_gen_loc,
-                zlabel = "Fraction<br>supplied by<br>technology (-)",
-                techs = ["Air-source HP", "District heating",
-                 "Electric resistance heater","Biomass boiler",
-                 "H2 boiler"],
-                year = 2050,
-                scenarios = scenarios,
-                naming=scen_naming,
-                range_color=[0,1])
-        
 
-        yslider = Filter.YearSlider(2025, 2055, 5, 'year_slider', 2050,
+        year = 2050
+
+        yslider = Filter.YearSlider(2025, 2055, 5, 'year_slider', year,
                                     tooltip = 'Year to be shown.',
                                     className = 'slider')
+        if clientside_year_slider:
+            yslider = [yslider, dcc.Store(id = 'heat_generation_years')]
 
         glist = FigureGrid.create([
             {'title':f"Heat generation in {year}",
@@ -291,7 +443,7 @@ def update_graphs(scenarios, tab, subtab_1, subtab_2, lads, scen_options):
                         'className':'popover_figure'
                         },
             'facet':None,
-            'graph':graph6,
+            'graph':FigureGrid.placeholder('heat_gen_cost_comp'),
             },
             {'title':f"Heat pump installations",
              'popover':{'id':'t1-1_hpinst_popover',
@@ -299,7 +451,7 @@ def update_graphs(scenarios, tab, subtab_1, subtab_2, lads, scen_options):
                         'className':'popover_figure'
                         },
             'facet':None,
-            'graph':graph10,
+            'graph':FigureGrid.placeholder('hp_installations'),
             },
             {'title':f"Heat generation across GB",
              'popover':{'id':'t1-1_genmap_popover',
@@ -307,98 +459,23 @@ def update_graphs(scenarios, tab, subtab_1, subtab_2, lads, scen_options):
                         'className':'popover_figure'
                         },
             'facet':html.Div(yslider),
-            'graph':graph2,
+            'graph':FigureGrid.placeholder('heat_generation_map',
+                                           progress = background('heat_generation_map'),
+                                           **map_graph),
             },
         ], columns_per_row = "2 1")
-        
-           
-    elif tab == 'tab-1' and subtab_1 == 'subtab-1-2':
-        
-        
-                            
-        files = ["plot_data_04_net.csv","plot_data_04_dh.csv",
-                 "plot_data_04_h2.csv","plot_data_04_build.csv"]
-        df_inv = [pd.read_csv(f'{appdir}/data/'+ f) for f in files]
-        df_cost = pd.read_csv(f'{appdir}/data/plot_data_03.csv')
-        
-        prop = "FL"
-        ty = "prop"
-        
-        if ty == "prop":
-            df_hcost = pd.read_csv(f'{appdir}/data/plot_data_11_'+prop+'.csv',
-                                   index_col=["RUN","REGION","YEAR"])
-            label = "Annual heating<br>cost per property<br>(norm.)"
-        elif ty == "heat":
-            df_hcost = pd.read_csv(f'{appdir}/data/plot_data_12_'+prop+'.csv',
-                                   index_col=["RUN","REGION","YEAR"])
-            label = "Annual heating<br>cost per heat<br>generated (norm.)"
 
-        
-        # normalize with GB average (except GB values)
-        df_hcost[~df_hcost.index.get_level_values("REGION")
-                 .str.startswith("GB")] = (df_hcost[~df_hcost
-                                                    .index.get_level_values("REGION")
-                                                    .str.startswith("GB")]
-                                                    /df_hcost.xs((scenarios[0],
-                                                                  "GB"),
-                                                                 level=(0,1)))
-        df_hcost_gb = df_hcost.xs("GB",level=1)
-        df_hcost_gb = df_hcost_gb/df_hcost_gb.xs((scenarios[0],2015),level=(0,1)).squeeze()
-        df_hcost_gb = df_hcost_gb[df_hcost_gb.index.get_level_values("YEAR")>=2025]
-        df_hcost_gb = df_hcost_gb.reset_index()
-        df_hcost = df_hcost.reset_index()
 
-                                            
-                                            
-                                                                                      
-        graph8 = Chart.ScenCompCostBarchart(
-                id = "heat_cost_comp",
-                df_cost = df_cost,
-                year = 2050,
-                scenarios = scenarios,
-                naming = scen_naming,
-                z_label = "Sector",
-                y_label = "Total system cost (billion GBP)")
-           
-        graph9 = Chart.ScenCompInvBarchart(
-                id = "heat_inv_comp",
-                df_inv = df_inv,
-                y_label= "Investments (billion GBP)",
-                scenarios = scenarios,
-                naming = scen_naming)
-        
-        # Create dropdowns for graph3
-        heatcost_prop_dropdown = Filter.Dropdown(heatcost_options_prop, 
+    elif tab == 'tab-1' and subtab_1 == 'subtab-1-2':
+
+        # Create dropdowns for heating cost figures
+        heatcost_prop_dropdown = Filter.Dropdown(heatcost_options_prop,
                                                  'heatcost_prop_dropdown',
                                                  className = 'heatcost_dropdowns')
-        heatcost_type_dropdown = Filter.Dropdown(heatcost_options_type, 
+        heatcost_type_dropdown = Filter.Dropdown(heatcost_options_type,
                                                  'heatcost_type_dropdown',
                                                  className = 'heatcost_dropdowns')
 
-        graph3 = Map.GenericHexmap(
-                id = "hcost_maps",
-                df = df_hcost,
-                year = 2050,
-                zlabel = label,
-                scenarios = scenarios,
-                naming=scen_naming,
-                range_color=[0.8,1.2],
-                textangle= len(scenarios) * 15)
-        
-        graph4 = Chart.GenericLinechart(
-                id = 'hcost_path',
-                df = df_hcost_gb,
-                x="YEAR",
-                y="VALUE",
-                category="RUN",
-                scenarios = scenarios,
-                naming=scen_naming,
-                y_range = [0,df_hcost_gb["VALUE"].max()+0.05],
-                x_label = "Year",
-                y_label = "Heating cost per property (normalized)",
-                l_label = "Scenarios"                            
-                )
-        
         glist = FigureGrid.create([
             {'title': "Total energy system cost in 2050",
              'popover':{'id':'t1-2_syscost_popover',
@@ -406,7 +483,7 @@ def update_graphs(scenarios, tab, subtab_1, subtab_2, lads, scen_options):
                         'className':'popover_figure'
                         },
             'facet':None,
-            'graph':graph8,
+            'graph':FigureGrid.placeholder('heat_cost_comp'),
             },
             {'title': "Average annual investment requirements",
              'popover':{'id':'t1-2_invreq_popover',
@@ -414,7 +491,7 @@ def update_graphs(scenarios, tab, subtab_1, subtab_2, lads, scen_options):
                         'className':'popover_figure'
                         },
             'facet':None,
-            'graph':graph9,
+            'graph':FigureGrid.placeholder('heat_inv_comp'),
             },
             {'title': "Heating system cost (normalized) [beta]",
              'popover':{'id':'t1-2_costmap_popover',
@@ -423,7 +500,9 @@ def update_graphs(scenarios, tab, subtab_1, subtab_2, lads, scen_options):
                         },
             'facet':html.Div([html.Div(heatcost_prop_dropdown),
                               html.Div(heatcost_type_dropdown)]),
-            'graph':graph3,
+            'graph':FigureGrid.placeholder('hcost_maps',
+                                           progress = background('hcost_maps'),
+                                           **map_graph),
             },
             {'title': "Heating system cost (normalized) [beta]",
              'popover':{'id':'t1-2_heatcost_popover',
@@ -431,41 +510,13 @@ def update_graphs(scenarios, tab, subtab_1, subtab_2, lads, scen_options):
                         'className':'popover_figure'
                         },
             'facet':None,
-            'graph':graph4,
+            'graph':FigureGrid.placeholder('hcost_path'),
             },
         ], columns_per_row = '2 1 1')
 
-                
+
     elif tab == 'tab-1' and subtab_1 == 'subtab-1-3':
-       
-        df_em = pd.read_csv(f'{appdir}/data/plot_data_10.csv')
-        df_em_loc = pd.read_csv(f'{appdir}/data/plot_data_05.csv')
-        
-        graph1 = Chart.GenericLinechart(
-                id = 'em_pathways',
-                df = df_em,
-                title=None,
-                x="YEAR",
-                y="VALUE",
-                category="RUN",
-                scenarios = scenarios,
-                naming=scen_naming,
-                x_label = "Year",
-                y_label = "CO2eq emissions (kt)",
-                l_label = "Scenarios"                            
-                )
-        
-        graph2 = Map.GenericHexmap(
-                id = "net-zero_map",
-                df = df_em_loc,
-                title = None,
-                zlabel = "Year of 100%<br> emission<br> reduction",
-                scenarios = scenarios,
-                naming=scen_naming,
-                range_color=[2025,2060])
-        
 
-        
         glist = FigureGrid.create([
             {'title': "Energy-related CO2 emissions",
              'popover':{'id':'t1-3empath_popover',
@@ -473,7 +524,7 @@ def update_graphs(scenarios, tab, subtab_1, subtab_2, lads, scen_options):
                         'className':'popover_figure'
                         },
             'facet':None,
-            'graph':graph1,
+            'graph':FigureGrid.placeholder('em_pathways'),
             },
             {'title': "First year of net-zero emissions",
              'popover':{'id':'t1-3_nymap_popover',
@@ -481,54 +532,19 @@ def update_graphs(scenarios, tab, subtab_1, subtab_2, lads, scen_options):
                         'className':'popover_figure'
                         },
             'facet':None,
-            'graph':graph2,
+            'graph':FigureGrid.placeholder('net-zero_map',
+                                           progress = background('net-zero_map'),
+                                           **map_graph),
             },
         ],
         columns_per_row = '1 1'
         )
 
-    
+
     elif tab == 'tab-2' and subtab_2 == 'subtab-2-1':
-        
-        df_inst_loc = pd.read_csv(f'{appdir}/data/plot_data_09l.csv')
-        df_gen_loc = pd.read_csv(f'{appdir}/data/plot_data_02n.csv')
-        
-        # convert to thousands
-        df_inst_loc["VALUE"] = df_inst_loc["VALUE"]*1000
-        
-        
-        # - Create popover for graph titles
+
         year = 2050
 
-        # Load the style data for the colormap
-        style_loader = ColorMapStyle()
-        cdm = style_loader.construct_cdm()
-        graph6 = Chart.ScenLocalCompGenBarchart(
-                id = "heat_gen_cost_local_comp",
-                title=None,
-                df_gen = df_gen_loc,
-                year = year,
-                lads = lads,
-                y_label='Fraction supplied by technology (-)',
-                scenarios = scenarios,
-                naming = scen_naming,
-                colormap = cdm)
-        
-        graph10 = Chart.GenericLinechart(
-                id = 'hp_installations_loc',
-                df = df_inst_loc,
-                title=None,
-                x="YEAR",
-                y="VALUE",
-                category="RUN",
-                scenarios = scenarios,
-                lads = lads,
-                naming=scen_naming,
-                x_label = "Year",
-                y_label = "Number of HPs installed per year (thousands)",
-                l_label = None                            
-                )
-        
         glist = FigureGrid.create([
             {'title': f"Heat generation in {year}",
              'popover':{'id':'t2-1_gencomp_popover',
@@ -536,7 +552,8 @@ def update_graphs(scenarios, tab, subtab_1, subtab_2, lads, scen_options):
                         'className':'popover_figure'
                         },
             'facet':None,
-            'graph':graph6,
+            'graph':FigureGrid.placeholder('heat_gen_cost_local_comp',
+                                           progress = background('heat_gen_cost_local_comp')),
             },
             {'title': "Heat pump installations",
              'popover':{'id':'t2-1_hpinst_popover',
@@ -544,7 +561,7 @@ def update_graphs(scenarios, tab, subtab_1, subtab_2, lads, scen_options):
                         'className':'popover_figure'
                         },
             'facet':None,
-            'graph':graph10,
+            'graph':FigureGrid.placeholder('hp_installations_loc'),
             },
         ],
         columns_per_row = '2'
@@ -552,39 +569,6 @@ def update_graphs(scenarios, tab, subtab_1, subtab_2, lads, scen_options):
 
     elif tab == 'tab-2' and subtab_2 == 'subtab-2-2':
 
-        files = ["plot_data_04_loc_net.csv","plot_data_04_loc_dh.csv",
-                 "plot_data_04_loc_h2.csv","plot_data_04_loc_build.csv"]
-        df_inv = [pd.read_csv(f'{appdir}/data/'+ f) for f in files]
-        df_hcost = pd.read_csv(f'{appdir}/data/plot_data_11n_FL.csv')
-        df_hcost = df_hcost.loc[df_hcost["YEAR"]>=2025,:]                                                                      
-        
-        graph1 = Chart.ScenCompInvBarchart(
-                id = "heat_inv_comp",
-                df_inv = df_inv,
-                title = None,
-                y_label= "Investment requirements (million GBP)",
-                scenarios = scenarios,
-                lads = lads,
-                naming = scen_naming)
-        
-                                            
-        graph2 = Chart.GenericLinechart(
-                id = 'hcost_path',
-                df = df_hcost,
-                title=None,
-                x="YEAR",
-                y="VALUE",
-                category="RUN",
-                scenarios = scenarios,
-                lads = lads,
-                naming=scen_naming,
-                y_range= [0, df_hcost.loc[df_hcost['RUN'].isin(scenarios) &
-                                     df_hcost['REGION'].isin(lads),"VALUE"].max()+20],
-                x_label = "Year",
-                y_label = "Annual heating system cost per property (GBP)",
-                l_label = None                           
-                )     
-     
         glist = FigureGrid.create([
             {'title': "Average annual investment requirements",
              'popover':{'id':'t2-2_invreq_popover',
@@ -592,7 +576,8 @@ def update_graphs(scenarios, tab, subtab_1, subtab_2, lads, scen_options):
                         'className':'popover_figure'
                         },
             'facet':None,
-            'graph':graph1,
+            'graph':FigureGrid.placeholder('heat_inv_comp_loc',
+                                           progress = background('heat_inv_comp_loc')),
             },
             {'title': "Heating system cost per property (flat) [beta]",
              'popover':{'id':'t2-2_heatcost_popover',
@@ -600,34 +585,14 @@ def update_graphs(scenarios, tab, subtab_1, subtab_2, lads, scen_options):
                         'className':'popover_figure'
                         },
             'facet':None,
-            'graph':graph2,
+            'graph':FigureGrid.placeholder('hcost_path_loc'),
             },
         ],
         columns_per_row = '2'
         )
-        
+
     elif tab == 'tab-2' and subtab_2 == 'subtab-2-3':
-        
-        # - Create popover for graph titles
-            
-        df_em = pd.read_csv(f'{appdir}/data/plot_data_10_loc.csv')
-        
-        graph1 = Chart.GenericLinechart(
-                id = 'em_pathways',
-                df = df_em,
-                title=None,
-                x="YEAR",
-                y="VALUE",
-                category="RUN",
-                scenarios = scenarios,
-                lads=lads,
-                naming=scen_naming,
-                x_label = "Year",
-                y_label = "CO2eq emissions (kt)",
-                l_label = "Scenarios"                            
-                )
-            
-  
+
         glist = FigureGrid.create([
             {'title': "Energy-related CO2 emissions",
              'popover':{'id':'t3-3_empath_popover',
@@ -635,14 +600,12 @@ def update_graphs(scenarios, tab, subtab_1, subtab_2, lads, scen_options):
                         'className':'popover_figure'
                         },
             'facet':None,
-            'graph':graph1,
+            'graph':FigureGrid.placeholder('em_pathways_loc'),
             },
         ],
         columns_per_row = '1'
         )
 
-
-        
     elif tab == 'tab-3':
         # filename="content/privacy_notice.txt"
         # with open("content/privacy_notice.txt","r") as f:
@@ -671,65 +634,379 @@ def update_graphs(scenarios, tab, subtab_1, subtab_2, lads, scen_options):
         )])]
 
 
-    return dbc.Container(glist,
-                         fluid = True,
-                         style = {'background':'white'})
+    return glist
 
-@callback(
-    Output('heat_generation_map', 'figure'),
-    Input('year_slider', 'value'),
-    State('scenario_store','data'), 
-    State('chosen_scenario_dropdown', 'options'),
-)
-def update_heat_gen_maps(year, scenarios, scen_options):
-    
-    scen_naming = {s['value']:s['label']['props']['children'] for s in scen_options}
-    df_gen_loc = pd.read_csv(f'{appdir}/data/plot_data_02.csv')
+# DEFINE FIGURES
+# - figures of the grids, created by create(scenarios, scen_naming, *options)
+#   with the options of the figure (e.g., local authorities or year), see
+#   figures below
+# - graph config and style of maps
+map_graph = {'config': {'scrollZoom':False, 'displaylogo':False},
+             'style': {'margin-top':'20px'}}
 
-    # Default scenrio if cleared
-    default = ['nz-2050_hp-00_dh-00_lp-00_h2-00_UK|LA|SO']
-    scenarios = scenarios if len(scenarios) > 0 else default
-    
-    fig = Map.GenericHexmap(
+gen_map_techs = ["Air-source HP", "District heating",
+                 "Electric resistance heater", "Biomass boiler", "H2 boiler"]
+
+def create_heat_gen_cost_comp(scenarios, scen_naming):
+
+    # Load the style data for the colormap
+    style_loader = ColorMapStyle()
+    cdm = style_loader.construct_cdm()
+
+    return Chart.ScenCompGenBarchart(
+            id = "heat_gen_cost_comp",
+            df_gen = store.indexed('plot_data_01'),
+            df_cost = store.indexed('plot_data_03'),
+            year = 2050,
+            scenarios = scenarios,
+            naming = scen_naming,
+            colormap = cdm,
+            figonly = True)
+
+def create_hp_installations(scenarios, scen_naming):
+
+    return Chart.GenericLinechart(
+            id = 'hp_installations',
+            df = store.indexed('plot_data_09'),
+            x="YEAR",
+            y="VALUE",
+            category="RUN",
+            scenarios = scenarios,
+            naming=scen_naming,
+            x_label = "Year",
+            y_label = "Number of HPs installed per year (millions)",
+            l_label = "Scenarios",
+            figonly = True)
+
+def create_heat_gen_map(scenarios, scen_naming, year):
+
+    return Map.GenericHexmap(
             id = "heat_generation_map",
-            df = df_gen_loc,
+            df = store.indexed('plot_data_02'),
             title = None,
             zlabel = "Fraction<br>supplied by<br>technology (-)",
-            techs = ["Air-source HP", "District heating",
-              "Electric resistance heater","Biomass boiler",
-              "H2 boiler"],
+            techs = gen_map_techs,
             year = year,
             scenarios = scenarios,
             naming=scen_naming,
             range_color=[0,1],
             figonly=True)
 
+def create_heat_gen_years(scenarios, scen_naming):
+    # values of all years of the heat generation map for the year slider in
+    # the browser
+    return Map.HexmapYearData(
+            df = store.indexed('plot_data_02'),
+            techs = gen_map_techs,
+            years = list(range(2025, 2056, 5)),
+            scenarios = scenarios,
+            naming = scen_naming)
+
+def create_heat_cost_comp(scenarios, scen_naming):
+
+    return Chart.ScenCompCostBarchart(
+            id = "heat_cost_comp",
+            df_cost = store.indexed('plot_data_03'),
+            year = 2050,
+            scenarios = scenarios,
+            naming = scen_naming,
+            z_label = "Sector",
+            y_label = "Total system cost (billion GBP)",
+            figonly = True)
+
+def create_heat_inv_comp(scenarios, scen_naming):
+
+    files = ["plot_data_04_net","plot_data_04_dh",
+             "plot_data_04_h2","plot_data_04_build"]
+
+    return Chart.ScenCompInvBarchart(
+            id = "heat_inv_comp",
+            df_inv = [store.indexed(f) for f in files],
+            y_label= "Investments (billion GBP)",
+            scenarios = scenarios,
+            naming = scen_naming,
+            figonly = True)
+
+def create_hcost_map(scenarios, scen_naming, prop, ty):
+
+    df_hcost, df_hcost_gb, label = heatcost_data(prop, ty, scenarios)
+
+    return Map.GenericHexmap(
+            id = "hcost_maps",
+            df = df_hcost,
+            year = 2050,
+            zlabel = label,
+            scenarios = scenarios,
+            naming=scen_naming,
+            range_color=[0.7,1.3],
+            textangle= len(scenarios) * 15,
+            figonly = True)
+
+def create_hcost_line(scenarios, scen_naming, prop, ty):
+
+    df_hcost, df_hcost_gb, label = heatcost_data(prop, ty, scenarios)
+
+    return Chart.GenericLinechart(
+            id = 'hcost_path',
+            df = df_hcost_gb,
+            x="YEAR",
+            y="VALUE",
+            category="RUN",
+            scenarios = scenarios,
+            naming=scen_naming,
+            y_range = [0,df_hcost_gb["VALUE"].max()+0.05],
+            x_label = "Year",
+            y_label = hcost_labels[ty],
+            l_label = "Scenarios",
+            figonly = True)
+
+def create_em_pathways(scenarios, scen_naming):
+
+    return Chart.GenericLinechart(
+            id = 'em_pathways',
+            df = store.indexed('plot_data_10'),
+            title=None,
+            x="YEAR",
+            y="VALUE",
+            category="RUN",
+            scenarios = scenarios,
+            naming=scen_naming,
+            x_label = "Year",
+            y_label = "CO2eq emissions (kt)",
+            l_label = "Scenarios",
+            figonly = True)
+
+def create_net_zero_map(scenarios, scen_naming):
+
+    return Map.GenericHexmap(
+            id = "net-zero_map",
+            df = store.indexed('plot_data_05'),
+            title = None,
+            zlabel = "Year of 100%<br> emission<br> reduction",
+            scenarios = scenarios,
+            naming=scen_naming,
+            range_color=[2025,2060],
+            figonly = True)
+
+def create_heat_gen_cost_local_comp(scenarios, scen_naming, lads):
+
+    # Load the style data for the colormap
+    style_loader = ColorMapStyle()
+    cdm = style_loader.construct_cdm()
+
+    return Chart.ScenLocalCompGenBarchart(
+            id = "heat_gen_cost_local_comp",
+            title=None,
+            df_gen = store.indexed('plot_data_02n'),
+            year = 2050,
+            lads = lads,
+            y_label='Fraction supplied by technology (-)',
+            scenarios = scenarios,
+            naming = scen_naming,
+            colormap = cdm,
+            figonly = True)
+
+def create_hp_installations_loc(scenarios, scen_naming, lads):
+
+    df_inst_loc = DataStore.select(store.indexed('plot_data_09l'),
+                                   RUN = scenarios, REGION = lads)
+
+    # convert to thousands
+    df_inst_loc["VALUE"] = df_inst_loc["VALUE"]*1000
+
+    return Chart.GenericLinechart(
+            id = 'hp_installations_loc',
+            df = df_inst_loc,
+            title=None,
+            x="YEAR",
+            y="VALUE",
+            category="RUN",
+            scenarios = scenarios,
+            lads = lads,
+            naming=scen_naming,
+            x_label = "Year",
+            y_label = "Number of HPs installed per year (thousands)",
+            l_label = None,
+            figonly = True)
+
+def create_heat_inv_comp_loc(scenarios, scen_naming, lads):
+
+    files = ["plot_data_04_loc_net","plot_data_04_loc_dh",
+             "plot_data_04_loc_h2","plot_data_04_loc_build"]
+
+    return Chart.ScenCompInvBarchart(
+            id = "heat_inv_comp_loc",
+            df_inv = [store.indexed(f) for f in files],
+            title = None,
+            y_label= "Investment requirements (million GBP)",
+            scenarios = scenarios,
+            lads = lads,
+            naming = scen_naming,
+            figonly = True)
+
+def create_hcost_path_loc(scenarios, scen_naming, lads):
+
+    df_hcost = DataStore.select(store.indexed('plot_data_11n_FL'),
+                                RUN = scenarios, REGION = lads,
+                                YEAR = slice(2025, None))
+
+    return Chart.GenericLinechart(
+            id = 'hcost_path_loc',
+            df = df_hcost,
+            title=None,
+            x="YEAR",
+            y="VALUE",
+            category="RUN",
+            scenarios = scenarios,
+            lads = lads,
+            naming=scen_naming,
+            y_range= [0, df_hcost["VALUE"].max()+20],
+            x_label = "Year",
+            y_label = "Annual heating system cost per property (GBP)",
+            l_label = None,
+            figonly = True)
+
+def create_em_pathways_loc(scenarios, scen_naming, lads):
+
+    return Chart.GenericLinechart(
+            id = 'em_pathways_loc',
+            df = store.indexed('plot_data_10_loc'),
+            title=None,
+            x="YEAR",
+            y="VALUE",
+            category="RUN",
+            scenarios = scenarios,
+            lads=lads,
+            naming=scen_naming,
+            x_label = "Year",
+            y_label = "CO2eq emissions (kt)",
+            l_label = "Scenarios",
+            figonly = True)
+
+# - figures (and figure data) by id
+figures = {'heat_gen_cost_comp': create_heat_gen_cost_comp,
+           'hp_installations': create_hp_installations,
+           'heat_generation_map': create_heat_gen_map,
+           'heat_generation_years': create_heat_gen_years,
+           'heat_cost_comp': create_heat_cost_comp,
+           'heat_inv_comp': create_heat_inv_comp,
+           'hcost_maps': create_hcost_map,
+           'hcost_path': create_hcost_line,
+           'em_pathways': create_em_pathways,
+           'net-zero_map': create_net_zero_map,
+           'heat_gen_cost_local_comp': create_heat_gen_cost_local_comp,
+           'hp_installations_loc': create_hp_installations_loc,
+           'heat_inv_comp_loc': create_heat_inv_comp_loc,
+           'hcost_path_loc': create_hcost_path_loc,
+           'em_pathways_loc': create_em_pathways_loc}
+
+# - figures of each view (tab and subtab) of the grid
+view_figures = {('tab-1', 'subtab-1-1'): ['heat_gen_cost_comp',
+                                          'hp_installations',
+                                          'heat_generation_map'],
+                ('tab-1', 'subtab-1-2'): ['heat_cost_comp', 'heat_inv_comp',
+                                          'hcost_maps', 'hcost_path'],
+                ('tab-1', 'subtab-1-3'): ['em_pathways', 'net-zero_map'],
+                ('tab-2', 'subtab-2-1'): ['heat_gen_cost_local_comp',
+                                          'hp_installations_loc'],
+                ('tab-2', 'subtab-2-2'): ['heat_inv_comp_loc',
+                                          'hcost_path_loc'],
+                ('tab-2', 'subtab-2-3'): ['em_pathways_loc']}
+
+def figure(id, scenarios, scen_naming, *options, progress = None):
+    # prerendered, cached or newly created figure `id`
+    return cached_figure(figure_key(id, scenarios, scen_naming, *options),
+                         figures[id], scenarios, scen_naming, *options,
+                         progress = progress)
+
+# DEFINE FIGURE CALLBACKS
+# - figures depending only on the selected scenarios (and local authorities)
+# - the id of the figure is passed as state to distinguish the (cached)
+#   background jobs of the figures
+def figure_callback(id, local = False):
+    inputs = [Input('scenario_store','data')]
+    if local:
+        inputs.append(Input('local_auth_search','value'))
+
+    def update_figure(scenarios, *args, progress = None):
+        scenarios, scen_naming = scenario_selection(scenarios, args[-2])
+        options = [lad_selection(args[0])] if local else []
+        return figure(args[-1], scenarios, scen_naming, *options,
+                      progress = progress)
+
+    callback(
+        Output(id, 'figure'),
+        *inputs,
+        State('chosen_scenario_dropdown', 'options'),
+        State(id, 'id'),
+        **background_options(id),
+    )(with_progress(id, metrics.timed(update_figure)))
+
+for id in ['heat_gen_cost_comp', 'hp_installations', 'heat_cost_comp',
+           'heat_inv_comp', 'em_pathways', 'net-zero_map']:
+    figure_callback(id)
+for id in ['heat_gen_cost_local_comp', 'hp_installations_loc',
+           'heat_inv_comp_loc', 'hcost_path_loc', 'em_pathways_loc']:
+    figure_callback(id, local = True)
+
+# - heat generation map for the year of the slider, if the year slider
+#   changes the year in the browser (values of all years are sent with the
+#   figure), the figure is only created for the year when the scenarios change
+def update_heat_gen_map(scenarios, year, scen_options, progress = None):
+
+    scenarios, scen_naming = scenario_selection(scenarios, scen_options)
+
+    fig = figure('heat_generation_map', scenarios, scen_naming, year,
+                 progress = progress)
+    if clientside_year_slider:
+        return fig, figure('heat_generation_years', scenarios, scen_naming)
     return fig
 
-@callback(
-    Output('hcost_maps', 'figure'),
-    Input('heatcost_prop_dropdown', 'value'),
-    Input('heatcost_type_dropdown', 'value'),
-    State('scenario_store','data'), 
-    State('chosen_scenario_dropdown', 'options'),
-)
-def update_heatcosts_maps(prop, ty, scenarios, scen_options):
-    
-    scen_naming = {s['value']:s['label']['props']['children'] for s in scen_options}
+if clientside_year_slider:
+    callback(
+        Output('heat_generation_map', 'figure'),
+        Output('heat_generation_years', 'data'),
+        Input('scenario_store','data'),
+        State('year_slider', 'value'),
+        State('chosen_scenario_dropdown', 'options'),
+        **background_options('heat_generation_map'),
+    )(with_progress('heat_generation_map',
+                    metrics.timed(update_heat_gen_map)))
+    app.clientside_callback(
+        ClientsideFunction(namespace = 'maps', function_name = 'set_year'),
+        Output('heat_generation_map', 'figure', allow_duplicate = True),
+        Input('year_slider', 'value'),
+        State('heat_generation_years', 'data'),
+        State('heat_generation_map', 'figure'),
+        prevent_initial_call = True,
+    )
+else:
+    callback(
+        Output('heat_generation_map', 'figure'),
+        Input('scenario_store','data'),
+        Input('year_slider', 'value'),
+        State('chosen_scenario_dropdown', 'options'),
+        **background_options('heat_generation_map'),
+    )(with_progress('heat_generation_map',
+                    metrics.timed(update_heat_gen_map)))
+
+hcost_labels = {"prop":"Heating cost per property (normalized)",
+                "heat":"Heating cost per heat generated (normalized)"}
+
+def heatcost_data(prop, ty, scenarios):
+    # heating cost of property type prop per property (ty "prop") or per
+    # heat generated (ty "heat"), normalized with GB average of the first
+    # scenario, and GB average normalized with its 2015 value
     if ty == "prop":
-        df_hcost = pd.read_csv(f'{appdir}/data/plot_data_11_'+prop+'.csv',
-                               index_col=["RUN","REGION","YEAR"])
+        df_hcost = DataStore.select(store.indexed('plot_data_11_'+prop),
+                                    RUN = scenarios).set_index(["RUN","REGION","YEAR"])
         label = "Annual heating<br>cost per property<br>(norm.)"
     elif ty == "heat":
-        df_hcost = pd.read_csv(f'{appdir}/data/plot_data_12_'+prop+'.csv',
-                               index_col=["RUN","REGION","YEAR"])
+        df_hcost = DataStore.select(store.indexed('plot_data_12_'+prop),
+                                    RUN = scenarios).set_index(["RUN","REGION","YEAR"])
         label = "Annual heating<br>cost per heat<br>generated (norm.)"
-        
-    # Default scenario if cleared
-    default = ['nz-2050_hp-00_dh-00_lp-00_h2-00_UK|LA|SO']
-    scenarios = scenarios if len(scenarios) > 0 else default
-    
-    
+
+
     # normalize with GB average (except GB values)
     df_hcost[~df_hcost.index.get_level_values("REGION")
              .str.startswith("GB")] = (df_hcost[~df_hcost
@@ -740,23 +1017,118 @@ def update_heatcosts_maps(prop, ty, scenarios, scen_options):
                                                              level=(0,1)))
     df_hcost_gb = df_hcost.xs("GB",level=1)
     df_hcost_gb = df_hcost_gb/df_hcost_gb.xs((scenarios[0],2015),level=(0,1)).squeeze()
+    df_hcost_gb = df_hcost_gb[df_hcost_gb.index.get_level_values("YEAR")>=2025]
     df_hcost_gb = df_hcost_gb.reset_index()
     df_hcost = df_hcost.reset_index()
-    
 
-    fig = Map.GenericHexmap(
-            id = "hcost_maps",
-            df = df_hcost,
-            title = None,
-            year = 2050,
-            zlabel = label,
-            scenarios = scenarios,
-            naming=scen_naming,
-            range_color=[0.7,1.3],
-            figonly=True)
+    return df_hcost, df_hcost_gb, label
+
+# - heating cost figures are created when the scenarios change, if only the
+#   property type or normalization changes, only the values are sent and
+#   patched into the figures
+def update_heatcosts_maps(scenarios, prop, ty, scen_options, progress = None):
+
+    scenarios, scen_naming = scenario_selection(scenarios, scen_options)
+
+    if ctx.triggered_id not in ('heatcost_prop_dropdown',
+                                'heatcost_type_dropdown'):
+        return figure('hcost_maps', scenarios, scen_naming, prop, ty,
+                      progress = progress)
+
+    values = cached_figure(figure_key('hcost_maps_values', scenarios,
+                                      scen_naming, prop, ty),
+                           create_hcost_maps, prop, ty, scenarios, scen_naming)
+
+    fig = Patch()
+    for i, trace in enumerate(values['traces']):
+        fig['data'][i]['locations'] = trace['locations']
+        fig['data'][i]['z'] = trace['z']
+    fig['layout']['coloraxis']['colorbar']['title']['text'] = values['label']
 
     return fig
 
+callback(
+    Output('hcost_maps', 'figure'),
+    Input('scenario_store','data'),
+    Input('heatcost_prop_dropdown', 'value'),
+    Input('heatcost_type_dropdown', 'value'),
+    State('chosen_scenario_dropdown', 'options'),
+    **background_options('hcost_maps'),
+)(with_progress('hcost_maps', metrics.timed(update_heatcosts_maps)))
+
+def create_hcost_maps(prop, ty, scenarios, scen_naming):
+
+    df_hcost, df_hcost_gb, label = heatcost_data(prop, ty, scenarios)
+
+    # traces in the order of the map panels (see Map.GenericHexmap)
+    df_hcost = DataStore.select(df_hcost, YEAR = 2050).replace(scen_naming)
+    traces = Map.HexmapTraces(df_hcost, [(None, scen_naming.get(s, s))
+                                         for s in scenarios])
+
+    return {'traces': [{'locations': t.locations, 'z': t.z} for t in traces],
+            'label': label}
+
+@callback(
+    Output('hcost_path', 'figure'),
+    Input('scenario_store','data'),
+    Input('heatcost_prop_dropdown', 'value'),
+    Input('heatcost_type_dropdown', 'value'),
+    State('chosen_scenario_dropdown', 'options'),
+)
+@metrics.timed
+def update_heatcost_path(scenarios, prop, ty, scen_options):
+
+    scenarios, scen_naming = scenario_selection(scenarios, scen_options)
+
+    if ctx.triggered_id not in ('heatcost_prop_dropdown',
+                                'heatcost_type_dropdown'):
+        return figure('hcost_path', scenarios, scen_naming, prop, ty)
+
+    values = cached_figure(figure_key('hcost_path_values', scenarios,
+                                      scen_naming, prop, ty),
+                           create_hcost_path, prop, ty, scenarios, scen_naming)
+
+    fig = Patch()
+    for i, trace in enumerate(values['traces']):
+        fig['data'][i]['x'] = trace['x']
+        fig['data'][i]['y'] = trace['y']
+    fig['layout']['yaxis']['range'] = values['y_range']
+    fig['layout']['yaxis']['title']['text'] = values['y_label']
+
+    return fig
+
+def create_hcost_path(prop, ty, scenarios, scen_naming):
+
+    df_hcost, df_hcost_gb, label = heatcost_data(prop, ty, scenarios)
+
+    # traces in the order of the lines (see Chart.GenericLinechart)
+    traces = [{'x': g["YEAR"].to_numpy(), 'y': g["VALUE"].to_numpy()}
+              for run, g in df_hcost_gb.groupby("RUN", sort = False)]
+
+    return {'traces': traces,
+            'y_range': [0, float(df_hcost_gb["VALUE"].max())+0.05],
+            'y_label': hcost_labels[ty]}
+
+
+profiler.mark('define callbacks')
+
+
+def profile_first_use():
+    # load data and create objects that are only created on first use
+    serve_layout()
+    profiler.mark('create layout')
+    hexmap()
+    profiler.mark('load hexmap')
+    store.version()
+    profiler.mark('hash data files')
+    import plotly.express, plotly.subplots
+    profiler.mark('import plotly')
+
 
 if __name__ == '__main__':
-    app.run_server(host='127.0.0.1', port='8050')
\ No newline at end of file
+    if profiler.enabled:
+        profile_first_use()
+        profiler.stop()
+        print(profiler.report())
+    else:
+        app.run_server(host='127.0.0.1', port='8050')
\ No newline at end of file
@@ -0,0 +1,44 @@
+// Clientside callbacks (see app.py)
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    maps: {
+        // Show the values of another year on a hexmap using the values of
+        // all years stored in the browser (see Map.HexmapYearData)
+        set_year: function(year, data, figure) {
+            if (!data || !figure || !data.z[String(year)]) {
+                return window.dash_clientside.no_update;
+            }
+            var z = data.z[String(year)];
+            return Object.assign({}, figure, {
+                data: figure.data.map(function(trace, i) {
+                    return Object.assign({}, trace, {
+                        locations: data.locations[i],
+                        z: z[i]
+                    });
+                })
+            });
+        }
+    },
+    scenarios: {
+        // Validation message for the name of a new scenario
+        validate_name: function(name) {
+            if (name && name.length > 24) {
+                return 'No more than 24 characters';
+            }
+            return null;
+        },
+        // Clear the scenario creation response after a delay, a new
+        // response restarts the delay
+        fade_response: function(data) {
+            var ns = window.dash_clientside.scenarios;
+            clearTimeout(ns._fade_timer);
+            if (!data) {
+                return '';
+            }
+            ns._fade_timer = setTimeout(function() {
+                window.dash_clientside.set_props('scenario_creation_response',
+                                                 {children: ''});
+            }, 500);
+            return window.dash_clientside.no_update;
+        }
+    }
+});
@@ -0,0 +1,320 @@
+"""
+Benchmarks for the chart and map builders
+
+Times the figure builders (Chart.ScenCompGenBarchart, ScenCompInvBarchart,
+GenericLinechart, Map.GenericHexmap) and the creation of all figures of each
+view of the dashboard (app.figures, i.e., without the figure cache) for
+the plot data in the data directory and for synthetic plot data of N
+scenarios and M local authorities. For each case, the following is reported:
+
+- cold: time of the first build with a new DataStore (incl. parsing data)
+- median, min: time of subsequent builds
+- peak: peak memory allocated during a build (tracemalloc)
+- json: size of the serialized figure (or figure grid)
+
+Results can be saved as JSON and compared with a baseline, the script exits
+with status 1 if a case is slower or larger than the baseline by more than
+the tolerance.
+
+Usage:
+
+    python benchmarks/bench_figures.py [--synthetic 30x350 ...] [--repeat 5]
+        [--output results.json] [--baseline baseline.json] [--tolerance 0.25]
+
+
+Copyright (C) 2024 Leonhard Hofbauer, Yueh-Chin Lin, licensed under a MIT license
+
+
+"""
+
+import sys
+import os
+import re
+import json
+import time
+import argparse
+import itertools
+import tempfile
+import tracemalloc
+import statistics
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+appdir = str(Path(__file__).parent.parent.resolve())
+sys.path.insert(0, appdir)
+
+import app
+from component.Chart import Chart
+from component.Map import Map
+from component.DataStore import DataStore
+from component.StyleDataLoader import ColorMapStyle
+from plotly.io.json import to_json_plotly
+
+
+# scenarios used by the builders for the base year and base cost
+base_scenarios = ['nz-2050_hp-00_dh-00_lp-00_h2-00_UK|LA|SO',
+                  'nz-2050_hp-00_dh-00_lp-00_h2-01_UK|LA|SO']
+
+gen_techs = ["Gas boiler", "Oil boiler", "Electric storage heater",
+             "Electric resistance heater", "Biomass boiler",
+             "District heating", "Air-source HP", "Ground-source HP",
+             "H2 boiler", "Building retrofit"]
+map_techs = ["Air-source HP", "District heating",
+             "Electric resistance heater", "Biomass boiler", "H2 boiler"]
+cost_cats = ["Energy supply", "Building retrofit", "Others",
+             "Building heat distribution", "Building heat technologies",
+             "District heating systems", "Gas and power networks"]
+inv_techs = ["DHMTTD", "ELGRTD", "ELGRTT", "GAGRTD", "H2GRTT", "NGGRTT"]
+years = [2015, 2022, 2023, 2025, 2030, 2035, 2040, 2045, 2050, 2055]
+inst_years = [2015, 2025, 2035, 2045, 2055]
+cost_years = list(range(2015, 2060))
+
+inv_files = ["plot_data_04_net", "plot_data_04_dh",
+             "plot_data_04_h2", "plot_data_04_build"]
+
+
+def scenario_names(n):
+    """Return n scenario names (lever combinations), base scenarios first."""
+    levers = itertools.product(range(2030, 2065, 5), *[range(2)]*4)
+    names = [f'nz-{nz}_hp-0{hp}_dh-0{dh}_lp-0{lp}_h2-0{h2}_UK|LA|SO'
+             for nz, hp, dh, lp, h2 in levers]
+    names = base_scenarios + [s for s in names if s not in base_scenarios]
+    if n > len(names):
+        raise ValueError(f"At most {len(names)} scenarios are supported.")
+    return names[:n]
+
+
+def schemas(runs, codes, names):
+    """Return the label columns (and their labels) of the plot datasets."""
+    s = {"plot_data_01": {"RUN":runs, "TECHNOLOGY":gen_techs, "YEAR":years},
+         "plot_data_02": {"RUN":runs, "REGION":codes, "TECHNOLOGY":gen_techs,
+                          "YEAR":years},
+         "plot_data_02n": {"RUN":runs, "REGION":names, "TECHNOLOGY":gen_techs,
+                           "YEAR":years},
+         "plot_data_03": {"RUN":runs, "TECHNOLOGY":cost_cats, "YEAR":years},
+         "plot_data_05": {"RUN":runs, "REGION":codes, "EMISSION":["CD"]},
+         "plot_data_09": {"RUN":runs, "TECHNOLOGY":["HP"], "YEAR":inst_years},
+         "plot_data_09l": {"REGION":names, "RUN":runs, "TECHNOLOGY":["HP"],
+                           "YEAR":inst_years},
+         "plot_data_10": {"RUN":runs, "EMISSION":["CD"], "YEAR":years},
+         "plot_data_10_loc": {"RUN":runs, "REGION":names, "EMISSION":["CD"],
+                              "YEAR":years}}
+    for f in inv_files:
+        s[f] = {"RUN":runs, "TECHNOLOGY":inv_techs}
+        s[f.replace("04_", "04_loc_")] = {"REGION":names, "RUN":runs,
+                                          "TECHNOLOGY":inv_techs}
+    for p in ["FL", "TE", "DE", "SD"]:
+        for e in ["11", "12"]:
+            s[f"plot_data_{e}_{p}"] = {"RUN":runs, "REGION":codes+["GB"],
+                                       "YEAR":cost_years}
+            s[f"plot_data_{e}n_{p}"] = {"RUN":runs, "REGION":names,
+                                        "YEAR":cost_years}
+    return s
+
+
+def synthetic_data(path, n_scenarios, n_regions, seed=0):
+    """Write synthetic plot data of n scenarios and regions to path."""
+    rng = np.random.default_rng(seed)
+    with open(f"{appdir}/data/uk-local-authority-districts-2023.hexjson") as f:
+        hexes = json.load(f)["hexes"]
+    if n_regions > len(hexes):
+        raise ValueError(f"At most {len(hexes)} regions are supported.")
+    codes = list(hexes)[:n_regions]
+    names = [hexes[c]["n"] for c in codes]
+    runs = scenario_names(n_scenarios)
+
+    for name, labels in schemas(runs, codes, names).items():
+        idx = pd.MultiIndex.from_product(labels.values(), names=list(labels))
+        df = pd.DataFrame({"VALUE":rng.random(len(idx))}, index=idx)
+        if name == "plot_data_02":
+            # fraction of heat generation
+            df = df/df.groupby(["RUN","REGION","YEAR"]).sum()
+        elif name == "plot_data_05":
+            # year net zero is reached
+            df["VALUE"] = rng.integers(2030, 2056, len(df))
+        df.reset_index().to_csv(f"{path}/{name}.csv", index=False)
+    return runs
+
+
+def cases(path, scenarios, naming, lads):
+    """Return the benchmark cases for the data in path.
+
+    Each case is a function that creates a figure with a new DataStore
+    (i.e., data is parsed again) if called with cold=True.
+    """
+    ds = dict()
+    def store(cold):
+        if cold or "store" not in ds:
+            ds["store"] = DataStore(path)
+        return ds["store"]
+
+    cdm = ColorMapStyle().construct_cdm()
+
+    c = {"ScenCompGenBarchart": lambda cold: Chart.ScenCompGenBarchart(
+            id = "heat_gen_cost_comp",
+            df_gen = store(cold).indexed("plot_data_01"),
+            df_cost = store(cold).indexed("plot_data_03"),
+            year = 2050,
+            scenarios = scenarios,
+            naming = naming,
+            colormap = cdm),
+         "ScenCompInvBarchart": lambda cold: Chart.ScenCompInvBarchart(
+            id = "heat_inv_comp",
+            df_inv = [store(cold).indexed(f) for f in inv_files],
+            y_label = "Investments (billion GBP)",
+            scenarios = scenarios,
+            naming = naming),
+         "GenericLinechart": lambda cold: Chart.GenericLinechart(
+            id = "hp_installations",
+            df = store(cold).indexed("plot_data_09"),
+            x = "YEAR",
+            y = "VALUE",
+            category = "RUN",
+            scenarios = scenarios,
+            naming = naming),
+         "GenericHexmap": lambda cold: Map.GenericHexmap(
+            id = "heat_generation_map",
+            df = store(cold).indexed("plot_data_02"),
+            techs = map_techs,
+            year = 2050,
+            scenarios = scenarios,
+            naming = naming,
+            range_color = [0,1])}
+
+    # options of the figures as set by default in the dashboard
+    options = {"heat_generation_map":(2050,),
+               "hcost_maps":("FL","prop"),
+               "hcost_path":("FL","prop")}
+    def view(tab, ids):
+        def create(cold):
+            # the figures use the store of the app module
+            app.store = store(cold)
+            return [app.figures[id](scenarios, naming,
+                                    *((lads,) if tab == "tab-2"
+                                      else options.get(id, ())))
+                    for id in ids]
+        return create
+    for (tab, subtab), ids in app.view_figures.items():
+        c[f"figures[{tab}/{subtab}]"] = view(tab, ids)
+    return c
+
+
+def measure(create, repeat):
+    """Return timings, peak memory and figure size of a case."""
+    start = time.perf_counter()
+    fig = create(True)
+    cold = time.perf_counter() - start
+
+    times = list()
+    for i in range(repeat):
+        start = time.perf_counter()
+        fig = create(False)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    create(False)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return {"cold_s":cold,
+            "median_s":statistics.median(times),
+            "min_s":min(times),
+            "peak_bytes":peak,
+            "json_bytes":len(to_json_plotly(fig))}
+
+
+def run(datasets, repeat, select, pattern=None):
+    """Run the benchmark cases for all datasets, returns dict of results."""
+    results = dict()
+    original = app.store
+    try:
+        for label, path, runs, lads in datasets:
+            scenarios = runs[:select]
+            naming = {s:f"Scenario {i}" for i, s in enumerate(runs)}
+            for name, create in cases(path, scenarios, naming, lads).items():
+                case = f"{label}/{name}"
+                if pattern and not re.search(pattern, case):
+                    continue
+                try:
+                    results[case] = measure(create, repeat)
+                except FileNotFoundError as e:
+                    print(f"{case:<50} skipped, data missing: {e.filename}")
+                    continue
+                r = results[case]
+                print(f"{case:<50}{1000*r['cold_s']:>9.1f}"
+                      f"{1000*r['median_s']:>9.1f}{1000*r['min_s']:>9.1f}"
+                      f"{r['peak_bytes']/2**20:>9.2f}{r['json_bytes']/2**10:>10.1f}")
+    finally:
+        app.store = original
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print cases slower or larger than the baseline, return their number."""
+    regressions = 0
+    for case, r in results.items():
+        b = baseline.get(case)
+        if b is None:
+            continue
+        for metric in ["median_s", "peak_bytes", "json_bytes"]:
+            if b[metric] and r[metric] > b[metric] * (1 + tolerance):
+                regressions += 1
+                print(f"REGRESSION {case} {metric}: {b[metric]:.4g} -> "
+                      f"{r[metric]:.4g} ({r[metric]/b[metric]-1:+.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark figure builders.")
+    parser.add_argument("--synthetic", action="append", default=None,
+                        metavar="NxM",
+                        help="synthetic data of N scenarios and M regions "
+                             "(default: 30x350, can be repeated)")
+    parser.add_argument("--no-shipped", action="store_true",
+                        help="skip the plot data in the data directory")
+    parser.add_argument("--select", type=int, default=3,
+                        help="number of selected scenarios (default: 3)")
+    parser.add_argument("--repeat", type=int, default=5,
+                        help="number of timed builds per case (default: 5)")
+    parser.add_argument("--cases", default=None,
+                        help="regular expression selecting cases")
+    parser.add_argument("--output", default=None,
+                        help="save results as JSON")
+    parser.add_argument("--baseline", default=None,
+                        help="JSON results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative increase (default: 0.25)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        datasets = list()
+        if not args.no_shipped:
+            runs = list(pd.read_csv(f"{appdir}/data/plot_data_01.csv",
+                                    usecols=["RUN"])["RUN"].unique())
+            runs = base_scenarios + [r for r in runs if r not in base_scenarios]
+            datasets.append(("shipped", f"{appdir}/data", runs, ["Hartlepool"]))
+        for size in args.synthetic or ["30x350"]:
+            n, m = (int(v) for v in size.lower().split("x"))
+            path = os.path.join(tmp, size)
+            os.makedirs(path)
+            runs = synthetic_data(path, n, m)
+            datasets.append((f"synthetic-{size}", path, runs, ["Hartlepool"]))
+
+        print(f"{'case':<50}{'cold ms':>9}{'med ms':>9}{'min ms':>9}"
+              f"{'peak MB':>9}{'json KB':>10}")
+        results = run(datasets, args.repeat, args.select, args.cases)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
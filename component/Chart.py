@@ -1,9 +1,9 @@
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 from dash import html, dcc
 import json
+from component.DataStore import DataStore
+# plotly.express, plotly.graph_objects and plotly.subplots are imported
+# within the functions on first use to reduce the startup time of the app
 # Check Color Scheme https://plotly.com/python/discrete-color/
 
 class Chart:
@@ -11,6 +11,7 @@ class Chart:
     def LongFormBarchart(id, path, x, y, category,
                         x_label = None, y_label = None, 
                         scenario = None, sex = None, title = None):
+        import plotly.express as px
         raw_df = pd.read_csv(path)
         df = raw_df[raw_df['RUN'] == scenario] if scenario else raw_df
         fig = px.bar(df, x = x, y = y,  
@@ -31,7 +32,9 @@ class Chart:
     @staticmethod
     def ScenCompInvBarchart(id, df_inv, naming, title = None,
                         x_label = None, y_label = None, z_label = None,
-                        scenarios = None, lads = None):
+                        scenarios = None, lads = None, figonly = False):
+        import plotly.express as px
+        from plotly.subplots import make_subplots
         
         gobj = list()
         titles = ["Power and gas networks","District heating systems",
@@ -39,10 +42,9 @@ class Chart:
         ymax = 0
         for df in df_inv:
             
-            df = df[df['RUN'].isin(scenarios)]
+            df = DataStore.select(df, RUN=scenarios, REGION=lads)
             df = df.replace(naming)
             if lads:
-                df = df[df['REGION'].isin(lads)]
                 df["RUN"] = df["RUN"] + "<br>" + df["REGION"]
                 
             df = df.groupby("RUN",as_index=False).sum() 
@@ -84,6 +86,9 @@ class Chart:
                         xaxis_title=None,
                         title=title)
         
+        if figonly:
+            return fig
+
         return html.Div(
             dcc.Graph(id = id, 
                     figure = fig,
@@ -92,19 +97,20 @@ class Chart:
 
     @staticmethod
     def ScenCompCostBarchart(id, df_cost, year, scenarios, naming, title = None,
-                            x_label = None, y_label = None, z_label = None):
+                            x_label = None, y_label = None, z_label = None,
+                            figonly = False):
+        import plotly.express as px
         
         # due to the allocation of cost over years, it is important what
         # scenario is chosen here (e.g., with regard to gas grid cost increasing
         # cost in early years in scenarios with emission target)
         # using a scenario without emission target might be the best (?)
 
-        by = df_cost.loc[(df_cost["YEAR"]==2015)&
-                         (df_cost["RUN"]=="nz-2050_hp-00_dh-00_lp-00_h2-00_UK|LA|SO")]
+        by = DataStore.select(df_cost, YEAR=2015,
+                              RUN="nz-2050_hp-00_dh-00_lp-00_h2-00_UK|LA|SO")
         by.loc[:,"RUN"] = "Base year"
         df_cost = pd.concat([by,
-                            df_cost.loc[(df_cost["YEAR"]==year)]])
-        df_cost = df_cost[df_cost['RUN'].isin(scenarios+["Base year"])]
+                            DataStore.select(df_cost, YEAR=year, RUN=scenarios)])
         df_cost = df_cost.drop("YEAR", axis=1)
         
         df_cost = df_cost.replace(naming)       
@@ -127,6 +133,9 @@ class Chart:
                         )
         fig.update_xaxes(tickangle=45)
 
+        if figonly:
+            return fig
+
         return html.Div(
             dcc.Graph(id = id, 
                     figure = fig,
@@ -138,16 +147,17 @@ class Chart:
     def ScenCompGenBarchart(id, df_gen, df_cost, year, naming,
                             x_label = None, y_label = None, 
                             scenarios = None, colormap = None, title = None,
-                            ):
+                            figonly = False):
+        import plotly.express as px
+        import plotly.graph_objects as go
 
-        by = df_gen.loc[(df_gen["YEAR"]==2015)&
-                        (df_gen["RUN"]=="nz-2050_hp-00_dh-00_lp-00_h2-01_UK|LA|SO")]
+        by = DataStore.select(df_gen, YEAR=2015,
+                              RUN="nz-2050_hp-00_dh-00_lp-00_h2-01_UK|LA|SO")
         by.loc[:,"RUN"] = "Base year"
         
         df_gen = pd.concat([by,
-                            df_gen.loc[(df_gen["YEAR"]==year)]])
+                            DataStore.select(df_gen, YEAR=year, RUN=scenarios)])
 
-        df_gen = df_gen[df_gen['RUN'].isin(scenarios+["Base year"])]
         df_gen = df_gen.drop("YEAR", axis=1)
         
         df_gen = df_gen.replace(naming)
@@ -161,6 +171,8 @@ class Chart:
             line_color="black"
             )
         
+        df_cost = DataStore.select(df_cost, RUN=scenarios+
+                                   ["nz-2050_hp-00_dh-00_lp-00_h2-00_UK|LA|SO"])
         df_cost = df_cost.drop("TECHNOLOGY",axis=1).groupby(["RUN","YEAR"]).sum()
 
         # due to the allocation of cost over years, it is important what
@@ -248,6 +260,9 @@ class Chart:
         fig.update_xaxes(tickangle=45)     
 
         
+        if figonly:
+            return fig
+
         return html.Div(
             dcc.Graph(id = id, 
                     figure = fig,
@@ -257,19 +272,17 @@ class Chart:
     @staticmethod
     def ScenLocalCompGenBarchart(id, df_gen, lads, year, naming,
                             x_label = None, y_label = None, 
-                            scenarios = None, colormap = None, title = None
-                            ):
+                            scenarios = None, colormap = None, title = None,
+                            figonly = False):
+        import plotly.express as px
 
-        by = df_gen.loc[(df_gen["YEAR"]==2015)&
-                        (df_gen["RUN"]=="nz-2050_hp-00_dh-00_lp-00_h2-00_UK|LA|SO")&
-                        (df_gen["REGION"].isin(lads))]
+        by = DataStore.select(df_gen, YEAR=2015, REGION=lads,
+                              RUN="nz-2050_hp-00_dh-00_lp-00_h2-00_UK|LA|SO")
         by.loc[:,"RUN"] = "Base year"
         
         df_gen = pd.concat([by,
-                            df_gen.loc[(df_gen["YEAR"]==year)]])
-        
-        df_gen = df_gen[df_gen['RUN'].isin(scenarios+["Base year"])]
-        df_gen = df_gen[df_gen['REGION'].isin(lads)]
+                            DataStore.select(df_gen, YEAR=year, REGION=lads,
+                                             RUN=scenarios)])
 
         df_gen = df_gen.drop("YEAR", axis=1)
         
@@ -292,6 +305,9 @@ class Chart:
         fig.update_yaxes(title_text = y_label)
 
                         
+        if figonly:
+            return fig
+
         return html.Div(
             dcc.Graph(id = id, 
                     figure = fig,
@@ -301,12 +317,12 @@ class Chart:
     @staticmethod
     def GenericLinechart(id, df, x, y, category, naming=None, title=None,
                         x_label = None, y_label = None,l_label=None, y_range=None,
-                        scenarios = None, lads=None):
+                        scenarios = None, lads=None, figonly=False):
+        import plotly.express as px
 
-        df = df[df['RUN'].isin(scenarios)] if scenarios else df
-        df = df[df['REGION'].isin(lads)] if lads else df
+        df = DataStore.select(df, RUN=scenarios if scenarios else None,
+                              REGION=lads if lads else None)
         
-
         df = df.replace(naming)
         
         if lads:
@@ -328,6 +344,9 @@ class Chart:
                         margin=dict(l=20, r=20, t=10, b=20),
                         )
                     
+        if figonly:
+            return fig
+
         return html.Div(
             dcc.Graph(id = id, 
                     figure = fig,
@@ -0,0 +1,238 @@
+from pathlib import Path
+import threading
+import hashlib
+import importlib.util
+import os
+import pandas as pd
+import numpy as np
+from component.DtypePolicy import DtypePolicy
+from component.ScenarioCatalog import catalog
+from component.Instrumentation import stage
+
+# pyarrow is optional, without it datasets are loaded from CSV files (it is
+# only imported by pandas when the first Parquet file is read)
+has_pyarrow = importlib.util.find_spec("pyarrow") is not None
+
+# Get the absolute path of the parent directory containing the current script
+appdir = str(Path(__file__).parent.parent.resolve())
+
+
+class DataStore:
+    """Process-wide store for the plot datasets in the data directory.
+
+    Each dataset is parsed once per worker process and kept in memory with
+    the dtypes of a DtypePolicy: label columns (RUN, REGION, TECHNOLOGY,
+    ...) as categoricals, YEAR as int16 and, if the environment variable
+    VALUE_DTYPE is 'float32', VALUE as float32 (values loaded from Parquet
+    files are float32 in any case). RUN columns share the categorical dtype
+    of the scenario catalog, i.e., rows are keyed by compact scenario ids and
+    the catalog knows all scenarios of the loaded datasets (see
+    ScenarioCatalog). A dataset is only parsed again if the
+    modification time of its file changes. Frames returned by the store are
+    shared between callbacks and must not be modified in place.
+    """
+
+    def __init__(self, path = f'{appdir}/data', dtypes = None):
+        self.path = path
+        self.dtypes = (DtypePolicy(float32 = os.environ.get('VALUE_DTYPE') == 'float32',
+                                   catalog = catalog)
+                       if dtypes is None else dtypes)
+        self._frames = dict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        """Return the dataset `name` (file name without extension)."""
+        return self._entry(name)[1]
+
+    def indexed(self, name):
+        """Return the dataset `name` as IndexedData for fast selections."""
+        entry = self._entry(name)
+        if entry[2] is None:
+            with self._lock:
+                if entry[2] is None:
+                    with stage('load'):
+                        entry[2] = IndexedData(entry[1])
+        return entry[2]
+
+    def preload(self, names):
+        """Load and index the datasets `names` (missing files are skipped).
+
+        Processes forked afterwards (e.g., for background callbacks) share
+        the loaded datasets instead of parsing the files again.
+        """
+        for name in names:
+            try:
+                self.indexed(name)
+            except FileNotFoundError:
+                pass
+
+    def scenarios(self, names = ('plot_data_01',)):
+        """Return the scenario catalog with the scenarios of the datasets
+        `names` (loaded if needed), e.g., to find the scenarios with
+        results in a sub-space of the levers (see ScenarioCatalog.find)."""
+        for name in names:
+            self.get(name)
+        return catalog
+
+    def _entry(self, name):
+        file = self.file(name)
+        mtime = os.stat(file).st_mtime_ns
+
+        entry = self._frames.get(name)
+        if entry is None or entry[0] != (file, mtime):
+            with self._lock:
+                # another thread might have loaded the file in the meantime
+                entry = self._frames.get(name)
+                if entry is None or entry[0] != (file, mtime):
+                    # key, frame and index (created on first use)
+                    entry = [(file, mtime), self.load(file), None]
+                    self._frames[name] = entry
+        return entry
+
+    def version(self):
+        """Return a token that changes whenever a plot data file changes.
+
+        The token is a hash of the content of the plot data files, so it is
+        the same on every machine with the same data (e.g., for figures
+        prerendered at build time). The content is only hashed again if
+        the modification time or size of a file changes.
+        """
+        files = sorted((e.name, e.stat().st_mtime_ns, e.stat().st_size)
+                       for e in os.scandir(self.path)
+                       if e.name.startswith('plot_data_'))
+        if self._version is None or self._version[0] != files:
+            h = hashlib.sha1()
+            for name, mtime, size in files:
+                h.update(name.encode())
+                with open(f'{self.path}/{name}', 'rb') as f:
+                    h.update(hashlib.sha1(f.read()).digest())
+            self._version = (files, h.hexdigest())
+        return self._version[1]
+
+    def file(self, name):
+        """Return the file the dataset `name` is loaded from.
+
+        The columnar (Parquet) file written by the preprocessing is
+        preferred over the CSV file if it is present, not older than the
+        CSV file and pyarrow is available.
+        """
+        csv = f'{self.path}/{name}.csv'
+        columnar = f'{self.path}/{name}.parquet'
+        if has_pyarrow and os.path.exists(columnar):
+            if (not os.path.exists(csv) or
+                os.stat(columnar).st_mtime_ns >= os.stat(csv).st_mtime_ns):
+                return columnar
+        return csv
+
+    def load(self, file):
+        with stage('load'):
+            if file.endswith('.parquet'):
+                df = pd.read_parquet(file)
+            else:
+                df = pd.read_csv(file)
+            return self.dtypes.apply(df)
+
+    def memory(self):
+        """Return the memory used and saved by the loaded datasets.
+
+        See DtypePolicy.report, e.g., print the report of a worker with
+        print(DtypePolicy.format_report(store.memory())).
+        """
+        return DtypePolicy.report({name: entry[1]
+                                   for name, entry in list(self._frames.items())})
+
+    @staticmethod
+    def decode(df):
+        """Return a copy of `df` with categorical columns as plain labels.
+
+        This is applied to (small) filtered frames before labels are
+        renamed or combined for plotting.
+        """
+        cats = [c for c in df.columns
+                if isinstance(df[c].dtype, pd.CategoricalDtype)]
+        return df.astype({c: df[c].cat.categories.dtype for c in cats})
+
+    @staticmethod
+    def select(df, **criteria):
+        """Select rows from a dataset and return them as decoded DataFrame.
+
+        Criteria are given as column=value pairs, where value is a label,
+        a list of labels or a slice (inclusive label range). Criteria with
+        value None are ignored. If `df` is IndexedData, the index is used
+        for the key columns, otherwise boolean masks are applied.
+        """
+        with stage('filter'):
+            if isinstance(df, IndexedData):
+                return df.select(**criteria)
+
+            mask = np.ones(len(df), dtype=bool)
+            for c, v in criteria.items():
+                if v is None:
+                    continue
+                if isinstance(v, slice):
+                    mask &= df[c].between(v.start if v.start is not None else -np.inf,
+                                          v.stop if v.stop is not None else np.inf).to_numpy()
+                else:
+                    mask &= df[c].isin(IndexedData.labels(v)).to_numpy()
+            return DataStore.decode(df[mask])
+
+
+class IndexedData:
+    """Dataset with a sorted index over its key columns.
+
+    The index is a lexsorted MultiIndex over the key columns present in the
+    dataset (RUN, REGION, TECHNOLOGY, YEAR), so rows for given labels are
+    found by binary search instead of scanning the whole frame. Selected
+    rows are returned in the order of the original dataset.
+    """
+
+    keys = ["RUN", "REGION", "TECHNOLOGY", "YEAR"]
+
+    def __init__(self, df):
+        self.frame = df
+        self.levels = [k for k in self.keys if k in df.columns]
+        pos = (df[self.levels].assign(_POS = np.arange(len(df)))
+               .set_index(self.levels).sort_index(na_position = "first"))
+        # categorical levels (e.g., RUN with the dtype of the scenario
+        # catalog) may have labels not present in the dataset
+        self.index = pos.index.remove_unused_levels()
+        self.positions = pos["_POS"].to_numpy()
+
+    def __len__(self):
+        return len(self.frame)
+
+    @staticmethod
+    def labels(v):
+        if isinstance(v, (list, tuple, set, np.ndarray, pd.Index, pd.Series)):
+            return list(v)
+        return [v]
+
+    def select(self, **criteria):
+        """Select rows, see DataStore.select."""
+        key = list()
+        other = dict()
+        for c, v in criteria.items():
+            if v is not None and c not in self.levels:
+                other[c] = v
+        for l, level in zip(self.levels, self.index.levels):
+            v = criteria.get(l)
+            if v is None or isinstance(v, slice):
+                key.append(slice(None) if v is None else v)
+                continue
+            # only keep labels present to avoid KeyError in get_locs
+            v = [e for e in self.labels(v) if e in level]
+            if not v:
+                return DataStore.decode(self.frame.iloc[[]])
+            key.append(v)
+
+        locs = self.index.get_locs(tuple(key))
+        df = self.frame.iloc[np.sort(self.positions[locs])]
+
+        if other:
+            return DataStore.select(df, **other)
+        return DataStore.decode(df)
+
+
+# one store per worker process, shared by all callbacks
+store = DataStore()
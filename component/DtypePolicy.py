@@ -0,0 +1,127 @@
+import sys
+import pandas as pd
+import numpy as np
+
+
+class DtypePolicy:
+    """Memory-lean dtypes for result frames and plot datasets.
+
+    Label columns (strings, e.g., RUN, REGION, TECHNOLOGY, FUEL, EMISSION)
+    are encoded as categoricals, YEAR as int16 and VALUE as float32 if
+    `float32` is True (otherwise VALUE keeps its dtype). For a MultiIndex,
+    labels are already stored once per level, so only the YEAR level is
+    converted. If a ScenarioCatalog is given as `catalog`, RUN columns are
+    encoded with the categorical dtype of the catalog, which is shared by
+    all frames (codes are the scenario ids of the catalog). The same policy
+    is applied by the preprocessing when loading results and saving plot
+    data and by the DataStore of the app.
+    """
+
+    def __init__(self, float32 = False, catalog = None):
+        self.float32 = float32
+        self.catalog = catalog
+
+    def dtype(self, name, values):
+        """Return the dtype of a column or index level (None to keep it)."""
+        if name == "YEAR" and pd.api.types.is_integer_dtype(values):
+            if len(values) == 0 or (values.min() >= np.iinfo("int16").min and
+                                    values.max() <= np.iinfo("int16").max):
+                return np.dtype("int16")
+            return None
+        if name == "VALUE":
+            if self.float32 and pd.api.types.is_float_dtype(values):
+                return np.dtype("float32")
+            return None
+        if (pd.api.types.is_object_dtype(values) or
+            pd.api.types.is_string_dtype(values)):
+            return "category"
+        return None
+
+    def apply(self, df):
+        """Return `df` with the dtypes of the policy (a copy if changed)."""
+        dtypes = dict()
+        for c in df.columns:
+            if c == "RUN" and self.catalog is not None:
+                continue
+            d = self.dtype(c, df[c])
+            if d is not None and df[c].dtype != d:
+                dtypes[c] = d
+        if dtypes:
+            df = df.astype(dtypes)
+        if "RUN" in df.columns and self.catalog is not None:
+            df = df.assign(RUN = self.catalog.encode(df["RUN"]))
+
+        names = [n for n in df.index.names if n == "YEAR"]
+        if names:
+            index = df.index
+            if isinstance(index, pd.MultiIndex):
+                n = index.names.index("YEAR")
+                d = self.dtype("YEAR", index.levels[n])
+                if d is not None and index.levels[n].dtype != d:
+                    index = index.set_levels(index.levels[n].astype(d),
+                                             level = n)
+            else:
+                d = self.dtype("YEAR", index)
+                if d is not None and index.dtype != d:
+                    index = index.astype(d)
+            if index is not df.index:
+                df = df.set_axis(index, axis = 0)
+        return df
+
+    @staticmethod
+    def nbytes(df):
+        """Return the memory used by `df` (including strings)."""
+        return int(df.memory_usage(index = True, deep = True).sum())
+
+    @staticmethod
+    def default_nbytes(df):
+        """Return the (estimated) memory `df` would use with default dtypes.
+
+        Categoricals are counted as object columns of strings and integer
+        and float columns as 64 bit. Estimated without converting `df`.
+        """
+        n = int(df.index.memory_usage(deep = True))
+        for c in df.columns:
+            s = df[c]
+            if isinstance(s.dtype, pd.CategoricalDtype):
+                sizes = np.array([sys.getsizeof(l) for l in s.cat.categories],
+                                 dtype = np.int64)
+                codes = s.cat.codes.to_numpy()
+                n += 8*len(s) + int(sizes[codes[codes >= 0]].sum())
+            elif (pd.api.types.is_integer_dtype(s) or
+                  pd.api.types.is_float_dtype(s)):
+                n += 8*len(s)
+            else:
+                n += int(s.memory_usage(index = False, deep = True))
+        return n
+
+    @staticmethod
+    def report(frames):
+        """Return a report of the memory saved for a dict of frames.
+
+        The report is a dict with the bytes used with default dtypes
+        ('default'), the bytes used ('bytes') and the bytes saved
+        ('saved') for each frame (dict keys).
+        """
+        report = dict()
+        for name, df in frames.items():
+            default = DtypePolicy.default_nbytes(df)
+            used = DtypePolicy.nbytes(df)
+            report[name] = {'default': default, 'bytes': used,
+                            'saved': default - used}
+        return report
+
+    @staticmethod
+    def format_report(report):
+        """Return a report (see report) as text table."""
+        lines = [f'{"dataset":<40}{"default MB":>12}{"MB":>10}{"saved":>8}']
+        for name, r in sorted(report.items(), key = lambda r: -r[1]['saved']):
+            share = r['saved']/r['default'] if r['default'] else 0
+            lines.append(f'{name:<40}{r["default"]/2**20:>12.2f}'
+                         f'{r["bytes"]/2**20:>10.2f}{share:>8.0%}')
+        total = {k: sum(r[k] for r in report.values())
+                 for k in ['default', 'bytes', 'saved']}
+        share = total['saved']/total['default'] if total['default'] else 0
+        lines.append(f'{"total":<40}{total["default"]/2**20:>12.2f}'
+                     f'{total["bytes"]/2**20:>10.2f}{share:>8.0%}')
+        return '\n'.join(lines)
@@ -0,0 +1,192 @@
+from collections import OrderedDict
+import threading
+import hashlib
+import json
+import sys
+import os
+from plotly.io.json import to_json_plotly
+
+
+def nbytes(value):
+    """Return the memory used by a parsed JSON value (dicts, lists,
+    strings and numbers, objects shared within the value counted once)."""
+    seen = set()
+    stack = [value]
+    n = 0
+    while stack:
+        v = stack.pop()
+        if id(v) in seen:
+            continue
+        seen.add(id(v))
+        n += sys.getsizeof(v)
+        if isinstance(v, dict):
+            stack.extend(v.keys())
+            stack.extend(v.values())
+        elif isinstance(v, list):
+            stack.extend(v)
+    return n
+
+
+class MemoryBackend:
+    """In-process LRU backend bounded by the memory of the stored values.
+
+    Values are kept as parsed (JSON-compatible) objects, so hits are
+    returned without parsing. The bound max_bytes applies to the memory
+    used by the parsed objects (see nbytes), which is several times the
+    length of their JSON.
+    """
+
+    def __init__(self, max_bytes = 256 * 2**20):
+        self.max_bytes = max_bytes
+        self._values = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            self._values.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, data = None):
+        # value is the parsed JSON data
+        size = nbytes(value)
+        with self._lock:
+            if key in self._values:
+                self._bytes -= self._values.pop(key)[1]
+            self._values[key] = (value, size)
+            self._bytes += size
+            # evict least recently used values
+            while self._bytes > self.max_bytes and len(self._values) > 1:
+                self._bytes -= self._values.popitem(last = False)[1][1]
+
+    def size(self):
+        return self._bytes
+
+
+class DiskBackend:
+    """LRU backend storing values as files in a local directory.
+
+    The directory can be shared by all workers on a machine. The
+    modification time of a file is updated on access and the least
+    recently used files are deleted if the total size exceeds the limit
+    (no files are deleted if max_bytes is None).
+    """
+
+    def __init__(self, path, max_bytes = 2**30):
+        self.path = path
+        self.max_bytes = max_bytes
+        os.makedirs(path, exist_ok = True)
+
+    def _file(self, key):
+        return os.path.join(self.path, f'{key}.json')
+
+    def get(self, key):
+        file = self._file(key)
+        try:
+            with open(file, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(file)
+        except OSError:
+            # e.g., read-only directory
+            pass
+        return json.loads(data)
+
+    def set(self, key, value, data = None):
+        # only the JSON data is stored
+        if data is None:
+            data = json.dumps(value).encode()
+        file = self._file(key)
+        # write to temporary file first, so other workers never read
+        # partially written values
+        tmp = f'{file}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, file)
+        self.evict()
+
+    def files(self):
+        # files might be deleted by other workers while scanning
+        files = list()
+        for e in os.scandir(self.path):
+            if e.name.endswith('.json'):
+                try:
+                    s = e.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((s.st_mtime_ns, s.st_size, e.path))
+        return files
+
+    def evict(self):
+        if self.max_bytes is None:
+            return
+        files = self.files()
+        total = sum(f[1] for f in files)
+        for mtime, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def size(self):
+        return sum(f[1] for f in self.files())
+
+
+class FigureCache:
+    """Cache for figures and figure layouts returned by callbacks.
+
+    Values are serialized to JSON once when they are stored and returned
+    as (JSON-compatible) dicts, which can be returned by callbacks directly.
+    The MemoryBackend keeps the dicts, the DiskBackend the JSON. Returned
+    dicts are shared and must not be modified in place. Keys are created
+    from the normalized callback inputs and the version of the data files.
+    """
+
+    def __init__(self, backend = None):
+        self.backend = MemoryBackend() if backend is None else backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*inputs):
+        """Return a cache key for the given (JSON-serializable) inputs."""
+        return hashlib.sha256(json.dumps(inputs, sort_keys = True,
+                                         default = str).encode()).hexdigest()
+
+    def get(self, key):
+        """Return the cached value for `key` or None."""
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Store `value` (e.g., a figure or Dash components) for `key` and
+        return it as cached, i.e., as JSON-compatible dict."""
+        data = to_json_plotly(value).encode()
+        value = json.loads(data)
+        self.backend.set(key, value, data)
+        return value
+
+    def add(self, key, value):
+        """Store `value` returned by a cache (a JSON-compatible dict, e.g.,
+        a prerendered figure) for `key` without serializing it again."""
+        self.backend.set(key, value)
+
+    def stats(self):
+        """Return hit and miss counters and the size of the cache."""
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'bytes': self.backend.size()}
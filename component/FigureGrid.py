@@ -3,6 +3,29 @@ import dash_bootstrap_components as dbc
 from component.Sidebar import Popover
 
 class FigureGrid:
+  @staticmethod
+  def placeholder(id, config = {'displaylogo':False}, style = None,
+                  progress = False):
+    # empty graph of the grid, the figure is created by its own callback
+    # (a loading spinner is shown in the meantime), figures created by
+    # background callbacks show their progress in a progress bar
+    figure = {'data': [],
+              'layout': {'xaxis': {'visible': False},
+                         'yaxis': {'visible': False},
+                         'paper_bgcolor': 'white',
+                         'plot_bgcolor': 'white'}}
+    graph = dcc.Graph(id = id, figure = figure, config = config)
+    if progress:
+      graph = [dbc.Progress(id = f'{id}_progress', value = 0,
+                            style = FigureGrid.progress_style(False)),
+               graph]
+    return html.Div(graph, style = style)
+
+  @staticmethod
+  def progress_style(visible):
+    # style of the progress bar of a figure while (not) created
+    return {'height': '4px', 'visibility': 'visible' if visible else 'hidden'}
+
   @staticmethod
   def create(figures:list[dict], columns_per_row):
     figures = [
@@ -14,7 +37,7 @@ class FigureGrid:
                           f['popover']['className'])               
           ], direction = 'horizontal'),
           f['facet'],
-          dcc.Loading(f['graph']) if f['facet'] is not None else f['graph']],  
+          dcc.Loading(f['graph'])],  
           className = 'figure_col')
 
         for f in figures]
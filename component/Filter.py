@@ -1,14 +1,24 @@
 from dash import html, dcc
 from component.Sidebar import Popover
 import dash_bootstrap_components as dbc
+import functools
 import json
 from pathlib import Path
 
 # Get the absolute path of the parent directory containing the current script
 appdir = str(Path(__file__).parent.parent.resolve())
 
-with open(f'{appdir}/content/figures.json') as file:
-    content = json.load(file)
+# - figure content (titles, tooltips) is loaded on first use, the module
+#   attribute content is resolved by __getattr__
+@functools.cache
+def load_figure_content():
+    with open(f'{appdir}/content/figures.json') as file:
+        return json.load(file)
+
+def __getattr__(name):
+    if name == 'content':
+        return load_figure_content()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 class Filter:
     @staticmethod
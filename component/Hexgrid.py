@@ -0,0 +1,83 @@
+import pandas as pd
+import numpy as np
+
+# radius of a hexagon with a distance of 1 between neighbouring cells
+# and distance between rows (or columns) of cells
+radius = 0.5 / np.sin(np.pi/3)
+row_diff = np.sqrt(1 - 0.5**2)
+
+
+class Hexgrid:
+    """Create hexagon geometries for hexjson files.
+
+    The geometries of all cells are computed in one array operation. The
+    layouts of the hexjson format are supported: 'odd-r' and 'even-r'
+    (pointy-topped hexagons, odd or even rows shifted by half a cell
+    towards increasing q) and 'odd-q' and 'even-q' (flat-topped hexagons,
+    odd or even columns shifted by half a cell towards increasing r).
+    """
+
+    layouts = ["odd-r", "even-r", "odd-q", "even-q"]
+
+    @staticmethod
+    def frame(hexjson, id_column, name_column = None):
+        """Return the cells of a hexjson as DataFrame.
+
+        The column 'n' (name) is renamed to `name_column`, by default
+        `id_column` with its last two letters replaced by 'NM'.
+        """
+        name_column = id_column[:-2]+"NM" if name_column is None else name_column
+        hexes = hexjson["hexes"]
+        df = pd.DataFrame(list(hexes.values()), index = list(hexes.keys()))
+        df.index.name = id_column
+        df = df.rename(columns = {"n":name_column})
+        return df.reset_index()
+
+    @staticmethod
+    def vertices(q, r, layout = "odd-r"):
+        """Return the closed rings of hexagons as array (cells, 7, 2)."""
+        if layout not in Hexgrid.layouts:
+            raise ValueError(f"Unknown hexjson layout '{layout}'.")
+
+        q = np.asarray(q, dtype = float)
+        r = np.asarray(r, dtype = float)
+        shifted = 1 if layout.startswith("odd") else 0
+        # angles of the six corners
+        ang = np.radians(np.arange(0, 360, 60))
+
+        if layout.endswith("-r"):
+            x = q + 0.5 * (np.mod(r, 2) == shifted)
+            y = r * row_diff
+            vx, vy = np.sin(ang), np.cos(ang)
+        else:
+            x = q * row_diff
+            y = r + 0.5 * (np.mod(q, 2) == shifted)
+            vx, vy = np.cos(ang), np.sin(ang)
+
+        coords = np.stack([x[:, None] + vx[None, :] * radius,
+                           y[:, None] + vy[None, :] * radius], axis = -1)
+        # repeat the first vertex, so rings are closed exactly (RFC 7946)
+        return np.concatenate([coords, coords[:, :1]], axis = 1)
+
+    @staticmethod
+    def geojson(hexjson, id_column, name_column = None):
+        """Return a GeoJSON FeatureCollection with a polygon for each cell.
+
+        Feature properties are the cell attributes of the hexjson (with
+        the cell key as `id_column` and the name as `name_column`).
+        """
+        df = Hexgrid.frame(hexjson, id_column, name_column)
+        coords = Hexgrid.vertices(df["q"], df["r"],
+                                  hexjson.get("layout", "odd-r")).tolist()
+        # missing attributes as None (null) instead of NaN
+        properties = (df.astype(object).where(df.notna(), None)
+                      .to_dict(orient = "records"))
+
+        return {"type": "FeatureCollection",
+                "features": [{"id": str(i),
+                              "type": "Feature",
+                              "properties": p,
+                              "geometry": {"type": "Polygon",
+                                           "coordinates": [c]}}
+                             for i, (p, c) in enumerate(zip(properties,
+                                                            coords))]}
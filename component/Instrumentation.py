@@ -0,0 +1,335 @@
+import contextvars
+import threading
+import functools
+import bisect
+import random
+import logging
+import json
+import time
+import os
+
+# record of the callback request handled in the current context
+_record = contextvars.ContextVar('callback_record', default = None)
+
+logger = logging.getLogger('callbacks')
+
+
+class _Record:
+    # timings of a single callback request
+
+    def __init__(self, callback):
+        self.callback = callback
+        self.start = time.perf_counter()
+        self.returned = None
+        self.stages = dict()
+        self._stack = list()
+        self.profiler = None
+
+
+class _Stage:
+    # times a stage of the current request, the time of nested stages is
+    # subtracted (like in StartupProfiler), so stages add up to the total
+
+    __slots__ = ('name', 'record', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.record = _record.get()
+        if self.record is not None:
+            self.record._stack.append(0.0)
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record = self.record
+        if record is None:
+            return False
+        total = time.perf_counter() - self.start
+        nested = record._stack.pop()
+        if record._stack:
+            record._stack[-1] += total
+        record.stages[self.name] = record.stages.get(self.name, 0.0) + total - nested
+        return False
+
+
+def stage(name):
+    """Return a context manager timing stage `name` of the current callback.
+
+    Stages are, e.g., 'load' (parsing data files), 'filter' (selecting
+    rows), 'build' (creating figures) and 'serialize' (JSON). Outside of an
+    instrumented request, the context manager does nothing.
+    """
+    return _Stage(name)
+
+
+class _Histogram:
+    # cumulative histogram in the Prometheus format
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0]*len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.buckets, value)
+        if i < len(self.buckets):
+            self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for le, c in zip(self.buckets, self.counts):
+            cumulative += c
+            yield f'{name}_bucket', dict(labels, le = f'{le:g}'), cumulative
+        yield f'{name}_bucket', dict(labels, le = '+Inf'), self.count
+        yield f'{name}_sum', labels, self.sum
+        yield f'{name}_count', labels, self.count
+
+
+class CallbackMetrics:
+    """Timings and payload sizes of the Dash callback requests.
+
+    Once attached to the Flask server of the app (see init_app), every
+    callback request is timed and split into stages (see stage), the
+    remaining time is recorded as 'other'. Callbacks decorated with
+    `timed` additionally record the time after the callback returned as
+    'serialize' (the response is serialized by Dash). The size of the
+    response is recorded as payload bytes. Each request is logged as a JSON
+    line (logger 'callbacks', level INFO) and aggregated in per-process
+    metrics, which are served in the Prometheus text format.
+
+    Requests are profiled with cProfile or pyinstrument if `profile` is
+    'cprofile' or 'pyinstrument': a share `profile_rate` of the requests
+    and all requests with the header 'X-Profile' are profiled (one at a
+    time per process) and the profiles are saved in `profile_dir`.
+    """
+
+    duration_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                        1, 2.5, 5, 10)
+    payload_buckets = (2**10, 2**12, 2**14, 2**16, 2**18, 2**20,
+                       2**22, 2**24)
+
+    def __init__(self, profile = None, profile_rate = 1.0, profile_dir = None):
+        if profile not in (None, 'cprofile', 'pyinstrument'):
+            raise ValueError(f"Unknown profiler '{profile}', use 'cprofile' "
+                             "or 'pyinstrument'.")
+        self.profile = profile
+        self.profile_rate = profile_rate
+        self.profile_dir = profile_dir
+        self._collectors = list()
+        self._requests = dict()
+        self._durations = dict()
+        self._payloads = dict()
+        self._stages = dict()
+        self._lock = threading.Lock()
+        self._profile_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, profile_dir = None):
+        """Create metrics configured by the environment variables
+        CALLBACK_PROFILE, CALLBACK_PROFILE_RATE and CALLBACK_PROFILE_DIR."""
+        return cls(profile = os.environ.get('CALLBACK_PROFILE') or None,
+                   profile_rate = float(os.environ.get('CALLBACK_PROFILE_RATE', 1.0)),
+                   profile_dir = os.environ.get('CALLBACK_PROFILE_DIR', profile_dir))
+
+    def init_app(self, server, route = '/metrics'):
+        """Instrument the callback requests of a Flask server and serve the
+        metrics at `route`."""
+        from flask import Response, request
+
+        def callback_request():
+            return (request.method == 'POST' and
+                    request.path.endswith('/_dash-update-component'))
+
+        def before():
+            if callback_request():
+                body = request.get_json(silent = True) or {}
+                self.start(body.get('output', 'unknown'),
+                           profile = 'X-Profile' in request.headers)
+
+        def after(response):
+            if callback_request():
+                self.finish(response.status_code,
+                            response.calculate_content_length())
+            return response
+
+        def teardown(exc):
+            # requests failing with an exception do not reach after
+            if _record.get() is not None:
+                self.finish(500, None)
+
+        def metrics_response():
+            return Response(self.prometheus(),
+                            mimetype = 'text/plain; version=0.0.4')
+
+        server.before_request(before)
+        server.after_request(after)
+        server.teardown_request(teardown)
+        server.add_url_rule(route, 'metrics', metrics_response)
+
+    def collector(self, func):
+        """Register a function returning further metrics for the endpoint.
+
+        The function returns a list of (name, type, help, samples) tuples,
+        where samples is a list of (labels, value) pairs. Can be used as
+        decorator.
+        """
+        self._collectors.append(func)
+        return func
+
+    def timed(self, func):
+        """Decorator for callbacks to record when the callback returned."""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record = _record.get()
+                if record is not None:
+                    record.returned = time.perf_counter()
+        return wrapper
+
+    def start(self, callback, profile = False):
+        """Start recording a request of `callback` in the current context."""
+        record = _Record(callback)
+        if self.profile and (profile or random.random() < self.profile_rate):
+            # only one profiler can be active at a time
+            if self._profile_lock.acquire(blocking = False):
+                try:
+                    record.profiler = self._start_profiler()
+                except Exception:
+                    self._profile_lock.release()
+                    raise
+        _record.set(record)
+        return record
+
+    def finish(self, status, payload):
+        """Finish the request of the current context, record and log it."""
+        record = _record.get()
+        if record is None:
+            return None
+        _record.set(None)
+        end = time.perf_counter()
+        if record.profiler is not None:
+            try:
+                profile = self._save_profile(record)
+            finally:
+                self._profile_lock.release()
+        else:
+            profile = None
+
+        duration = end - record.start
+        stages = dict(record.stages)
+        if record.returned is not None:
+            stages['serialize'] = stages.get('serialize', 0.0) + end - record.returned
+        stages['other'] = max(duration - sum(stages.values()), 0.0)
+
+        with self._lock:
+            key = (record.callback, str(status))
+            self._requests[key] = self._requests.get(key, 0) + 1
+            self._durations.setdefault(record.callback, _Histogram(
+                self.duration_buckets)).observe(duration)
+            if payload is not None:
+                self._payloads.setdefault(record.callback, _Histogram(
+                    self.payload_buckets)).observe(payload)
+            for s, t in stages.items():
+                v = self._stages.setdefault((record.callback, s), [0.0, 0])
+                v[0] += t
+                v[1] += 1
+
+        entry = {'event': 'callback',
+                 'callback': record.callback,
+                 'status': status,
+                 'duration_ms': round(1000*duration, 3),
+                 'stages_ms': {s: round(1000*t, 3) for s, t in stages.items()},
+                 'payload_bytes': payload}
+        if profile is not None:
+            entry['profile'] = profile
+        logger.info(json.dumps(entry))
+        return entry
+
+    def _start_profiler(self):
+        if self.profile == 'pyinstrument':
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+        else:
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profiler
+
+    def _save_profile(self, record):
+        # save profile as pstats (cProfile) or HTML (pyinstrument) file
+        path = self.profile_dir or '.'
+        os.makedirs(path, exist_ok = True)
+        name = ''.join(c if c.isalnum() or c in '-_' else '_'
+                       for c in record.callback)[:80]
+        file = os.path.join(path, f'{time.strftime("%Y%m%d-%H%M%S")}-'
+                                  f'{os.getpid()}-{name}')
+        if self.profile == 'pyinstrument':
+            record.profiler.stop()
+            file += '.html'
+            with open(file, 'w') as f:
+                f.write(record.profiler.output_html())
+        else:
+            record.profiler.disable()
+            file += '.prof'
+            record.profiler.dump_stats(file)
+        return file
+
+    def metrics(self):
+        """Return the metrics as list of (name, type, help, samples)."""
+        with self._lock:
+            requests = [({'callback': c, 'status': s}, n)
+                        for (c, s), n in self._requests.items()]
+            durations = [s for c, h in self._durations.items()
+                         for s in h.samples('dash_callback_duration_seconds',
+                                            {'callback': c})]
+            payloads = [s for c, h in self._payloads.items()
+                        for s in h.samples('dash_callback_payload_bytes',
+                                           {'callback': c})]
+            stage_seconds = [({'callback': c, 'stage': s}, v[0])
+                             for (c, s), v in self._stages.items()]
+            stage_count = [({'callback': c, 'stage': s}, v[1])
+                           for (c, s), v in self._stages.items()]
+
+        metrics = [('dash_callback_requests_total', 'counter',
+                    'Callback requests by status code.', requests),
+                   ('dash_callback_duration_seconds', 'histogram',
+                    'Duration of callback requests.', durations),
+                   ('dash_callback_payload_bytes', 'histogram',
+                    'Size of callback responses.', payloads),
+                   ('dash_callback_stage_seconds_total', 'counter',
+                    'Time spent in the stages of callback requests.',
+                    stage_seconds),
+                   ('dash_callback_stage_count_total', 'counter',
+                    'Callback requests including the stage.', stage_count)]
+        for collector in self._collectors:
+            metrics += collector()
+        return metrics
+
+    def prometheus(self):
+        """Return the metrics in the Prometheus text format."""
+        lines = list()
+        for name, kind, text, samples in self.metrics():
+            lines += [f'# HELP {name} {text}', f'# TYPE {name} {kind}']
+            for sample in samples:
+                # histograms give (name, labels, value), others (labels, value)
+                sample_name, labels, value = (sample if len(sample) == 3
+                                              else (name, *sample))
+                labels = ','.join(f'{k}="{_escape(v)}"'
+                                  for k, v in labels.items())
+                value = value if isinstance(value, int) else float(value)
+                lines.append(f'{sample_name}{{{labels}}} {value}'
+                             if labels else f'{sample_name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return (str(value).replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
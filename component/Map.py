@@ -1,62 +1,157 @@
 import pandas as pd
 import numpy as np
-from shapely.geometry import Polygon
-import geopandas as gpd
-import plotly.express as px
-from plotly.subplots import make_subplots
 from dash import html, dcc
+import functools
+import base64
 import json
-import math
 from pathlib import Path
+from component.DataStore import DataStore
+from component.Hexgrid import Hexgrid
+# plotly modules are imported within the functions on first use to reduce
+# the startup time of the app
 
 appdir = str(Path(__file__).parent.parent.resolve())
 
 mapfile = f'{appdir}/data/uk-local-authority-districts-2023.hexjson'
 map_column = "LAD23CD"
 
-# load and process hexmap file
-with open(mapfile, "r", encoding="utf-8") as json_file:
-    data = json.load(json_file)
-data = data["hexes"]
 
-mapdata = pd.DataFrame.from_dict(data,orient="index")
-mapdata.index.name = map_column
-mapdata = mapdata.rename(columns={"n":map_column[:-2]+"NM"})
-mapdata = mapdata.reset_index()
+@functools.cache
+def hexmap():
+    """Return the hexmap cells (DataFrame) and hexagon geometries (GeoJSON).
 
-r = 0.5 / np.sin(np.pi/3)
-y_diff = np.sqrt(1 - 0.5**2)  
+    The hexmap file is loaded on first use and kept for the lifetime of
+    the process.
+    """
+    with open(mapfile, "r", encoding="utf-8") as json_file:
+        data = json.load(json_file)
 
-mapdata = mapdata.set_index("LAD23CD")
+    return Hexgrid.frame(data, map_column), Hexgrid.geojson(data, map_column)
 
-for hi in mapdata.index:
+@functools.cache
+def geojson_bytes():
+    # serialized hexagon geometries served by Map.serve_geojson
+    return json.dumps(hexmap()[1]).encode()
 
-    row = mapdata.loc[hi, "r"]
-    col = mapdata.loc[hi, "q"]
-    
-    if row % 2 == 1:
-        col = col + 0.5
-    row = row * y_diff
-    
-    c = [[col + math.sin(math.radians(ang)) * r,
-          row + math.cos(math.radians(ang)) * r] 
-         for ang in range(0, 360, 60)]
-
-    mapdata.loc[hi, "geometry"] = Polygon(c)
-    
-mapdata = gpd.GeoDataFrame(mapdata, geometry="geometry")
-mapdata = mapdata.reset_index()
-geojson = mapdata.__geo_interface__
+# URL the geometries are served at (embedded in the traces if None)
+geojson_url = None
 
 
 class Map:
+    @staticmethod
+    def serve_geojson(server, route, url = None):
+        """Serve the hexagon geometries as GeoJSON from a Flask server.
+
+        Map traces then reference the geometries by `url` (by default
+        `route`) instead of embedding them, so the browser loads them once
+        for all panels and figures.
+        """
+        global geojson_url
+        from flask import Response, request
+
+        def geojson_response():
+            response = Response(geojson_bytes(),
+                                mimetype = "application/geo+json")
+            response.add_etag()
+            return response.make_conditional(request)
+
+        server.add_url_rule(route, "hexmap_geojson", geojson_response)
+        geojson_url = route if url is None else url
+
+    @staticmethod
+    def HexmapTraces(df, panels, featureidkey = None):
+        """Return a choropleth trace for each panel.
+
+        The traces are created directly from the values of `df`, which are
+        grouped once by RUN (and TECHNOLOGY) and ordered like the cells of
+        the hexmap. `panels` is a list of (technology, scenario) pairs, with
+        technology None if `df` is not split by technology. All traces share
+        the same geometries (a URL if served, see serve_geojson).
+        """
+        import plotly.graph_objects as go
+
+        mapdata = hexmap()[0]
+        name_column = map_column[:-2]+"NM"
+        names = mapdata[name_column].to_numpy()
+        # position of the cell of each row in the hexmap (-1 if not in map)
+        pos = pd.Index(mapdata[map_column]).get_indexer(df["REGION"])
+        values = df["VALUE"].to_numpy(dtype = float)
+
+        keys = (["RUN"] if all(tech is None for tech, scen in panels)
+                else ["TECHNOLOGY", "RUN"])
+        groups = df.groupby(keys, sort = False).indices
+        geo = geojson_url if geojson_url is not None else hexmap()[1]
+
+        traces = list()
+        for tech, scen in panels:
+            rows = groups.get(scen if tech is None else (tech, scen),
+                              np.array([], dtype = int))
+            rows = rows[pos[rows] >= 0]
+            rows = rows[np.argsort(pos[rows], kind = "stable")]
+            traces.append(go.Choropleth(
+                geojson = geo,
+                featureidkey = ("properties." + name_column
+                                if featureidkey is None else featureidkey),
+                locations = names[pos[rows]],
+                z = values[rows],
+                coloraxis = "coloraxis",
+                name = "",
+                hovertemplate = "%{location}: %{z}"))
+        return traces
+
+    @staticmethod
+    def HexmapYearData(df, scenarios, techs, years, naming=None):
+        """Return the values of a GenericHexmap for all `years` as arrays.
+
+        The result contains the locations of each panel (all cells with
+        values in any year) and the values of each panel for each year as
+        base64 encoded float32 arrays (NaN if missing) that plotly.js reads
+        directly, in the order of the traces of the GenericHexmap with the
+        same scenarios and technologies. It is used to change the year of a
+        map in the browser.
+        """
+        df = DataStore.select(df, RUN=scenarios, YEAR=years, TECHNOLOGY=techs)
+        df = df.replace(naming)
+
+        scenarios = [naming[s] if s in naming.keys()
+                    else s for s in scenarios] if naming else scenarios
+        panels = [(tech, scen) for tech in techs for scen in scenarios]
+
+        mapdata = hexmap()[0]
+        names = mapdata[map_column[:-2]+"NM"].to_numpy()
+        pos = pd.Index(mapdata[map_column]).get_indexer(df["REGION"])
+        year_pos = pd.Index(years).get_indexer(df["YEAR"])
+        values = df["VALUE"].to_numpy(dtype = float)
+        groups = df.groupby(["TECHNOLOGY", "RUN"], sort = False).indices
+
+        locations = list()
+        z = np.full((len(years), len(panels)), None, dtype = object)
+        for p, panel in enumerate(panels):
+            rows = groups.get(panel, np.array([], dtype = int))
+            rows = rows[pos[rows] >= 0]
+            # cells in hexmap order
+            cells = np.unique(pos[rows])
+            zp = np.full((len(years), len(cells)), np.nan)
+            zp[year_pos[rows], np.searchsorted(cells, pos[rows])] = values[rows]
+            locations.append(names[cells].tolist())
+            for y in range(len(years)):
+                z[y, p] = {"dtype": "f4",
+                           "bdata": base64.b64encode(zp[y].astype("<f4")
+                                                     .tobytes()).decode()}
+
+        return {"years": list(years),
+                "locations": locations,
+                "z": {str(year): z[y].tolist() for y, year in enumerate(years)}}
+
     @staticmethod
     def GenericHexmap(id, df,  scenarios, techs=None, year= None, title=None,
                     zlabel=None, naming=None, range_color=None,
                     figonly=False, textangle = None):
+        from plotly.subplots import make_subplots
 
-        df = df[df['RUN'].isin(scenarios)] if scenarios else df
-        df = df[(df['YEAR'] == year)] if year else df
+        df = DataStore.select(df, RUN=scenarios if scenarios else None,
+                              YEAR=year if year else None,
+                              TECHNOLOGY=techs)
         df = df.replace(naming)
 
         scenarios = [naming[s] if s in naming.keys()
@@ -66,25 +161,7 @@ class Map:
             pass
         elif techs is None:
             
-            techmap = mapdata.merge(right = df, left_on = map_column, right_on = 'REGION',
-                                    how='left')
-            
-            gobj = list()
-            
-            for scen in scenarios:
-                ftechmap = techmap[(techmap["RUN"] == scen)]
-                
-                fig = px.choropleth(ftechmap,
-                                geojson = geojson,
-                                locations = map_column[:-2]+"NM",
-                                color = "VALUE",
-                                featureidkey = "properties." + map_column[:-2]+"NM",
-                                projection = "mercator",
-                                #color_continuous_scale="Emrld",
-                                #hover_name=map_column[:-2]+"NM",
-                                #hover_data={loc_column:False},
-                                )  
-                gobj.append(fig)
+            gobj = Map.HexmapTraces(df, [(None, scen) for scen in scenarios])
                     
             cols = len(scenarios)
             rows = 1
@@ -95,7 +172,7 @@ class Map:
         
             i=0
             for c in range(cols):
-                fig.add_trace(gobj[i]["data"][0],row=1, col=c+1)
+                fig.add_trace(gobj[i],row=1, col=c+1)
                 i = i+1
             
             fig.update_geos(visible=False,
@@ -110,30 +187,8 @@ class Map:
  
         else:
             
-            df = df[df['TECHNOLOGY'].isin(techs)]
-            
-            techmap = mapdata.merge(right = df, left_on = map_column, right_on = 'REGION',
-                                    how='left')
-            
-            gobj = list()
-            for tech in techs:
-                for scen in scenarios:
-                    ftechmap = techmap[(techmap['TECHNOLOGY'] == tech)&
-                                        (techmap["RUN"] == scen)]
-                    #ftechmap[zlabel] = ftechmap[tech]
-                    
-                    fig = px.choropleth(ftechmap,
-                                    geojson = geojson,
-                                    locations = map_column[:-2]+"NM",
-                                    color = "VALUE",
-                                    featureidkey = "properties." + map_column[:-2]+"NM",
-                                    projection = "mercator",
-                                    #color_continuous_scale="Emrld",
-                                    #hover_name=loc_column[:-2]+"NM",
-                                    #hover_data={loc_column:False},
-                                    )  
-                    gobj.append(fig)
-                    
+            gobj = Map.HexmapTraces(df, [(tech, scen) for tech in techs
+                                         for scen in scenarios])
             
             cols = len(techs)
             rows = len (scenarios)
@@ -144,7 +199,7 @@ class Map:
             i=0
             for c in range(cols):
                 for r in range(rows):
-                    fig.add_trace(gobj[i]["data"][0],row=r+1, col=c+1)
+                    fig.add_trace(gobj[i],row=r+1, col=c+1)
                     i = i+1
             
             fig.update_geos(visible=False,
@@ -174,6 +229,9 @@ class Map:
     @staticmethod
     def LongFormHexmap(id, path,  zlabel, title=None, scenario = None, sex = None, 
                     x_label = None, y_label = None):
+        import plotly.express as px
+
+        geojson = geojson_url if geojson_url is not None else hexmap()[1]
         raw_df = pd.read_csv(path)
         df = raw_df.copy()
         df = df[df['RUN'] == scenario] if scenario else df
@@ -0,0 +1,100 @@
+import importlib.abc
+import sys
+import time
+
+
+class StartupProfiler:
+    """Measure the import and initialisation time of the app at startup.
+
+    If enabled, a finder is added to sys.meta_path that times the execution
+    of every module imported afterwards (with and without the modules it
+    imports itself). Initialisation stages of the app are recorded with
+    mark(), each stage covering the time since the previous mark. If not
+    enabled, the profiler does nothing.
+    """
+
+    def __init__(self, enabled = False):
+        self.enabled = enabled
+        self.modules = list()
+        self.stages = list()
+        self._stack = list()
+        self._finder = None
+        self._start = self._last = time.perf_counter()
+        if enabled:
+            self._finder = _TimingFinder(self)
+            sys.meta_path.insert(0, self._finder)
+
+    def mark(self, stage):
+        """Record the time since the previous mark as `stage`."""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.stages.append((stage, now - self._last))
+        self._last = now
+
+    def stop(self):
+        """Stop timing imports."""
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+
+    def _exec(self, name, exec_module, module):
+        # time module execution, time of nested imports is subtracted
+        # to get the time spent in the module itself
+        self._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            exec_module(module)
+        finally:
+            total = time.perf_counter() - start
+            nested = self._stack.pop()
+            if self._stack:
+                self._stack[-1] += total
+            self.modules.append((name, total - nested, total))
+
+    def report(self, top = 25):
+        """Return a report of the slowest imports and the stages as text."""
+        lines = [f'Startup time: {1000*(self._last-self._start):.1f} ms', '',
+                 f'{"stage":<40}{"ms":>10}']
+        lines += [f'{s:<40}{1000*t:>10.1f}' for s, t in self.stages]
+        lines += ['', f'Slowest imports ({len(self.modules)} modules):',
+                  f'{"module":<40}{"self ms":>10}{"total ms":>10}']
+        for name, own, total in sorted(self.modules, key = lambda m: -m[2])[:top]:
+            lines.append(f'{name:<40}{1000*own:>10.1f}{1000*total:>10.1f}')
+        return '\n'.join(lines)
+
+
+class _TimingFinder(importlib.abc.MetaPathFinder):
+    # finds modules with the other finders and wraps their loaders
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def find_spec(self, fullname, path, target = None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimingLoader(spec.loader, self.profiler,
+                                                fullname)
+                return spec
+        return None
+
+
+class _TimingLoader(importlib.abc.Loader):
+    # delegates to the original loader and times exec_module
+
+    def __init__(self, loader, profiler, name):
+        self._loader = loader
+        self._profiler = profiler
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._profiler._exec(self._name, self._loader.exec_module, module)
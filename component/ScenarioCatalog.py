@@ -0,0 +1,140 @@
+import threading
+import numpy as np
+import pandas as pd
+
+
+class ScenarioCatalog:
+    """Catalog of the scenarios with compact integer ids.
+
+    Scenario names encode the values of the levers, e.g.,
+    'nz-2050_hp-00_dh-00_lp-00_h2-00_UK|LA|SO'. Each scenario added to the
+    catalog gets the next integer id, which is its code in the categorical
+    dtype of RUN columns shared by all datasets (see encode), so datasets
+    are keyed by the ids instead of the names. Lever values are parsed once
+    per scenario, scenarios are looked up by their lever values in O(1) and
+    an index by lever value answers which scenarios exist in a sub-space of
+    the levers (see find). Ids are assigned in the order scenarios are
+    added, so they are only valid within a process.
+    """
+
+    # levers in the order of the scenario names
+    levers = ('nz', 'hp', 'dh', 'lp', 'h2')
+    region = 'UK|LA|SO'
+
+    def __init__(self, names = ()):
+        self.names = list()
+        self.values = list()
+        self._ids = dict()
+        self._by_values = dict()
+        self._index = {l: dict() for l in self.levers}
+        self._dtype = None
+        self._lock = threading.Lock()
+        for name in names:
+            self.add(name)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._ids
+
+    @classmethod
+    def parse(cls, name):
+        """Return the lever values of scenario `name` as tuple in the order
+        of `levers` (None if the name does not encode lever values)."""
+        try:
+            values = dict(p.split('-') for p in name.split('_')[:-1])
+            return tuple(int(values[l]) for l in cls.levers)
+        except (ValueError, KeyError):
+            return None
+
+    @classmethod
+    def name(cls, values):
+        """Return the name of the scenario with lever `values` (tuple in the
+        order of `levers` or dict)."""
+        if isinstance(values, dict):
+            values = [values[l] for l in cls.levers]
+        return '_'.join([f'{l}-{v:02d}' for l, v in zip(cls.levers, values)]
+                        + [cls.region])
+
+    def add(self, name):
+        """Add scenario `name` (if new) and return its id."""
+        id = self._ids.get(name)
+        if id is not None:
+            return id
+        with self._lock:
+            id = self._ids.get(name)
+            if id is None:
+                id = len(self.names)
+                values = self.parse(name)
+                self.names.append(name)
+                self.values.append(values)
+                if values is not None:
+                    self._by_values.setdefault(values, id)
+                    for l, v in zip(self.levers, values):
+                        self._index[l].setdefault(v, set()).add(id)
+                self._dtype = None
+                # set last, other threads only see complete entries
+                self._ids[name] = id
+        return id
+
+    def id(self, name):
+        """Return the id of scenario `name` (None if not in the catalog)."""
+        return self._ids.get(name)
+
+    def lookup(self, values):
+        """Return the id of the scenario with lever `values` (tuple in the
+        order of `levers` or dict, None if not in the catalog)."""
+        if isinstance(values, dict):
+            values = tuple(values[l] for l in self.levers)
+        return self._by_values.get(tuple(values))
+
+    def lever_values(self, name):
+        """Return the lever values of scenario `name` as tuple (see parse)."""
+        id = self._ids.get(name)
+        return self.values[id] if id is not None else self.parse(name)
+
+    def find(self, **values):
+        """Return the names of the scenarios in a sub-space of the levers.
+
+        Values are given as lever=value pairs, where value is a value or a
+        list of values; levers not given (or None) can have any value, e.g.,
+        find(nz=2045, hp=[0, 1]).
+        """
+        ids = None
+        for l, v in values.items():
+            if v is None:
+                continue
+            vs = v if isinstance(v, (list, tuple, set)) else [v]
+            match = set().union(*(self._index[l].get(e, ()) for e in vs))
+            ids = match if ids is None else ids & match
+        if ids is None:
+            ids = [id for id, v in enumerate(self.values) if v is not None]
+        return [self.names[id] for id in sorted(ids)]
+
+    def dtype(self):
+        """Return the categorical dtype of RUN columns (codes are ids)."""
+        dtype = self._dtype
+        if dtype is None:
+            with self._lock:
+                dtype = self._dtype = pd.CategoricalDtype(list(self.names))
+        return dtype
+
+    def encode(self, values):
+        """Return `values` (scenario names) as Series with the categorical
+        dtype of the catalog, new scenarios are added to the catalog."""
+        values = pd.Series(values)
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            categories = values.cat.categories
+        else:
+            codes, categories = pd.factorize(values)
+        # missing values (code -1) are mapped to the last element (-1)
+        ids = np.array([self.add(c) for c in categories] + [-1])
+        codes = ids[codes]
+        return pd.Series(pd.Categorical.from_codes(codes, dtype = self.dtype()),
+                         index = values.index, name = values.name)
+
+
+# one catalog per worker process, shared by all datasets
+catalog = ScenarioCatalog()
@@ -2,14 +2,30 @@ from dash import html, dcc
 import dash_bootstrap_components as dbc
 import pandas as pd
 from pathlib import Path
+import functools
 import json
 import re
 
 appdir = str(Path(__file__).parent.parent.resolve())
 
 # CONTENT
-with open(f'{appdir}/content/sidebar.json') as file:
-    content = json.load(file)
+# - loaded on first use, module attributes (content, predef_scenarios, ...)
+#   are resolved by __getattr__
+@functools.cache
+def load_content():
+    with open(f'{appdir}/content/sidebar.json') as file:
+        return json.load(file)
+
+def __getattr__(name):
+    if name == 'content':
+        return load_content()
+    if name == 'predef_scenarios':
+        return load_content()['predefined_scenarios']
+    if name == 'options':
+        return scenario_options()
+    if name == 'lever_popovers':
+        return create_lever_popovers()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 #POPOVER FOR LEVERS
 class Popover():
@@ -28,22 +44,27 @@ class Popover():
 ])
     
 # - Create popover for levers
-lever_num = len([i for i in content.keys() if re.match(r'^lev_\d+$', i)]) + 1
-lever_popovers = [Popover.hover(f'lever{i}_popover', 
-                                content[f'lev_{i}_tooltip']) for i in range(1, lever_num)]
+def create_lever_popovers():
+    content = load_content()
+    lever_num = len([i for i in content.keys() if re.match(r'^lev_\d+$', i)]) + 1
+    return [Popover.hover(f'lever{i}_popover', 
+                          content[f'lev_{i}_tooltip']) for i in range(1, lever_num)]
 
 # EXTRACT SCENARIOS AND LEVERS
-predef_scenarios = content['predefined_scenarios']
-
 # create list of dropdown options including style
-options = [{'label':html.Span(d['label'], 
-                              style={'color': '#808080',
-                                     'font-size': '14px'}),
-                                'value':d['value']
-                                } for d in predef_scenarios]
+def scenario_options():
+    return [{'label':html.Span(d['label'], 
+                               style={'color': '#808080',
+                                      'font-size': '14px'}),
+                                 'value':d['value']
+                                 } for d in load_content()['predefined_scenarios']]
 
 #LAYOUT
 def sidebar():
+    content = load_content()
+    predef_scenarios = content['predefined_scenarios']
+    options = scenario_options()
+    lever_popovers = create_lever_popovers()
     return html.Div(
        [
             html.Div(content['title'], className ='sidebar_title'),
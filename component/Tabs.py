@@ -1,4 +1,5 @@
 from dash import html, dcc
+import functools
 import json
 from pathlib import Path
 import dash_bootstrap_components as dbc
@@ -57,62 +58,82 @@ subtabs_1 = html.Div ([
 
 
 # -- Search bar for local authorities filter embeded in Subtabs for tab-2
+# --- The mapping and the components are created on first use, module
+#     attributes (local_auth_options, subtabs_2, ...) are resolved by
+#     __getattr__
 local_auth_path = f'{appdir}/data/local_authority_code_mapping.json'
 
-with open(local_auth_path, "r", encoding="utf-8") as json_file:
-    local_authority_data = json.load(json_file)
+@functools.cache
+def load_local_authority_data():
+    with open(local_auth_path, "r", encoding="utf-8") as json_file:
+        return json.load(json_file)
 
 # --- Options for the dropdown
-local_auth_options = list(local_authority_data['name_code'].keys())
-local_auth_options = sorted(local_auth_options)
-
-button =  dbc.Button(
-            "Select Local Authorities",
-            id = "local_auth_search_button",
-            n_clicks = 0,
-        )
-
-local_auth_search =  dcc.Dropdown(local_auth_options, local_auth_options[0],
-                         id = 'local_auth_search',
-                         clearable = False,
-                         searchable = True,
-                         multi = True,
-                         placeholder = "Choose at least one")
-
-local_auth_search_collapse = dbc.Collapse(
-                            local_auth_search,
-                            id = "local_auth_search_collapse",
-                            is_open = False,)
-
-local_auth_search_component = html.Div([button, local_auth_search_collapse],
-                                       id = 'local_auth_search_component')
+def load_local_auth_options():
+    return sorted(load_local_authority_data()['name_code'].keys())
+
+def __getattr__(name):
+    if name == 'local_authority_data':
+        return load_local_authority_data()
+    if name == 'local_auth_options':
+        return load_local_auth_options()
+    if name == 'local_auth_search_component':
+        return create_local_auth_search_component()
+    if name == 'subtabs_2':
+        return create_subtabs_2()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def create_local_auth_search_component():
+    local_auth_options = load_local_auth_options()
+
+    button =  dbc.Button(
+                "Select Local Authorities",
+                id = "local_auth_search_button",
+                n_clicks = 0,
+            )
+
+    local_auth_search =  dcc.Dropdown(local_auth_options, local_auth_options[0],
+                             id = 'local_auth_search',
+                             clearable = False,
+                             searchable = True,
+                             multi = True,
+                             placeholder = "Choose at least one")
+
+    local_auth_search_collapse = dbc.Collapse(
+                                local_auth_search,
+                                id = "local_auth_search_collapse",
+                                is_open = False,)
+
+    return html.Div([button, local_auth_search_collapse],
+                    id = 'local_auth_search_component')
 
 
 # -- Subtabs for tab-2
-subtabs_2 = html.Div ([
-    dcc.Tabs([
-        dcc.Tab(label = "Technology Mix", 
-                        id = 'subtab-2-1',
-                        value = "subtab-2-1",
-                        className = 'custom-subtab_2_1',
-                        selected_className = 'custom-subtab_2_1-selected'
-                        ),
-        dcc.Tab(label = "Cost & Investment", 
-                        id = 'subtab-2-2',
-                        value = "subtab-2-2",
-                        className = 'custom-subtab_2_2',
-                        selected_className = 'custom-subtab_2_2-selected'
-                        ),
-        dcc.Tab(label = "Emissions", 
-                        id = 'subtab-2-3',
-                        value = "subtab-2-3",
-                        className = 'custom-subtab_2_3',
-                        selected_className = 'custom-subtab_2_3-selected'
-                        ),
-    ], id = 'subtabs_2', value = 'subtab-2-1'),
-        local_auth_search_component
-                        ], 
-        id = 'subtabs_2_plus_search_component')
+def create_subtabs_2():
+    return html.Div ([
+        dcc.Tabs([
+            dcc.Tab(label = "Technology Mix", 
+                            id = 'subtab-2-1',
+                            value = "subtab-2-1",
+                            className = 'custom-subtab_2_1',
+                            selected_className = 'custom-subtab_2_1-selected'
+                            ),
+            dcc.Tab(label = "Cost & Investment", 
+                            id = 'subtab-2-2',
+                            value = "subtab-2-2",
+                            className = 'custom-subtab_2_2',
+                            selected_className = 'custom-subtab_2_2-selected'
+                            ),
+            dcc.Tab(label = "Emissions", 
+                            id = 'subtab-2-3',
+                            value = "subtab-2-3",
+                            className = 'custom-subtab_2_3',
+                            selected_className = 'custom-subtab_2_3-selected'
+                            ),
+        ], id = 'subtabs_2', value = 'subtab-2-1'),
+            create_local_auth_search_component()
+                            ], 
+            id = 'subtabs_2_plus_search_component')
 
 
 # LAYOUT
@@ -128,7 +149,7 @@ def tabs(figures : list):
                         className = 'custom-tab_1',
                         selected_className = 'custom-tab_1-selected'
                         ),
-                dcc.Tab([subtabs_2],
+                dcc.Tab([create_subtabs_2()],
                         label = "Local View", 
                         id = 'tab-2',
                         value = "tab-2",     
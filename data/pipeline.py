@@ -0,0 +1,1096 @@
+"""
+Preprocessing pipeline with cached stages
+
+The data analysis elements are defined as named stages of a pipeline. Each
+stage is a function of the values of its input stages, its config and the
+content of its input files. Stage values are cached on disk, keyed by a hash
+of these and the code of the stage, so only stages whose inputs, config or
+code changed are run again. Shared intermediates (e.g., the filtered heat
+generation data used by elements 01, 02 and 07) are computed once.
+Independent stages can be run in parallel by a pool of processes. In append
+mode, only new or changed results are loaded and their plot data is merged
+into the saved plot data.
+
+Usage (from the data directory):
+
+    python pipeline.py [--force] [--append] [--jobs N] [--cache-dir DIR] [STAGE ...]
+
+
+Copyright (C) 2024 Leonhard Hofbauer, Yueh-Chin Lin, licensed under a MIT license
+
+
+"""
+
+import sys
+import os
+import logging
+import json
+import hashlib
+import inspect
+import pickle
+import mmap
+import struct
+import concurrent.futures
+import argparse
+import shutil
+from pathlib import Path
+
+import pandas as pd
+
+appdir = str(Path(__file__).parent.parent.resolve())
+sys.path.insert(0, appdir)
+
+from data import preprocessing
+from component.DtypePolicy import DtypePolicy
+from data.preprocessing import (load_data, load_run, arrange_data, map_labels,
+                                save_data)
+
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """A named step of the pipeline.
+
+    The value of a stage is func(*values of inputs, **config). Files are
+    paths of the input files read by func (directories stand for the zip
+    files they contain). If save is True, the value is a dict of
+    (DataFrame, index) tuples that are saved as plot data (dict keys are
+    the dataset names).
+    """
+
+    def __init__(self, name, func, inputs=(), files=(), save=False,
+                 config=None):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.files = list(files)
+        self.save = save
+        self.config = dict() if config is None else config
+
+
+class Pipeline:
+    """DAG of stages with content-hashed on-disk caching.
+
+    Stage values are written to `<cache_dir>/<stage>-<key>.bin`. The key
+    of a stage is a hash of its name, code, config, the keys of its input
+    stages and the content of its input files, i.e., it changes if
+    anything the value depends on changes. Hashes of files are kept in
+    a manifest and only recomputed if the size or modification time of a
+    file changes.
+    """
+
+    def __init__(self, cache_dir, out_path=None):
+        self.cache_dir = cache_dir
+        self.out_path = out_path
+        self.stages = dict()
+        self.force = False
+        self._keys = dict()
+        self._values = dict()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._manifest_file = os.path.join(cache_dir, "manifest.json")
+        try:
+            with open(self._manifest_file) as f:
+                self.manifest = json.load(f)
+        except (FileNotFoundError, ValueError):
+            self.manifest = {"files":{}, "stages":{}}
+
+    def add(self, name, func, inputs=(), files=(), save=False, **config):
+        """Add a stage, inputs have to be added before."""
+        if name in self.stages:
+            raise ValueError(f"Stage '{name}' already exists.")
+        for i in inputs:
+            if i not in self.stages:
+                raise ValueError(f"Unknown input '{i}' of stage '{name}'.")
+        self.stages[name] = Stage(name, func, inputs, files, save, config)
+
+    def dependencies(self, targets):
+        """Return the targets and all stages they depend on in run order."""
+        order = list()
+        def visit(name):
+            if name not in order:
+                for i in self.stages[name].inputs:
+                    visit(i)
+                order.append(name)
+        for t in targets:
+            if t not in self.stages:
+                raise ValueError(f"Unknown stage '{t}'.")
+            visit(t)
+        return order
+
+    def file_hash(self, file):
+        """Return the hash of the content of a file."""
+        s = os.stat(file)
+        entry = self.manifest["files"].get(file)
+        if entry is None or entry[:2] != [s.st_size, s.st_mtime_ns]:
+            h = hashlib.sha256()
+            with open(file, "rb") as f:
+                for block in iter(lambda: f.read(2**20), b""):
+                    h.update(block)
+            entry = [s.st_size, s.st_mtime_ns, h.hexdigest()]
+            self.manifest["files"][file] = entry
+        return entry[2]
+
+    def key(self, name):
+        """Return the cache key of a stage."""
+        if name not in self._keys:
+            stage = self.stages[name]
+            files = list()
+            for p in stage.files:
+                if os.path.isdir(p):
+                    files += sorted(os.path.join(p, f) for f in os.listdir(p)
+                                    if f.endswith(".zip"))
+                else:
+                    files.append(p)
+            content = {"name":name,
+                       "code":code_version(stage.func),
+                       "config":stage.config,
+                       "inputs":[self.key(i) for i in stage.inputs],
+                       "files":{f:self.file_hash(f) for f in files}}
+            self._keys[name] = hashlib.sha256(
+                json.dumps(content, sort_keys=True, default=str).encode()
+                ).hexdigest()[:16]
+        return self._keys[name]
+
+    def _cache_file(self, name):
+        return os.path.join(self.cache_dir, f"{name}-{self.key(name)}.bin")
+
+    def value(self, name):
+        """Return the value of a stage, from the cache if possible."""
+        if name in self._values:
+            return self._values[name]
+        file = self._cache_file(name)
+        if not self.force and os.path.exists(file):
+            logger.info("Loading stage '{}' from cache".format(name))
+            self._values[name] = load(file)
+            return self._values[name]
+        return self.compute(name)
+
+    def compute(self, name):
+        """Run a stage and cache its value."""
+        stage = self.stages[name]
+        args = [self.value(i) for i in stage.inputs]
+        logger.info("Running stage '{}'".format(name))
+        value = stage.func(*args, **stage.config)
+        dump(value, self._cache_file(name))
+        self._prune(name)
+        self._values[name] = value
+        return value
+
+    def _prune(self, name):
+        # remove cached values of previous keys of the stage
+        current = os.path.basename(self._cache_file(name))
+        for f in os.listdir(self.cache_dir):
+            if f.rsplit("-", 1)[0] == name and f != current:
+                os.remove(os.path.join(self.cache_dir, f))
+
+    def _saved(self, name):
+        # whether the outputs of the current key of a stage exist
+        entry = self.manifest["stages"].get(name)
+        path = preprocessing.dpath if self.out_path is None else self.out_path
+        return (entry is not None and entry["key"] == self.key(name)
+                and all(os.path.exists(path+o+".csv")
+                        for o in entry["outputs"]))
+
+    def _save(self, name, value):
+        # save the plot data of a stage, returns the names of the datasets
+        for o, (df, index) in value.items():
+            save_data(df, o, index=index, path=self.out_path)
+        return list(value)
+
+    def run(self, targets=None, force=False, jobs=1):
+        """Run stages and save the plot data of saving stages.
+
+        With more than one job, stages are run by a pool of processes as
+        soon as the stages they depend on are cached. Workers read the
+        values of input stages from the memory-mapped cache files, so
+        the loaded results are not copied to every worker.
+
+        Parameters
+        ----------
+        targets : list of str, optional
+            Names of the stages to be run (with the stages they depend
+            on). The default is None, i.e., all saving stages.
+        force : bool, optional
+            Whether to ignore cached values. The default is False.
+        jobs : int, optional
+            Number of processes running stages. The default is 1, i.e.,
+            stages are run in the current process.
+
+        Returns
+        -------
+        dict
+            Status of each target: "cached" (nothing to do), "saved" (value
+            from cache, outputs saved again) or "computed".
+
+        """
+
+        if targets is None:
+            targets = [n for n, s in self.stages.items() if s.save]
+        order = self.dependencies(targets)
+        cached = {n:not force and os.path.exists(self._cache_file(n))
+                  for n in order}
+        status = dict()
+        for name in targets:
+            if not cached[name]:
+                status[name] = "computed"
+            elif not self.stages[name].save or self._saved(name):
+                status[name] = "cached"
+            else:
+                status[name] = "saved"
+        # stages to be computed (targets and inputs of computed stages that
+        # are not cached) and targets only to be saved again
+        compute = set()
+        for name in reversed(order):
+            if not cached[name] and (name in targets or
+                                     any(name in self.stages[d].inputs
+                                         for d in compute)):
+                compute.add(name)
+        compute = [n for n in order if n in compute]
+        save = [n for n in targets if status[n] == "saved"]
+
+        self.force = force
+        try:
+            if jobs > 1 and len(compute) + len(save) > 1:
+                self._run_pool(compute, save, jobs)
+            else:
+                for name in order:
+                    if name in compute or name in save:
+                        value = self.value(name)
+                        if self.stages[name].save:
+                            self._record(name, self._save(name, value))
+        finally:
+            self._write_manifest()
+        return status
+
+    def _record(self, name, outputs):
+        self.manifest["stages"][name] = {"key":self.key(name),
+                                         "outputs":outputs}
+
+    def _run_pool(self, compute, save, jobs):
+        # keys are computed before the pipeline is sent to the workers
+        for name in compute + save:
+            self.key(name)
+        pending = set(compute)
+        todo = compute + save
+        running = dict()
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=jobs, initializer=_init_worker,
+                initargs=(self,)) as pool:
+            while todo or running:
+                # submit stages whose inputs are cached
+                for name in list(todo):
+                    if not any(i in pending for i in self.stages[name].inputs):
+                        todo.remove(name)
+                        running[pool.submit(_run_stage, name,
+                                            name in pending)] = name
+                done, _ = concurrent.futures.wait(
+                    running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for f in done:
+                    name = running.pop(f)
+                    outputs = f.result()
+                    pending.discard(name)
+                    if outputs is not None:
+                        self._record(name, outputs)
+
+    def outputs(self):
+        """Return the names of the saved datasets or None if missing."""
+        path = preprocessing.dpath if self.out_path is None else self.out_path
+        names = list()
+        for name, stage in self.stages.items():
+            entry = self.manifest["stages"].get(name)
+            if stage.save and entry is None:
+                return None
+            if stage.save:
+                names += entry["outputs"]
+        if not all(os.path.exists(path+o+".csv") for o in names):
+            return None
+        return names
+
+    def record_runs(self, files):
+        """Record the result files (and their runs) included in the outputs."""
+        runs = self.manifest.get("runs", dict())
+        included = dict()
+        for f in files:
+            h = self.file_hash(f)
+            entry = runs.get(f)
+            if entry is None or entry["hash"] != h:
+                entry = {"hash":h, "runs":run_labels(f)}
+            included[f] = entry
+        self.manifest["runs"] = included
+        self._write_manifest()
+
+    def _write_manifest(self):
+        tmp = f"{self._manifest_file}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp, self._manifest_file)
+
+    def __getstate__(self):
+        # values are not sent to worker processes
+        state = self.__dict__.copy()
+        state["_values"] = dict()
+        return state
+
+
+# pipeline of a worker process
+_worker = None
+
+def _init_worker(pipeline):
+    global _worker
+    _worker = pipeline
+    _worker.force = False
+
+def _run_stage(name, compute):
+    # run (or load) a stage in a worker process and save its plot data
+    try:
+        value = _worker.compute(name) if compute else _worker.value(name)
+        if _worker.stages[name].save:
+            return _worker._save(name, value)
+    finally:
+        # input values are read again from the memory-mapped cache
+        _worker._values.clear()
+
+
+def dump(value, file):
+    """Write a value to a cache file.
+
+    The value is pickled with the data buffers (e.g., of numpy and Arrow
+    arrays) written out-of-band after the pickle stream, aligned to 64
+    bytes, so they can be memory-mapped by load.
+    """
+    buffers = list()
+    def out_of_band(b):
+        try:
+            buffers.append(b.raw())
+        except BufferError:
+            # non-contiguous buffers are pickled in-band
+            return True
+        return False
+    data = pickle.dumps(value, protocol=5, buffer_callback=out_of_band)
+
+    start = 8 + 16 + 16*len(buffers)
+    table = list()
+    offset = _align(start + len(data))
+    for b in buffers:
+        table += [offset, b.nbytes]
+        offset = _align(offset + b.nbytes)
+
+    tmp = f"{file}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"PIPELINE")
+        f.write(struct.pack(f"<QQ{len(table)}Q", len(buffers), len(data), *table))
+        f.write(data)
+        for o, b in zip(table[::2], buffers):
+            f.write(b"\0" * (o - f.tell()))
+            f.write(b)
+    os.replace(tmp, file)
+
+
+def load(file):
+    """Read a value from a cache file written by dump.
+
+    Arrays of the value are backed by the memory-mapped file (and are
+    read-only), i.e., processes loading the same file share its pages.
+    """
+    with open(file, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:8] != b"PIPELINE":
+        raise ValueError(f"'{file}' is not a pipeline cache file.")
+    n, size = struct.unpack_from("<QQ", mm, 8)
+    table = struct.unpack_from(f"<{2*n}Q", mm, 24)
+    mv = memoryview(mm)
+    start = 24 + 16*n
+    return pickle.loads(mv[start:start+size],
+                        buffers=[mv[o:o+l] for o, l in zip(table[::2],
+                                                           table[1::2])])
+
+
+def _align(offset, alignment=64):
+    return -(-offset // alignment) * alignment
+
+
+_code_versions = dict()
+
+def code_version(func):
+    """Return a hash of the code a stage function depends on.
+
+    The hash covers the source of the function and of the functions and
+    classes of this module, the preprocessing and the dtype policy it
+    refers to (recursively, e.g., level_keys for element_11 and load_data
+    for load_results), and the values of plain module constants it refers
+    to. Changing one element thus only changes the keys of the stages
+    depending on it.
+    """
+    if func not in _code_versions:
+        h = hashlib.sha256()
+        for source in _sources(func, set()):
+            h.update(source.encode())
+        _code_versions[func] = h.hexdigest()
+    return _code_versions[func]
+
+
+def _own(obj):
+    # whether obj is defined in a module whose code is hashed
+    return getattr(obj, "__module__", None) in (__name__, preprocessing.__name__,
+                                                DtypePolicy.__module__)
+
+
+def _names(code):
+    # global and attribute names used by a code object and nested code
+    # objects (comprehensions, lambdas, inner functions)
+    names = set(code.co_names)
+    for c in code.co_consts:
+        if inspect.iscode(c):
+            names |= _names(c)
+    return names
+
+
+def _sources(obj, seen):
+    # sources of a function or class and of the code it refers to
+    if id(obj) in seen:
+        return []
+    seen.add(id(obj))
+    sources = [inspect.getsource(obj)]
+    if inspect.isclass(obj):
+        for v in vars(obj).values():
+            v = getattr(v, "__func__", v)
+            if inspect.isfunction(v):
+                for n in sorted(_names(v.__code__)):
+                    sources += _reference(n, v.__globals__, seen)
+        return sources
+    for n in sorted(_names(obj.__code__)):
+        sources += _reference(n, obj.__globals__, seen)
+    return sources
+
+
+def _reference(name, namespace, seen):
+    # sources of a name referred to by hashed code (a function, class or
+    # constant of the namespace or an attribute of a hashed module)
+    candidates = [namespace[name]] if name in namespace else []
+    candidates += [vars(m)[name] for m in namespace.values()
+                   if inspect.ismodule(m) and m.__name__ in
+                   (__name__, preprocessing.__name__) and name in vars(m)]
+    sources = list()
+    for v in candidates:
+        if (inspect.isfunction(v) or inspect.isclass(v)) and _own(v):
+            sources += _sources(v, seen)
+        elif (isinstance(v, (str, int, float, bool, list, tuple, dict))
+              and not name.startswith("__")):
+            sources.append(f"{name} = {v!r}")
+    return sources
+
+
+# - Root stages
+
+def load_results(path, include, filters, float32=False):
+    data = load_data(path, include=include, filters=filters,
+                     dtypes=DtypePolicy(float32=float32))
+    if data is None:
+        raise FileNotFoundError(f"No results found in '{path}'.")
+    return data
+
+
+def result_files(rpath):
+    # results zip files in a directory (or a single file)
+    if os.path.isfile(rpath):
+        return [rpath]
+    return sorted(os.path.join(rpath, f) for f in os.listdir(rpath)
+                  if f.endswith(".zip"))
+
+
+def run_labels(file):
+    # runs (scenarios) of a results zip file
+    run = load_run(file, include=["NewCapacity"],
+                   usecols={"NewCapacity":["RUN","VALUE"]}, aggregate=True)
+    return run_names([run])
+
+
+def read_naming(file):
+    naming = pd.read_csv(file, index_col=["NAME_IN_MODEL"])
+    return naming["NAME"]
+
+
+def read_mapping(file):
+    mapping = pd.read_csv(file, usecols=["LAD23CD","LAD23NM"],
+                          index_col=["LAD23CD"])
+    mapping.index.name = "REGION"
+    return mapping["LAD23NM"]
+
+
+def read_techcaps(file):
+    return pd.read_csv(file, index_col=("TECHNOLOGY"))
+
+
+def read_properties(file):
+    return pd.read_csv(file, index_col=["REGION","PROPERTY_TYPE","YEAR"])
+
+
+def year_scale():
+    # model years represent periods, values are scaled to an average year
+    years_map = pd.Series([2015]*6+[2021]*2+[2023]*2+
+                          [e for e in list(range(2025,2056,5))
+                           for i in range(5)]+
+                          [2060]*1,
+                          index=range(2015,2061))
+    xscale = 1/years_map.value_counts()
+    xscale.index.name = "YEAR"
+    xscale.name = "VALUE"
+    return xscale
+
+
+def run_names(data):
+    return list(data[0]["NewCapacity"].index.get_level_values("RUN").unique())
+
+
+# - Shared intermediates
+
+def heat_production(data, xscale, years):
+    # heat generation of building technologies (without heat distribution)
+    # as results for arrange_data
+    df = arrange_data(results=data,
+                      var="TotalProductionByTechnologyAnnual",
+                      xscale=xscale,
+                      filter_in={"YEAR":years,
+                                 "TECHNOLOGY":["DD","DNDO"]},
+                      filter_out={"TECHNOLOGY":["RAUP","WDIS"]},
+                      cleanup=False)
+    return [{"name":data[0]["name"],
+             "TotalProductionByTechnologyAnnual":df}]
+
+
+def emissions(data, xscale):
+    em = data[0]["AnnualEmissions"].copy()
+    # divide by number of years in period to get average annual emissions
+    em["VALUE"] = em["VALUE"].multiply(xscale,axis=0)
+    return em
+
+
+# - Data analysis elements
+
+def element_01(production, naming, zorder, tech_agg):
+    # Heat generation data
+    plot_data_01 = arrange_data(results=production,
+                                var="TotalProductionByTechnologyAnnual",
+                                zgroupby=["YEAR","RUN","TECHNOLOGY"],
+                                cgroupby={"TECHNOLOGY":{"slice":[0,4]}},
+                                reagg=tech_agg,
+                                naming=naming,
+                                zorder=zorder,
+                                )
+    return {"plot_data_01":(plot_data_01, True)}
+
+
+def element_02(production, naming, mapping, zorder, tech_agg):
+    # Heat generation local data (maps)
+    plot_data_02 = arrange_data(results=production,
+                                var="TotalProductionByTechnologyAnnual",
+                                zgroupby=["RUN","REGION","TECHNOLOGY","YEAR"],
+                                cgroupby={"TECHNOLOGY":{"slice":[0,4]},
+                                          "REGION":{"slice":[0,9]}},
+                                reagg=tech_agg,
+                                relative=["TECHNOLOGY"],
+                                naming=naming,
+                                zorder=zorder,
+                                )
+
+    plot_data_02n = plot_data_02.copy().reset_index()
+    plot_data_02n["REGION"] = plot_data_02n["REGION"].map(mapping)
+    return {"plot_data_02":(plot_data_02, True),
+            "plot_data_02n":(plot_data_02n, False)}
+
+
+def element_03(data, xscale, naming, years):
+    # Cost structure data
+    groupby = {"rules":[["contains",["WDIS","RAUP"],"Building heat distribution"],
+                        ["startswith",["BE"],"Building retrofit"],
+                        ["contains",["DD","DNDO"],"Building heat technologies"],
+                        ["regex",["^DH","SDIS"],"District heating systems"],
+                        ["contains",["TDIS","TTRA"],"Gas and power networks"],
+                        # supply technologies without "BS" after the first
+                        # two characters
+                        ["regex",["^(?!.{2,}BS).*(?:SNAT|SEXT)"],"Energy supply"]],
+               "default":"Others"}
+
+    order = ["Energy supply","Networks","District heat","Building retrofit",
+             "Building heating","Wet heating system","Others"]
+    plot_data_03 = arrange_data(results=data,
+                                var="CostTotalProcessed",
+                                xscale=xscale,
+                                filter_in={"YEAR":years},
+                                zgroupby=["YEAR","RUN","TECHNOLOGY"],
+                                cgroupby={"TECHNOLOGY":groupby},
+                                naming=naming,
+                                zorder=order,
+                                )
+
+    # convert to billions
+    plot_data_03.loc[:,"VALUE"] = plot_data_03["VALUE"]/1000
+    return {"plot_data_03":(plot_data_03, True)}
+
+
+def element_04(data, naming, mapping, short, fin, fout, cgroupby):
+    # Investment cost data for a category of technologies
+    d = arrange_data(results=data,
+                     var="CostCapital",
+                     filter_in={"TECHNOLOGY":fin,
+                                "YEAR":[2023,2025,2030,
+                                        2035,2040,2045,2050]},
+                     filter_out={"TECHNOLOGY":fout},
+                     zgroupby=["RUN","REGION","TECHNOLOGY"],
+                     cgroupby=cgroupby,
+                     naming=naming)
+
+    # convert to per year
+    d["VALUE"] = d["VALUE"]/(2054-2023)
+    d = d.reset_index()
+    d.loc[:,"REGION"] = d.loc[:,"REGION"].map(mapping)
+    loc = d.copy()
+
+    # convert to billions
+    d["VALUE"] = d["VALUE"]/1000
+    g = d.groupby(["RUN","TECHNOLOGY"]).sum()
+    return {f"plot_data_04_loc_{short}":(loc, False),
+            f"plot_data_04_{short}":(g, True)}
+
+
+def element_05(emissions, reduction_value):
+    # Net zero maps
+    # normalize with respect to base year
+    plot_data_05 = emissions/emissions.xs(2015, level=3)
+    # process to get first year emission reduction is achieved
+    plot_data_05 = plot_data_05.loc[plot_data_05["VALUE"]<=reduction_value]
+    plot_data_05 = plot_data_05.reset_index("YEAR")
+    plot_data_05 = plot_data_05.drop("VALUE",axis=1)
+    plot_data_05 = plot_data_05.groupby(["RUN","REGION","EMISSION"]).min()
+    plot_data_05 = plot_data_05.rename(columns={"YEAR":"VALUE"})
+    return {"plot_data_05":(plot_data_05, True)}
+
+
+def element_07(production, naming):
+    # Local heat generation
+    plot_data_07 = arrange_data(results=production,
+                                var="TotalProductionByTechnologyAnnual",
+                                zgroupby=["RUN","TECHNOLOGY","REGION"],
+                                cgroupby={"TECHNOLOGY":{"slice":[0,4]},
+                                          "REGION":{"slice":[0,9]}},
+                                naming=naming,
+                                )
+    return {"plot_data_07":(plot_data_07, True)}
+
+
+def element_08(data, xscale, naming, years):
+    # Local cost structure graph
+    groupby = {"rules":[["contains",["WDIS","RAUP"],"Building Heat Dist."],
+                        ["startswith",["BE"],"Building Heat Eff."],
+                        ["contains",["DD","DNDO"],"Building Heat Gen."],
+                        ["regex",["^DH","SDIS"],"DH systems"],
+                        ["contains",["TDIS","TTRA"],"T&D (except DH)"],
+                        ["regex",["^(?!.{2,}BS).*(?:SNAT|SEXT)"],"Supply"]],
+               "default":"Others"}
+
+    plot_data_08 = arrange_data(results=data,
+                                var="CostTotalProcessed",
+                                xscale=xscale,
+                                filter_in={"YEAR":years},
+                                zgroupby=["RUN","TECHNOLOGY","REGION"],
+                                cgroupby={"TECHNOLOGY":groupby,
+                                          "REGION":{"slice":[0,9]}},
+                                naming=naming,
+                                )
+    return {"plot_data_08":(plot_data_08, True)}
+
+
+def element_09(data, xscale, techcaps, mapping, years):
+    # HP installations - domestic ASHP
+    tech_agg = {"ASHP":"HP",
+                "GSHP": "HP"}
+    plot_data = arrange_data(results=data,
+                             var="NewCapacity",
+                             xscale=xscale,
+                             filter_in={"YEAR":years,
+                                        "TECHNOLOGY":["ASHPDD","GSHPDD"]},
+                             zgroupby=["RUN","REGION","TECHNOLOGY","YEAR"],
+                             cgroupby={"TECHNOLOGY":{"slice":[0,4]},
+                                       "REGION":{"slice":[0,9]}
+                                       },
+                             reagg=tech_agg,
+                             )
+    plot_data_09l = plot_data/techcaps.loc["ASHP"].mean()
+
+    replace = {2015:2015,
+               2022:2025,
+               2023:2025,
+               2025:2025,
+               2030:2035,
+               2035:2035,
+               2040:2045,
+               2045:2045,
+               2050:2055,
+               2055:2055}
+    # FIXME: implement weighted average
+    plot_data_09l = plot_data_09l.rename(index=replace)
+    plot_data_09l = plot_data_09l.groupby(["REGION","RUN",
+                                           "TECHNOLOGY","YEAR"]).mean()
+    plot_data_09l = plot_data_09l.reset_index()
+    plot_data_09l["REGION"] = plot_data_09l["REGION"].map(mapping)
+    # FIXME: this is a simplified calc, might need to improve
+    plot_data_09 = (plot_data.groupby(["RUN","TECHNOLOGY","YEAR"]).sum()
+                    /techcaps.loc["ASHP"].mean())
+    plot_data_09 = plot_data_09.rename(index=replace)
+    plot_data_09 = plot_data_09.groupby(["RUN",
+                                         "TECHNOLOGY","YEAR"]).mean()
+    return {"plot_data_09":(plot_data_09, True),
+            "plot_data_09l":(plot_data_09l, False)}
+
+
+def element_10(emissions, mapping):
+    # Emission pathways
+    plot_data_10 = emissions.xs("UK",level="REGION")
+    plot_data_10_loc = emissions.reset_index()
+    plot_data_10_loc.loc[:,"REGION"] = plot_data_10_loc.loc[:,"REGION"].map(mapping)
+    return {"plot_data_10":(plot_data_10, True),
+            "plot_data_10_loc":(plot_data_10_loc, False)}
+
+
+def element_11(data, properties, scenarios, xscale, mapping, props):
+    # Local heating cost (per property and per heat demand) of all property
+    # types in one pass, grouped by a property type key derived from the
+    # fuels (e.g., HWDDFL, SHDDFL -> FL) and property types (Flats -> FL)
+    ptd = {"TE":"Terraced",
+           "FL":"Flats",
+           "DE":"Detached",
+           "SD":"Semi-detached"}
+    fuel_key = {"rules":[["startswith",["HWDD"+p,"SHDD"+p],p] for p in props],
+                "default":None}
+    ptype_key = {"rules":[["startswith",[ptd[p]],p] for p in props],
+                 "default":None}
+
+    def by_prop(df, level, key):
+        # sum by run, local authority, property type key and year
+        idx = df.index
+        return df.groupby([idx.get_level_values("RUN"),
+                           level_keys(idx, "REGION", {"slice":[0,9]}),
+                           level_keys(idx, level, key, "PROP"),
+                           idx.get_level_values("YEAR")]).sum()
+
+    # calculate demand
+    dem = by_prop((data[0]["SpecifiedAnnualDemand"]
+                   *data[0]["SpecifiedDemandProfile"]).dropna(),
+                  "FUEL", fuel_key)
+    logger.debug(dem)
+
+    # get number of properties
+    idx = properties.index
+    pnum = properties.groupby([idx.get_level_values("REGION"),
+                               level_keys(idx, "PROPERTY_TYPE", ptype_key, "PROP"),
+                               idx.get_level_values("YEAR")]).sum()
+    pnum = pd.concat([pnum]*len(scenarios),
+                     keys=scenarios, names=['RUN'])
+    logger.debug(pnum)
+
+    cost = by_prop(data[0]["DemandCost"], "FUEL", fuel_key)
+    logger.debug(cost)
+
+    # calculate cost per demand or property
+    per_heat = (cost/dem) * 10**6
+    per_prop = (cost/pnum) * 10**6
+
+    levels = ["RUN","REGION","PROP","YEAR"]
+    agg = (cost.groupby(["RUN","PROP","YEAR"]).sum()
+           /pnum.groupby(["RUN","PROP","YEAR"]).sum()
+           * 10**6)
+    agg["REGION"] = "GB"
+    per_prop = pd.concat([per_prop, agg.reset_index().set_index(levels)])
+    agg = (cost.groupby(["RUN","PROP","YEAR"]).sum()
+           /dem.groupby(["RUN","PROP","YEAR"]).sum()
+           * 10**6)
+    agg["REGION"] = "GB"
+    per_heat = pd.concat([per_heat, agg.reset_index().set_index(levels)])
+
+    logger.debug(per_prop)
+    per_prop.loc[:,"VALUE"] = per_prop.loc[:,"VALUE"].multiply(xscale, axis=0)
+
+    outputs = dict()
+    for e, df in [("11", per_prop), ("12", per_heat)]:
+        df = df.loc[df.index.get_level_values("YEAR")<2060]
+        for p in props:
+            d = df.xs(p, level="PROP").reset_index()
+            n = d.copy()
+            n.loc[:,"REGION"] = n.loc[:,"REGION"].map(mapping)
+            outputs[f"plot_data_{e}_{p}"] = (d, False)
+            outputs[f"plot_data_{e}n_{p}"] = (n, False)
+    return outputs
+
+
+def level_keys(index, level, spec=None, name=None):
+    # labels of an index level as group key, mapped by spec (see
+    # map_labels) evaluated for the unique labels only
+    values = index.get_level_values(level)
+    if spec is not None:
+        uniques = values.unique()
+        mapped = pd.Series(map_labels(uniques, spec), index=uniques)
+        values = pd.Index(mapped.reindex(values).to_numpy(), dtype=object)
+    return values.rename(level if name is None else name)
+
+
+def build(rpath=preprocessing.rpath, dpath=preprocessing.dpath,
+          cache_dir=None, files=None, out_path=None, float32=False):
+    """Return the preprocessing pipeline.
+
+    Parameters
+    ----------
+    rpath : str, optional
+        Path of the directory with the results zip files. The default is
+        preprocessing.rpath.
+    dpath : str, optional
+        Path of the data directory with the input files, plot data is
+        saved there as well. The default is preprocessing.dpath.
+    cache_dir : str, optional
+        Path of the directory for cached stage values. The default is
+        None, i.e., the directory 'cache' in dpath.
+    files : list of str, optional
+        Paths of the results zip files to be loaded. The default is None,
+        i.e., all zip files in rpath.
+    out_path : str, optional
+        Path of the directory plot data is saved to. The default is None,
+        i.e., dpath.
+    float32 : bool, optional
+        Whether values of the loaded results are stored as float32 (see
+        DtypePolicy). The default is False.
+
+    Returns
+    -------
+    Pipeline
+
+    """
+
+    cache_dir = dpath+"cache" if cache_dir is None else cache_dir
+    p = Pipeline(cache_dir, out_path=dpath if out_path is None else out_path)
+
+    # years and technologies (or fuels) used by the data analysis elements,
+    # other rows are dropped when loading the data
+    years = [2015,2022,2023,2025,2030,2035,2040,2045,2050,2055]
+    dom_heat = {"startswith":["HWDD","SHDD"]}
+    filters = {"TotalProductionByTechnologyAnnual":{"YEAR":years,
+                                                    "TECHNOLOGY":{"contains":["DD","DNDO"]}},
+               "CostTotalProcessed":{"YEAR":years},
+               "CostCapital":{"YEAR":years,
+                              "TECHNOLOGY":{"contains":["TDIS","TTRA","DH","SDIS",
+                                                        "HPSNAT","DD","DNDO"]}},
+               "NewCapacity":{"YEAR":years},
+               "DemandCost":{"FUEL":dom_heat},
+               "SpecifiedAnnualDemand":{"FUEL":dom_heat},
+               "SpecifiedDemandProfile":{"FUEL":dom_heat}}
+
+    zo = ["NGBO","OIBO","ELST","ELRE","BMBO","HIUM","ASHP","AWHP","GSHP","H2BO",
+          "BELO", "BEST","BEFF"]
+    tech_agg = {"BEST":"BEFF",
+                "BELO": "BEFF",
+                "BEME": "BEFF",
+                "BEHI": "BEFF",
+                "AAHP": "ASHP",
+                "AWHP": "ASHP"}
+
+    # - Inputs
+    p.add("results", load_results, files=[rpath] if files is None else files,
+          path=rpath if files is None else files,
+          include=["TotalProductionByTechnologyAnnual",
+                   "CostTotalProcessed",
+                   "AnnualEmissions",
+                   "CostCapital",
+                   "NewCapacity",
+                   "DemandCost",
+                   "SpecifiedAnnualDemand",
+                   "SpecifiedDemandProfile"],
+          filters=filters, float32=float32)
+    p.add("naming", read_naming, files=[dpath+"naming.csv"],
+          file=dpath+"naming.csv")
+    mfile = dpath+"Local_Authority_District_to_Country_(April_2023)_Lookup_in_the_United_Kingdom.csv"
+    p.add("mapping", read_mapping, files=[mfile], file=mfile)
+    p.add("techcaps", read_techcaps, files=[dpath+"dwelling_tech_caps.csv"],
+          file=dpath+"dwelling_tech_caps.csv")
+    p.add("properties", read_properties, files=[dpath+"number_properties.csv"],
+          file=dpath+"number_properties.csv")
+    p.add("xscale", year_scale)
+    p.add("scenarios", run_names, inputs=["results"])
+
+    # - Shared intermediates
+    p.add("production", heat_production, inputs=["results","xscale"],
+          years=years)
+    p.add("emissions", emissions, inputs=["results","xscale"])
+
+    # - Data analysis elements
+    p.add("01", element_01, inputs=["production","naming"], save=True,
+          zorder=zo, tech_agg=tech_agg)
+    p.add("02", element_02, inputs=["production","naming","mapping"],
+          save=True, zorder=zo, tech_agg=tech_agg)
+    p.add("03", element_03, inputs=["results","xscale","naming"], save=True,
+          years=years)
+
+    groupby = {"rules":[["contains",["ASHP","GSHP","AWHP"],"Heat pumps"],
+                        ["contains",["WDIS","RAUP"],"Wet heating system"],
+                        ["startswith",["BE"],"Building retrofit"],
+                        ["contains",["OIBO","NGBO"],"Fossil fuel boilers"],
+                        ["contains",["ELST","ELRE"],"Electric heating"],
+                        ["contains",["HIUM"],"Heat interface"]],
+               "default":"Others"}
+    groupbyl = {"TECHNOLOGY":{"slice":[0,6]},
+                "REGION":{"slice":[0,9]}}
+    groupbys = {"TECHNOLOGY":groupby,
+                "REGION":{"slice":[0,9]}}
+    # investment cost categories: networks, district heating, H2 production
+    # and building technologies
+    for short, fin, fout, gb in [("net", ["TDIS","TTRA"], [], groupbyl),
+                                 ("dh", ["DH","SDIS"], ["DHMT"], groupbyl),
+                                 ("h2", ["HPSNAT"], [], groupbyl),
+                                 ("build", ["DD","DNDO"], [], groupbys)]:
+        p.add("04_"+short, element_04, inputs=["results","naming","mapping"],
+              save=True, short=short, fin=fin, fout=fout, cgroupby=gb)
+
+    p.add("05", element_05, inputs=["emissions"], save=True,
+          reduction_value=0.0001)
+    p.add("07", element_07, inputs=["production","naming"], save=True)
+    p.add("08", element_08, inputs=["results","xscale","naming"], save=True,
+          years=years)
+    p.add("09", element_09, inputs=["results","xscale","techcaps","mapping"],
+          save=True, years=years)
+    p.add("10", element_10, inputs=["emissions","mapping"], save=True)
+    p.add("11", element_11,
+          inputs=["results","properties","scenarios","xscale","mapping"],
+          save=True, props=["FL","TE","DE","SD"])
+
+    return p
+
+
+def append(rpath=preprocessing.rpath, dpath=preprocessing.dpath,
+           cache_dir=None, jobs=1, float32=False):
+    """Merge the plot data of new or changed results into the outputs.
+
+    Result files are compared with the files (and their hashes) recorded
+    in the manifest. Only new or changed files are loaded and the plot data
+    of their runs is computed by a pipeline of these files and of the
+    unchanged files with the same runs (values of a run are summed over
+    all its files). Rows of these runs and of runs of changed or removed
+    files are replaced in the saved plot data. All data analysis elements
+    are computed per run, so the merged plot data is the same as that of a
+    full run. If no plot data is
+    saved yet, the full pipeline is run.
+
+    Parameters
+    ----------
+    rpath : str, optional
+        Path of the directory with the results zip files. The default is
+        preprocessing.rpath.
+    dpath : str, optional
+        Path of the data directory. The default is preprocessing.dpath.
+    cache_dir : str, optional
+        Path of the directory for cached stage values. The default is
+        None, i.e., the directory 'cache' in dpath.
+    jobs : int, optional
+        Number of processes running stages. The default is 1.
+    float32 : bool, optional
+        Whether values of the loaded results are stored as float32. The
+        default is False.
+
+    Returns
+    -------
+    list of str
+        Paths of the result files loaded.
+
+    """
+
+    p = build(rpath, dpath, cache_dir, float32=float32)
+    files = result_files(rpath)
+    included = p.manifest.get("runs", dict())
+    outputs = p.outputs()
+    if not included or outputs is None:
+        logger.info("No plot data to append to, running all stages")
+        p.run(jobs=jobs)
+        p.record_runs(files)
+        return files
+
+    changed = [f for f in files
+               if f not in included or included[f]["hash"] != p.file_hash(f)]
+    removed = [f for f in included if f not in files]
+    if not changed and not removed:
+        logger.info("Plot data is up to date")
+        return list()
+
+    # runs to be replaced in the plot data, values of a run are summed over
+    # all files with the run, so a run is computed again from all its files
+    # (including unchanged files sharing runs with changed or removed ones)
+    runs_of = {f:(run_labels(f) if f in changed else included[f]["runs"])
+               for f in files}
+    runs = {r for f in changed+removed if f in included
+            for r in included[f]["runs"]}
+    runs |= {r for f in changed for r in runs_of[f]}
+    load = set(changed)
+    while True:
+        shared = {f for f in files
+                  if f not in load and runs.intersection(runs_of[f])}
+        if not shared:
+            break
+        load |= shared
+        runs |= {r for f in shared for r in runs_of[f]}
+    load = sorted(load)
+
+    if load:
+        logger.info("Computing plot data of {}".format(", ".join(load)))
+        out_path = os.path.join(p.cache_dir, "append", "")
+        shutil.rmtree(out_path, ignore_errors=True)
+        q = build(rpath, dpath, out_path, files=load, out_path=out_path,
+                  float32=float32)
+        q.run(jobs=jobs)
+
+    for o in outputs:
+        df = pd.read_csv(dpath+o+".csv")
+        df = df[~df["RUN"].isin(runs)]
+        if load and os.path.exists(out_path+o+".csv"):
+            df = pd.concat([df, pd.read_csv(out_path+o+".csv")],
+                           ignore_index=True)
+        save_data(df, o, index=False, path=dpath)
+    logger.info("Merged plot data of {} runs".format(len(runs)))
+
+    p.record_runs(files)
+    return changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Preprocess scenario data.")
+    parser.add_argument("stages", nargs="*",
+                        help="stages to run (default: all elements)")
+    parser.add_argument("--force", action="store_true",
+                        help="ignore cached stage values")
+    parser.add_argument("--append", action="store_true",
+                        help="only add new or changed results to the plot data")
+    parser.add_argument("--jobs", "-j", type=int, default=1,
+                        help="number of processes running stages")
+    parser.add_argument("--float32", action="store_true",
+                        help="store values of the loaded results as float32")
+    parser.add_argument("--cache-dir", default=None,
+                        help="directory for cached stage values")
+    parser.add_argument("--results", default=preprocessing.rpath,
+                        help="directory with the results zip files")
+    parser.add_argument("--data", default=preprocessing.dpath,
+                        help="data directory")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    rpath = os.path.join(args.results, "")
+    dpath = os.path.join(args.data, "")
+    if args.append:
+        append(rpath, dpath, args.cache_dir, jobs=args.jobs,
+               float32=args.float32)
+        return
+
+    p = build(rpath, dpath, args.cache_dir, float32=args.float32)
+    status = p.run(args.stages or None, force=args.force, jobs=args.jobs)
+    for name, s in status.items():
+        logger.info("Stage {}: {}".format(name, s))
+    if not args.stages:
+        p.record_runs(result_files(rpath))
+
+
+if __name__ == "__main__":
+    main()
@@ -11,11 +11,20 @@ import sys
 import os
 import logging
 import json
+import multiprocessing
+import re
+from pathlib import Path
 
 
 import pandas as pd
+import numpy as np
 import zipfile
 
+appdir = str(Path(__file__).parent.parent.resolve())
+sys.path.insert(0, appdir)
+
+from component.DtypePolicy import DtypePolicy
+
 
 logger = logging.getLogger(__name__)
 
@@ -26,22 +35,326 @@ dpath = "../data/"
 rpath = "../../results/"
 dpath = "../data/"
 
-def load_data(path, exclude=None, include=None):
+def load_run(file, exclude=None, include=None, aggregate=False,
+             chunksize=10**6, usecols=None, filters=None, dtypes=None):
+    """Load model data of a single run from a zip file.
+    
+    Resources are read in chunks. Only the given columns are parsed and
+    rows not matching the filters are dropped from each chunk. If aggregate
+    is True, values with the same index are summed for each chunk and the
+    chunks are folded into one DataFrame, so the memory needed does not
+    exceed the (aggregated) run. Values are summed in any case if columns
+    of the primary key are not read (usecols) or dropped after filtering,
+    so the index of a resource is always unique.
+
+    Parameters
+    ----------
+    file : str
+        Path of the results zip file.
+    exclude: list of str, optional
+        List of parameter and variable names to be excluded. The 
+        default is None.
+    include: list str, optional
+        List of parameter and variable names to be include or "all". The 
+        default is None, i.e., "all".
+    aggregate : bool, optional
+        Whether to sum values with the same index. The default is False.
+    chunksize : int, optional
+        Number of rows read at once. The default is 10**6.
+    usecols : dict of lists, optional
+        Dict of lists of columns (including VALUE) to be read for
+        variables (dict keys). Index levels not read are summed over. The
+        default is None, i.e., all columns.
+    filters : dict of dicts, optional
+        Dict of row filters for variables (dict keys), see row_mask.
+        The default is None.
+    dtypes : DtypePolicy, optional
+        Dtype policy applied to each chunk. The default is None, i.e.,
+        default dtypes.
+
+    Returns
+    -------
+    Dict
+
+    """
+    
+    run = dict()
+    
+    with zipfile.ZipFile(file) as zf:
+        pack = json.load(zf.open('datapackage.json'))
+        run['name'] = pack["name"]
+        
+        for r in pack["resources"]:
+            if exclude is not None and r["title"] in exclude:
+                continue
+            if (include is None) or (include == "all") or (r["title"] in include):
+                cols = None if usecols is None else usecols.get(r["title"])
+                rfilter = None if filters is None else filters.get(r["title"])
+                # columns only needed to filter rows are dropped afterwards
+                extra = list()
+                if cols is not None and isinstance(rfilter, dict):
+                    extra = [c for c in rfilter.keys() if c not in cols]
+                    cols = list(cols) + extra
+                index = [c for c in r['schema']['primaryKey']
+                         if cols is None or c in cols]
+                # rows are only unique for the full primary key
+                reduced = (len(index) < len(r['schema']['primaryKey']) or
+                           any(c in index for c in extra))
+                
+                parts = list()
+                for chunk in pd.read_csv(zf.open(r["path"]),
+                                         index_col=index,
+                                         usecols=cols,
+                                         chunksize=chunksize):
+                    if rfilter is not None:
+                        chunk = chunk[row_mask(chunk, rfilter)]
+                    if extra:
+                        chunk = chunk.droplevel([c for c in extra if c in index])
+                        chunk = chunk.drop(columns=[c for c in extra if c not in index])
+                    if dtypes is not None:
+                        chunk = dtypes.apply(chunk)
+                    parts.append(chunk)
+                    if aggregate or reduced:
+                        parts = [fold(parts)]
+                run[r["title"]] = pd.concat(parts, axis=0)
+                
+                #FIXME: delete, arbitrary renaming for test purposes
+                run[r["title"]] = run[r["title"]].rename(index={'NODE_UK|LA|SO':'nz-2050_hp-00',
+                                                                'NZ_UK|LA|SO':'nz-2045_hp-00',
+                                                                'NZDH_UK|LA|SO':'nz-2040_hp-00',
+                                                                'NZHP_UK|LA|SO':'nz-2050_hp-01',
+                                                                'NZLP_UK|LA|SO':'nz-2045_hp-01',
+                                                                'NZHY_UK|LA|SO':'nz-2040_hp-01'})
+    
+    return run
+
+
+def row_mask(df, rfilter):
+    """Return a boolean mask of the rows matching a row filter.
+    
+    The filter is a dict with index level or column names as keys and
+    either a list of values (rows with one of the values are kept) or a
+    dict {"contains": list}, {"startswith": list} or {"exact": list} (rows
+    with labels containing, starting with or equal to one of the strings
+    are kept, see match_labels) as values.
+    All conditions have to be met. Alternatively, the filter can be a
+    function returning the mask for a DataFrame (it needs to be defined
+    at module level if runs are loaded in parallel).
+
+    Parameters
+    ----------
+    df : DataFrame
+        DataFrame with the data.
+    rfilter : dict or func
+        Row filter.
+
+    Returns
+    -------
+    ndarray
+
+    """
+    
+    if callable(rfilter):
+        return np.asarray(rfilter(df), dtype=bool)
+    
+    mask = np.ones(len(df), dtype=bool)
+    for c, v in rfilter.items():
+        labels = df.index if c in df.index.names else df[c]
+        if isinstance(v, dict):
+            mode, v = next(iter(v.items()))
+        else:
+            mode = "exact"
+        mask &= label_mask(labels, v, mode, level=c)
+    return mask
+
+
+def match_labels(labels, patterns, mode="contains"):
+    """Return a boolean mask of the labels matching any of the patterns.
+    
+    Labels and patterns are compared as strings in one vectorized pass
+    over all labels.
+
+    Parameters
+    ----------
+    labels : Index or array-like
+        Labels to be tested (usually unique labels).
+    patterns : list
+        Patterns the labels are tested against.
+    mode : str, optional
+        "contains" (label contains a pattern), "startswith" (label starts
+        with a pattern), "exact" (label equals a pattern) or "regex" (a
+        pattern, a regular expression, matches within the label). The
+        default is "contains".
+
+    Returns
+    -------
+    ndarray
+
+    """
+    
+    labels = pd.Series(np.asarray(labels, dtype=object), dtype=object).astype(str)
+    patterns = [str(p) for p in patterns]
+    if not patterns:
+        return np.zeros(len(labels), dtype=bool)
+    
+    if mode == "contains":
+        m = labels.str.contains("|".join(re.escape(p) for p in patterns),
+                                regex=True)
+    elif mode == "startswith":
+        m = labels.str.startswith(tuple(patterns))
+    elif mode == "exact":
+        m = labels.isin(patterns)
+    elif mode == "regex":
+        m = labels.str.contains("|".join("(?:{})".format(p) for p in patterns),
+                                regex=True)
+    else:
+        raise ValueError("Unknown match mode '{}'.".format(mode))
+    return m.to_numpy(dtype=bool)
+
+
+def label_mask(labels, patterns, mode="contains", level=None):
+    """Return a boolean mask of the rows with labels matching any pattern.
+    
+    The patterns are matched against the unique labels only (see
+    match_labels) and the result is broadcast to the rows using the codes
+    of the labels, so the cost scales with the number of rows rather than
+    the number of labels times the number of patterns.
+
+    Parameters
+    ----------
+    labels : Index, MultiIndex, Series or array-like
+        Labels of the rows.
+    patterns : list
+        Patterns the labels are tested against.
+    mode : str, optional
+        Match mode, see match_labels. The default is "contains".
+    level : str, optional
+        Level to be used if labels is a MultiIndex. The default is None.
+
+    Returns
+    -------
+    ndarray
+
+    """
+    
+    if isinstance(labels, pd.MultiIndex):
+        n = labels.names.index(level)
+        codes, uniques = labels.codes[n], labels.levels[n]
+        # missing labels (code -1) are matched as "nan"
+        m = match_labels(list(uniques)+[np.nan], patterns, mode)
+        return m[codes]
+    
+    codes, uniques = pd.factorize(np.asarray(labels, dtype=object),
+                                  use_na_sentinel=False)
+    return match_labels(uniques, patterns, mode)[codes]
+
+
+def map_labels(labels, spec):
+    """Map labels to aggregate labels based on a mapping spec.
+    
+    The spec is evaluated once for each of the given (unique) labels and
+    can be one of the following:
+        
+    - {"slice": [start, stop]}: label is cut to label[start:stop].
+    - {"rules": [[mode, patterns, value], ...], "default": value}: label is
+      mapped to the value of the first rule with a pattern matching the
+      label (see match_labels for modes) or to the default value if no
+      rule matches (the label is kept if no default is given).
+    - {"map": dict} or dict: label is looked up in dict (the label is kept
+      if not in dict).
+    - func: label is mapped to func(label).
+
+    Parameters
+    ----------
+    labels : Index or array-like
+        Labels to be mapped.
+    spec : dict or func
+        Mapping spec.
+
+    Returns
+    -------
+    ndarray
+
+    """
+    
+    labels = pd.Index(labels)
+    if callable(spec):
+        return np.array([spec(l) for l in labels], dtype=object)
+    
+    if "slice" in spec:
+        return np.asarray(labels.astype(str).str.slice(*spec["slice"]),
+                          dtype=object)
+    
+    if "rules" in spec:
+        res = np.array(labels, dtype=object)
+        if "default" in spec:
+            res[:] = spec["default"]
+        todo = np.ones(len(labels), dtype=bool)
+        for mode, patterns, value in spec["rules"]:
+            m = todo & match_labels(labels, patterns, mode)
+            res[m] = value
+            todo &= ~m
+        return res
+    
+    mapping = spec["map"] if "map" in spec else spec
+    return np.array([mapping.get(l, l) for l in labels], dtype=object)
+
+
+def fold(parts):
+    """Concatenate DataFrames and sum values with the same index.
+    
+    Only columns present in all DataFrames are kept.
+
+    Parameters
+    ----------
+    parts : list of DataFrame
+        DataFrames with the same index levels.
+
+    Returns
+    -------
+    DataFrame
+
+    """
+    
+    v = pd.concat(parts, axis=0, join="inner")
+    return v.groupby(level=[i for i in range(v.index.nlevels)]).sum()
+
+
+def load_data(path, exclude=None, include=None, jobs=None, chunksize=10**6,
+              usecols=None, filters=None, dtypes=None):
     """Load and aggregate model data from zip files.
     
+    Runs are loaded in parallel by a pool of processes and folded into the
+    aggregate as they arrive, so that not all runs have to be kept in
+    memory at once.
 
     Parameters
     ----------
-    path : str
+    path : str or list of str
         Path for a result file or to the directory where one or more the 
         results zip files are saved. All zip files in the folder will be 
-        loaded.
+        loaded. Can also be a list of paths of result files.
     exclude: list of str
         List of parameter and variable names to be excluded. The 
         default is None.
     include: list str
         List of parameter and variable names to be include or "all". The 
-        default is "all".
+        default is None, i.e., "all".
+    jobs : int, optional
+        Number of processes used to load runs. If 1, runs are loaded in
+        the current process. The default is None, i.e., the number of CPUs.
+    chunksize : int, optional
+        Number of rows of a resource read at once. The default is 10**6.
+    usecols : dict of lists, optional
+        Dict of lists of columns (including VALUE) to be read for
+        variables (dict keys). The default is None, i.e., all columns.
+    filters : dict of dicts, optional
+        Dict of row filters for variables (dict keys) applied while
+        reading, see row_mask. The default is None.
+    dtypes : DtypePolicy, optional
+        Dtype policy applied while reading. The memory saved is logged
+        for each variable. The default is None, i.e., DtypePolicy() (YEAR
+        as int16, VALUE as float64).
 
     Returns
     -------
@@ -49,13 +362,21 @@ def load_data(path, exclude=None, include=None):
 
     """
     
-    if not os.path.exists(path):
+    dtypes = DtypePolicy() if dtypes is None else dtypes
+    
+    if not isinstance(path, list) and not os.path.exists(path):
         logger.warning('The result directory or file does not exist.')
         return
     
     logger.info("Loading results")
     
-    if os.path.isfile(path):
+    if isinstance(path, list):
+        packf = sorted(path)
+        if not packf:
+            logger.warning("There are no results to load.")
+            return
+    
+    elif os.path.isfile(path):
         packf = [path]
     
     else:
@@ -68,65 +389,77 @@ def load_data(path, exclude=None, include=None):
             logger.warning("There are no results in the directory to load.")
             return          
         
-    results = []
-
-
-    # go through each zip file and add as dictionary to results list
-    for f in packf:
-        run = dict()
-        
-        zf = zipfile.ZipFile(f)
+    if len(packf) == 1:
+        results = [load_run(packf[0], exclude=exclude, include=include,
+                            chunksize=chunksize, usecols=usecols,
+                            filters=filters, dtypes=dtypes)]
+        log_memory(results)
+        return results
+
+    # variables of the aggregate are those of the first run
+    with zipfile.ZipFile(packf[0]) as zf:
         pack = json.load(zf.open('datapackage.json'))
-        run['name'] = pack["name"]
-        
-        for r in pack["resources"]:
-            if exclude is not None and r["title"] in exclude:
-                continue
-            if (include == "all") or (include !="all" and r["title"] in include):
-                run[r["title"]] = pd.read_csv(zf.open(r["path"]),
-                                           index_col=r['schema']['primaryKey'])
-                
-                #FIXME: delete, arbitrary renaming for test purposes
-                run[r["title"]] = run[r["title"]].rename(index={'NODE_UK|LA|SO':'nz-2050_hp-00',
-                                                                'NZ_UK|LA|SO':'nz-2045_hp-00',
-                                                                'NZDH_UK|LA|SO':'nz-2040_hp-00',
-                                                                'NZHP_UK|LA|SO':'nz-2050_hp-01',
-                                                                'NZLP_UK|LA|SO':'nz-2045_hp-01',
-                                                                'NZHY_UK|LA|SO':'nz-2040_hp-01'})
-            
-        results.append(run)
+    keys = [r["title"] for r in pack["resources"]
+            if (exclude is None or r["title"] not in exclude) and
+            ((include is None) or (include == "all") or (r["title"] in include))]
+
+    logger.info("Load and aggregate results")
+    
+    # aggregate and pending runs for each variable, pending runs are folded
+    # into the aggregate once they are as large as the aggregate
+    agg = {k:list() for k in keys}
+    
+    args = [(f, None, keys, True, chunksize, usecols, filters, dtypes)
+            for f in packf]
+    jobs = os.cpu_count() if jobs is None else jobs
+    if jobs > 1:
+        pool = multiprocessing.Pool(min(jobs, len(packf)))
+        runs = pool.imap_unordered(load_run_star, args)
+    else:
+        pool = None
+        runs = map(load_run_star, args)
     
-    logger.info("Loaded results")
-
-
-    logger.info("Aggregate results")
+    try:
+        for i, run in enumerate(runs):
+            for k, v in run.items():
+                if k not in agg:
+                    continue
+                parts = agg[k]
+                parts.append(v)
+                if sum(len(p) for p in parts[1:]) >= len(parts[0]):
+                    agg[k] = [fold(parts)]
+            logger.info("Aggregated run {} of {}".format(i+1, len(packf)))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
     
-    res = list()
-    if len(results) == 1:
-        res = res + results
-   
-    else:
-        result = results[0]
-        
-   
-        for k,v in result.items():
-            if k == "name":
-                result[k] = "aggregation_of_runs"
-                continue
-            v = pd.concat([v]+[r[k] for r in results[1:] if k in r],
-                          axis=0,join="inner")
-            result[k] = v.groupby(level=[i for i in
-                                  range(v.index.nlevels)]).sum()
-        res.append(result)
-   
-    results = res
+    result = {"name":"aggregation_of_runs"}
+    for k in keys:
+        if agg[k]:
+            result[k] = fold(agg[k])
     
-    return results
+    log_memory([result])
+
+    return [result]
+
+
+def log_memory(results):
+    # log memory of loaded variables and memory saved by the dtype policy
+    logger.info("Loaded results, memory by variable:\n{}".format(
+        DtypePolicy.format_report(DtypePolicy.report(
+            {k:v for k, v in results[0].items() if k != "name"}))))
+
+
+def load_run_star(args):
+    # unpack arguments for load_run (used with process pool)
+    return load_run(*args)
 
 
 def arrange_data(results, var, xy=False,xfilter=None, xscale=None,
                  zfilter=None, zgroupby=None,cgroupby=None,
-                 filter_in=None, filter_out=None,ffilter=None,fgroupby=None,
+                 filter_in=None, filter_out=None,filter_mode="contains",
+                 ffilter=None,fgroupby=None,
                  an_change=False,
                  cleanup=True,
                  relative=None,zorder=None,reagg=None,
@@ -153,9 +486,11 @@ def arrange_data(results, var, xy=False,xfilter=None, xscale=None,
     zgroupby : str, or list of str, optional
         A set or list of sets indicating the levels to which data is
         grouped/aggregated. The default is None.
-    cgroupby : dict, or func, optional
-        A dict or function mapping level values to an aggregate value.
-        The default is None.
+    cgroupby : dict, optional
+        Dict of mapping specs (dict values, see map_labels) for index levels
+        (dict keys) mapping level values to an aggregate value, e.g.,
+        {"TECHNOLOGY":{"slice":[0,4]}}. The mapping is evaluated for the
+        unique level values only. The default is None.
     filter_in : dict of lists, optional
         Dict of list (of strings) for which data labels are tested and if 
         NOT present are excluded. Dict keys are the index level names.
@@ -164,6 +499,10 @@ def arrange_data(results, var, xy=False,xfilter=None, xscale=None,
         Dict of list (of strings) for which data labels are tested and if 
         present are excluded. Dict keys are the index level names.
         The default is None.
+    filter_mode : str or dict, optional
+        How labels are tested for filter_in and filter_out: "contains",
+        "startswith" or "exact" (see match_labels), or a dict with modes
+        for index levels (dict keys). The default is "contains".
     zorder : list, optional
         List of z-axis labels that is used to reorder (only relevant for
         appearance in some graph types). The default is None.
@@ -210,24 +549,15 @@ def arrange_data(results, var, xy=False,xfilter=None, xscale=None,
     
     # filter
     if (filter_in is not None) or (filter_out is not None):
-        lab = dict()
-        ind = df.index.to_frame()
+        mask = np.ones(len(df), dtype=bool)
         for il in df.index.names:
-            
-            if ((filter_in is not None) and (filter_out is not None) and
-                (il in filter_in.keys()) and (il in filter_out.keys())):
-                lab[il] = [e for e in ind[il].unique()
-                           if any(str(s) in str(e) for s in filter_in[il]) and
-                            all(str(s) not in str(e) for s in filter_out[il])]
-            elif ((filter_in is not None) and (il in filter_in.keys())):
-                lab[il] = [e for e in ind[il].unique()
-                           if any(str(s) in str(e) for s in filter_in[il])]
-            elif ((filter_out is not None) and (il in filter_out.keys())):
-                lab[il] = [e for e in ind[il].unique()
-                           if all(str(s) not in str(e) for s in filter_out[il])]
-            else:
-                lab[il] = slice(None)
-        df = df.loc[tuple([s for s in lab.values()]),:]
+            mode = (filter_mode.get(il, "contains")
+                    if isinstance(filter_mode, dict) else filter_mode)
+            if (filter_in is not None) and (il in filter_in.keys()):
+                mask &= label_mask(df.index, filter_in[il], mode, level=il)
+            if (filter_out is not None) and (il in filter_out.keys()):
+                mask &= ~label_mask(df.index, filter_out[il], mode, level=il)
+        df = df[mask]
         
     logger.info("Plot 4")    
     # scale values if required  
@@ -243,18 +573,21 @@ def arrange_data(results, var, xy=False,xfilter=None, xscale=None,
 
     # groupby content of level based on function or dict
     if cgroupby is not None:
+        if not isinstance(df.index, pd.MultiIndex):
+            df.index = pd.MultiIndex.from_arrays([df.index])
+        levels = list(df.index.levels)
+        codes = list(df.index.codes)
         for k,v in cgroupby.items():
-            idx = df.index.to_frame()
-            if isinstance(v, dict):
-                agg = df.index.get_level_values(k).to_series().replace(v).to_list()
-            if callable(v):
-                agg = [v(i) for i in df.index.get_level_values(k)]
-            
-            idx = idx.rename(columns={k:k+"_"})
-            idx.insert(list(idx.columns).index(k+"_"), k, agg)
-            df.index = pd.MultiIndex.from_frame(idx)
-    
-        df = df.groupby([l for l in df.index.names if l[:-1] not in list(cgroupby.keys())]).sum()
+            # map the unique labels and broadcast through the codes
+            n = df.index.names.index(k)
+            mcodes, mlabels = pd.factorize(map_labels(levels[n], v))
+            levels[n] = pd.Index(mlabels, name=k)
+            codes[n] = np.where(codes[n] >= 0, mcodes[codes[n]], -1)
+        df.index = pd.MultiIndex(levels=levels, codes=codes,
+                                 names=df.index.names,
+                                 verify_integrity=False)
+    
+        df = df.groupby(level=[l for l in df.index.names]).sum()
         
 
     # calculate relative values if required
@@ -324,473 +657,51 @@ def arrange_data(results, var, xy=False,xfilter=None, xscale=None,
     return df
 
 
+def save_data(df, name, index=True, path=None):
+    """Save data for dashboard as CSV and columnar (Parquet) file.
+
+    The Parquet file stores label columns (e.g., RUN, REGION, TECHNOLOGY)
+    dictionary-encoded, YEAR as int16 and values as float32 (see
+    DtypePolicy). It is preferred by the
+    dashboard if present. If pyarrow is not available, only the CSV file
+    is written.
+
+    Parameters
+    ----------
+    df : DataFrame
+        DataFrame with the data.
+    name : str
+        Name of the dataset, i.e., file name without extension.
+    index : bool, optional
+        Whether to write the index (as columns). The default is True.
+    path : str, optional
+        Path of the directory the files are saved to. The default is None,
+        i.e., the data directory (dpath).
+
+    Returns
+    -------
+    None.
+
+    """
+
+    path = dpath if path is None else path
+    df.to_csv(path+name+".csv", index=index)
+
+    df = df.reset_index() if index else df.reset_index(drop=True)
+    default = DtypePolicy.default_nbytes(df)
+    df = DtypePolicy(float32=True).apply(df)
+    used = DtypePolicy.nbytes(df)
+    logger.info("Saving '{}', {:.2f} MB in memory ({:.0%} saved by dtypes)".format(
+        name, used/2**20, 1-used/default if default else 0))
+    try:
+        df.to_parquet(path+name+".parquet", index=False)
+    except ImportError:
+        logger.warning("pyarrow not available, '{}' only saved as CSV.".format(name))
+
+
 if __name__ == "__main__":
     
-    # load data
-    data = load_data(rpath,include=["TotalProductionByTechnologyAnnual",
-                                   "CostTotalProcessed",
-                                   "AnnualEmissions",
-                                   "CostCapital",
-                                   "NewCapacity",
-                                   "DemandCost",
-                                   "SpecifiedAnnualDemand",
-                                   "SpecifiedDemandProfile"])
-    
-    # config for data processing
-    zo = ["NGBO","OIBO","ELST","ELRE","BMBO","HIUM","ASHP","AWHP","GSHP","H2BO",
-          "BELO", "BEST","BEFF"]
-    
-    naming = pd.read_csv(dpath+"naming.csv",
-                         index_col=["NAME_IN_MODEL"])
-    naming = naming["NAME"]
-    
-    years_map = pd.Series([2015]*6+[2021]*2+[2023]*2+
-                          [e for e in list(range(2025,2056,5))
-                           for i in range(5)]+
-                          [2060]*1,
-                          index=range(2015,2061))
-    xscale=1/years_map.value_counts()
-    xscale.index.name="YEAR"
-    xscale.name="VALUE"
-    
-    tech_agg = {"BEST":"BEFF",
-                "BELO": "BEFF",
-                "BEME": "BEFF",
-                "BEHI": "BEFF",
-                "AAHP": "ASHP",
-                "AWHP": "ASHP"}
-    scenarios = list(data[0]
-                     ["NewCapacity"].index.get_level_values("RUN").unique())
-    
-    mapping = pd.read_csv(dpath+'Local_Authority_District_to_Country_(April_2023)_Lookup_in_the_United_Kingdom.csv',
-                      usecols=["LAD23CD","LAD23NM"],
-                      index_col=["LAD23CD"])
-    mapping.index.name="REGION"
-    mapping = mapping ["LAD23NM"]
-    # Data analysis element 01 –  Heat generation data
-    plot_data_01 = arrange_data(results=data,
-                             var="TotalProductionByTechnologyAnnual",
-                             xscale=xscale,
-                             filter_in={"YEAR":[2015,2022,2023,2025,2030,
-                                                2035,2040,2045,2050,2055],
-                                        "TECHNOLOGY":["DD","DNDO"]},
-                             filter_out={"TECHNOLOGY":["RAUP","WDIS"]},
-                             zgroupby=["YEAR","RUN","TECHNOLOGY"],
-                             cgroupby={"TECHNOLOGY":lambda x: x[0:4]},
-                             reagg=tech_agg,
-                             naming=naming,
-                             zorder=zo,
-                             )
-    # save data
-    plot_data_01.to_csv(dpath+"plot_data_01.csv")
-    
-    
-    # Data analysis element 02 –  Heat generation local data (maps)
-    plot_data_02 = arrange_data(results=data,
-                             var="TotalProductionByTechnologyAnnual",
-                             xscale=xscale,
-                             filter_in={"YEAR":[2015,2022,2023,2025,2030,
-                                                2035,2040,2045,2050,2055],
-                                        "TECHNOLOGY":["DD","DNDO"]},
-                             filter_out={"TECHNOLOGY":["RAUP","WDIS"]},
-                             zgroupby=["RUN","REGION","TECHNOLOGY","YEAR"],
-                             cgroupby={"TECHNOLOGY":lambda x: x[0:4],
-                                       "REGION":lambda x: x[0:9]},
-                             reagg=tech_agg,
-                             relative=["TECHNOLOGY"],
-                             naming=naming,
-                             zorder=zo,
-                             )
-
-    
-    plot_data_02.to_csv(dpath+"plot_data_02.csv")
-    
-    # save data
-
-    plot_data_02n = plot_data_02.copy().reset_index()
-    plot_data_02n["REGION"] = plot_data_02n["REGION"].map(mapping)
-    plot_data_02n.to_csv(dpath+"plot_data_02n.csv",index=False)
-       
-    # Data analysis element 03 –  Cost structure data
-    
-    def groupby(x):
-        if ("WDIS" in x) or ("RAUP" in x):
-            n = "Building heat distribution"
-        elif x.startswith("BE"):
-            n = "Building retrofit"
-        elif ("DD" in x) or ("DNDO" in x):
-            n = "Building heat technologies"
-        elif x.startswith("DH") or ("SDIS" in x):
-            n = "District heating systems"
-        elif ("TDIS" in x) or ("TTRA" in x):
-            n = "Gas and power networks"
-        elif (("SNAT" in x) or ("SEXT" in x)) and ("BS" not in x[2:]):
-            n = "Energy supply"
-        else:
-            n = "Others"   
-        return n
-    
-    order = ["Energy supply","Networks","District heat","Building retrofit",
-             "Building heating","Wet heating system","Others"]
-    plot_data_03 = arrange_data(results=data,
-                             var="CostTotalProcessed",
-                             xscale=xscale,
-                             filter_in={"YEAR":[2015,2022,2023,2025,2030,
-                                                2035,2040,2045,2050,2055]},
-                             zgroupby=["YEAR","RUN","TECHNOLOGY"],
-                             cgroupby={"TECHNOLOGY":groupby},
-                             naming=naming,
-                             zorder=order,
-                             )
-    
-    # convert to billions
-    plot_data_03.loc[:,"VALUE"] =  plot_data_03["VALUE"]/1000
-    
-    # save data
-    plot_data_03.to_csv(dpath+"plot_data_03.csv")   
-    
-    
-    
-    # Data analysis element 04 –  Investment cost data 
-    def groupby(x):
-        if ("ASHP" in x) or ("GSHP" in x) or ("AWHP" in x):
-            n = "Heat pumps"
-        elif ("WDIS" in x) or ("RAUP" in x):
-            n = "Wet heating system"
-        elif x.startswith("BE"):
-            n = "Building retrofit"
-        elif ("OIBO" in x) or ("NGBO" in x):
-            n = "Fossil fuel boilers"
-        elif ("ELST" in x) or ("ELRE" in x):
-            n = "Electric heating"
-        elif ("HIUM" in x):
-            n = "Heat interface"
-        else:
-            n = "Others"   
-        return n
-    
-    groupbyl = {"TECHNOLOGY":lambda x: x[0:6],
-                "REGION":lambda x: x[0:9]}
-    groupbys = {"TECHNOLOGY":groupby,
-                "REGION":lambda x: x[0:9]}
-
-    
-    plots = [{"gb":groupbyl,
-              "fin":["TDIS","TTRA"],
-              "fout":[],
-              "title" :"Networks",
-              "short":"net"},
-              {"gb":groupbyl,
-                "fin":["DH","SDIS"],
-                "fout":["DHMT"],
-                "title" : "District heating",
-                "short":"dh"},
-              {"gb":groupbyl,
-            "fin":["HPSNAT"],
-            "fout":[],
-            "title" :"H2 production",
-            "short":"h2"},
-              {"gb":groupbys,
-                "fin":["DD","DNDO"],
-                "fout":[],
-                "title" : "Building techs",
-                "short":"build"}
-            ]
-
-    plot_data_4 = list()
-    for d in plots:
-        plot_data_4.append(arrange_data(results=data,
-                                  var="CostCapital",
-                                  #xscale=xscale,
-                                  filter_in={"TECHNOLOGY":d["fin"],
-                                             "YEAR":[2023,2025,2030,
-                                                     2035,2040,2045,2050]},
-                                  filter_out={"TECHNOLOGY":d["fout"]},
-                                  zgroupby=["RUN","REGION","TECHNOLOGY"],
-                                  cgroupby=d["gb"],
-                                  naming = naming))
-        
-    for d,p in zip(plot_data_4,plots):
-
-        # convert to per year
-        d["VALUE"] =  d["VALUE"]/(2054-2023)
-        d = d.reset_index()
-        d.loc[:,"REGION"] = d.loc[:,"REGION"].map(mapping)
-        
-        # save data
-        d.to_csv(dpath+f"plot_data_04_loc_{p['short']}.csv",index=False)  
-        
-        # convert to billions
-        d["VALUE"] =  d["VALUE"]/1000
-        g = d.groupby(["RUN","TECHNOLOGY"]).sum()
-        g.to_csv(dpath+f"plot_data_04_{p['short']}.csv") 
-
-
-
-
-    # Data analysis element 05 –  Net zero maps
-    
-    reduction_value = 0.0001
-    
-    em = data[0]["AnnualEmissions"].copy()
-    # divide by number of years in period to get average annual emissions
-    em["VALUE"] = em["VALUE"].multiply(xscale,axis=0)
-    
-    # normalize with respect to base year
-    plot_data_05 = em /em.xs(2015, level=3)
-    # process to get first year emission reduction is achieved
-    plot_data_05 = plot_data_05.loc[plot_data_05["VALUE"]<=reduction_value]
-    plot_data_05 = plot_data_05.reset_index("YEAR")
-    plot_data_05 = plot_data_05.drop("VALUE",axis=1)
-    plot_data_05 = plot_data_05.groupby(["RUN","REGION","EMISSION"]).min()
-    plot_data_05 = plot_data_05.rename(columns={"YEAR":"VALUE"})
-    
-    # save data
-    plot_data_05.to_csv(dpath+"plot_data_05.csv")
-
-
-    # Data analysis element 10 –  Emission pathways
-     
-    em = data[0]["AnnualEmissions"].copy()
-    # divide by number of years in period to get average annual emissions
-    em["VALUE"] = em["VALUE"].multiply(xscale,axis=0)
-    
-    plot_data_10 = em.xs("UK",level="REGION")
-    plot_data_10_loc = em.reset_index()
-    plot_data_10_loc.loc[:,"REGION"] = plot_data_10_loc.loc[:,"REGION"].map(mapping)
-    
-    # save data
-    plot_data_10.to_csv(dpath+"plot_data_10.csv")    
-    plot_data_10_loc.to_csv(dpath+"plot_data_10_loc.csv",index=False)
-    
-    # Data analysis element 07 –  Local heat generation
-    
-    plot_data_07 = arrange_data(results=data,
-                             var="TotalProductionByTechnologyAnnual",
-                             x = "YEAR",
-                             xscale=xscale,
-                             filter_in={"YEAR":[2015,2022,2023,2025,2030,
-                                                2035,2040,2045,2050,2055],
-                                        "TECHNOLOGY":["DD","DNDO"]},
-                             filter_out={"TECHNOLOGY":["RAUP","WDIS"]},
-                             zgroupby=["RUN","TECHNOLOGY","REGION"],
-                             cgroupby={"TECHNOLOGY":lambda x: x[0:4],
-                                       "REGION":lambda x: x[0:9]},
-                             naming=naming,
-                             #zorder=zo,
-                             )
-
-    # save data
-    plot_data_07.to_csv(dpath+"plot_data_07.csv")
-    
-    
-    
-    # Data analysis element 08 –  Local cost structure graph   
-    def groupby(x):
-        if ("WDIS" in x) or ("RAUP" in x):
-            n = "Building Heat Dist."
-        elif x.startswith("BE"):
-            n = "Building Heat Eff."
-        elif ("DD" in x) or ("DNDO" in x):
-            n = "Building Heat Gen."
-        elif x.startswith("DH") or ("SDIS" in x):
-            n = "DH systems"
-        elif ("TDIS" in x) or ("TTRA") in x:
-            n = "T&D (except DH)"
-        elif (("SNAT" in x) or ("SEXT" in x)) and ("BS" not in x[2:]):
-            n = "Supply"
-        else:
-            n = "Others"   
-        return n
-
-    plot_data_08 = arrange_data(results=data,
-                                var="CostTotalProcessed",
-                                x = ["YEAR"],
-                                xscale=xscale,
-                                filter_in={"YEAR":[2015,2022,2023,2025,2030,
-                                                2035,2040,2045,2050,2055]},
-                                zgroupby=["RUN","TECHNOLOGY","REGION"],
-                                cgroupby={"TECHNOLOGY":groupby,
-                                          "REGION":lambda x: x[0:9]},
-                                naming=naming,
-                                #zorder=zo,
-                                )
-    
-    # save data
-    plot_data_08.to_csv(dpath+"plot_data_08.csv")   
-    
-    
-    # Data analysis element 09 –  HP installations - domestic ASHP
-    
-    # to load from model data
-    # techcaps = pd.read_csv("PATHTODIR/heat_peak_dwelling.csv",index_col=("LSOA11CD",
-    #                                                            "TECHNOLOGY"))
-    # # FIXME: this could use the data for each property type and LA not just the
-    # # average (not possible when using this calculation elsewhere to set
-    # # deployment constraint)
-    # techcaps = techcaps.xs("AVERAGE")
-    # techcaps = techcaps.drop("PROPERTY_TYPE",axis=1)
-    # techcaps = techcaps.groupby("TECHNOLOGY").mean()
-    # techcaps = pd.to_csv("./data/dwelling_tech_caps.csv")
-    
-    
-    # to load from processed file
-    techcaps = pd.read_csv(dpath+"dwelling_tech_caps.csv",
-                           index_col=("TECHNOLOGY"))
-    
-    tech_agg = {"ASHP":"HP",
-                "GSHP": "HP"}
-    plot_data = arrange_data(results=data,
-                            var="NewCapacity",
-                            xscale=xscale,
-                            filter_in={"YEAR":[2015,2022,2023,2025,2030,
-                                            2035,2040,2045,2050,2055],
-                                       "TECHNOLOGY":["ASHPDD","GSHPDD"]},
-                            zgroupby=["RUN","REGION","TECHNOLOGY","YEAR"],
-                            cgroupby={"TECHNOLOGY":lambda x: x[0:4],
-                                      "REGION":lambda x: x[0:9]
-                                      },
-                            reagg=tech_agg,
-                            #naming=naming,
-                            #zorder=zo,
-                            )
-    plot_data_09l = plot_data/techcaps.loc["ASHP"].mean()
-    
-    replace = {2015:2015,
-               2022:2025,
-               2023:2025,
-               2025:2025,
-               2030:2035,
-               2035:2035,
-               2040:2045,
-               2045:2045,
-               2050:2055,
-               2055:2055}
-    # FIXME: implement weighted average
-    plot_data_09l = plot_data_09l.rename(index=replace)
-    plot_data_09l = plot_data_09l.groupby(["REGION","RUN",
-                                           "TECHNOLOGY","YEAR"]).mean()
-    plot_data_09l = plot_data_09l.reset_index()
-    plot_data_09l["REGION"] = plot_data_09l["REGION"].map(mapping)
-    # FIXME: this is a simplified calc, might need to improve
-    plot_data_09 = (plot_data.groupby(["RUN","TECHNOLOGY","YEAR"]).sum()
-                    /techcaps.loc["ASHP"].mean())
-    plot_data_09 = plot_data_09.rename(index=replace)
-    plot_data_09 = plot_data_09.groupby(["RUN",
-                                           "TECHNOLOGY","YEAR"]).mean()
-    #df = df.divide(techcaps["peakcap"],level="TECHNOLOGY")*10**6
-    
-    # save data
-    plot_data_09.to_csv(dpath+"plot_data_09.csv")   
-    plot_data_09l.to_csv(dpath+"plot_data_09l.csv",index=False) 
-    
-    
-    
-    # Data analysis element 11 –  Local heating cost
-
-
-    
-    # FIXME: delete if GDHI not used
-    # load economic data on household income
-    #snakemake.input.path_ec_gdhi
-    # path = "../raw_data/economic/GDHI/"
-    # files = sorted(os.listdir(path))
-    # files = [file for file in files if file.endswith(".xlsx")]
-    
-    # data = list()
-    
-    # for f in files:
-    #     df = pd.read_excel(path+f,sheet_name="Table 3",skiprows=1,index_col=(1))
-    #     data.append(df)
-    # gdhi = pd.concat(data)
-    # gdhi.index.name="REGION"
-    # gdhi = gdhi[gdhi["Region"]!="Northern Ireland"]
-    # gdhi = gdhi.iloc[:,2:]
-    # gdhi = utils.update_LADCD(gdhi,from_CD="LAD21CD",how="mean")
-    
-    props = ["FL","TE","DE","SD"]
-    for p in props:
-        
-        # calculate demand
-        # ecs = ["HWDDDE", "HWDDFL", "HWDDSD", "HWDDTE",
-        #        "SHDDDE", "SHDDFL", "SHDDSD", "SHDDTE"]
-        ecs = ["HWDD"+p,"SHDD"+p]
-        dem = (data[0]["SpecifiedAnnualDemand"]
-               *data[0]["SpecifiedDemandProfile"]).dropna()
-        dem = dem[dem.index.get_level_values("FUEL").str.startswith(tuple(ecs))]
-        dem = dem.reset_index().drop(["FUEL","TIMESLICE"],axis=1)
-        dem["REGION"] = dem["REGION"].str[:9]
-        dem = dem.groupby(["RUN","REGION","YEAR"]).sum()
-        
-        print(dem)
-        # get number of properties
-        pnum = pd.read_csv(dpath+'number_properties.csv',index_col=["REGION",
-                                                                     "PROPERTY_TYPE",
-                                                                     "YEAR"])
-        
-        ptd = {"TE":"Terraced",
-               "FL":"Flats",
-               "DE":"Detached",
-               "SD":"Semi-detached"}
-        pt = {ptd[ec[-2:]] for ec in ecs }
-        pnum = pnum[pnum.index.get_level_values("PROPERTY_TYPE").str.startswith(tuple(pt))]
-        pnum = pnum.groupby(["REGION","YEAR"]).sum()
-        pnum = pd.concat([pnum]*len(scenarios),
-                         keys=scenarios, names=['RUN'])
-    
-    
-        print(pnum)                                                          
-        cost = data[0]["DemandCost"].groupby(["RUN","REGION","FUEL","YEAR"]).sum()
-        cost = cost[cost.index.get_level_values("FUEL").str.startswith(tuple(ecs))]
-        cost = cost.reset_index().drop(["FUEL"],axis=1)
-        cost["REGION"] = cost["REGION"].str[:9]
-        cost = cost.groupby(["RUN","REGION","YEAR"]).sum()
-        print(cost)
-        # calculate cost per demand or property
-        data[0]["CostPerDomHeat"] = (cost/dem)
-        data[0]["CostPerDomHeat"] = data[0]["CostPerDomHeat"]* 10**6
-        
-        data[0]["CostPerDomProp"] = (cost/pnum) * 10**6
-        
-        agg = (cost.groupby(["RUN","YEAR"]).sum()
-               /pnum.groupby(["RUN","YEAR"]).sum()
-               * 10**6)
-        agg["REGION"] = "GB"
-        agg = agg.reset_index().set_index(["RUN","REGION","YEAR"])
-        data[0]["CostPerDomProp"] = pd.concat([data[0]["CostPerDomProp"],
-                                               agg])
-        agg = (cost.groupby(["RUN","YEAR"]).sum()
-               /dem.groupby(["RUN","YEAR"]).sum()
-               * 10**6)
-        agg["REGION"] = "GB"
-        agg = agg.reset_index().set_index(["RUN","REGION","YEAR"])
-        data[0]["CostPerDomHeat"] = pd.concat([data[0]["CostPerDomHeat"],
-                                               agg])
-        
-        print(data[0]["CostPerDomProp"])
-        data[0]["CostPerDomProp"].loc[:,"VALUE"] = data[0]["CostPerDomProp"].loc[:,"VALUE"].multiply(xscale,
-                                                                       axis=0)
-        # data[0]["CostPerDomHeat"].loc[:,"VALUE"] = data[0]["CostPerDomHeat"].loc[:,"VALUE"].multiply(xscale,
-        #                                                                axis=0)
-    
-        plot_data_11 = data[0]["CostPerDomProp"].loc[data[0]["CostPerDomProp"].index.get_level_values("YEAR")<2060].reset_index()
-        plot_data_12 = data[0]["CostPerDomHeat"].loc[data[0]["CostPerDomHeat"].index.get_level_values("YEAR")<2060].reset_index()
-        
-        # model.results[0]["CostPerDomPropGDHI"] = (model.results[0]["CostPerDomProp"]
-        #                                           .divide(gdhi["2021"],level=1,axis=0)
-        #                                           .dropna())
-        # model.results[0]["GDHI"] = model.results[0]["CostPerDomPropGDHI"].copy()
-        # model.results[0]["GDHI"].loc[:,"VALUE"] = 1
-        # model.results[0]["GDHI"] = (model.results[0]["GDHI"]
-        #                             .multiply(gdhi["2021"],level=1,axis=0))
-        
-        
-        
-        # save data
-        plot_data_11.to_csv(dpath+"plot_data_11_"+p+".csv", index=False)
-        plot_data_11.loc[:,"REGION"] = plot_data_11.loc[:,"REGION"].map(mapping)
-        plot_data_11.to_csv(dpath+"plot_data_11n_"+p+".csv", index=False)
-        
-        plot_data_12.to_csv(dpath+"plot_data_12_"+p+".csv", index=False)
-        plot_data_12.loc[:,"REGION"] = plot_data_12.loc[:,"REGION"].map(mapping)
-        plot_data_12.to_csv(dpath+"plot_data_12n_"+p+".csv", index=False) 
+    # the data analysis elements are stages of the pipeline (see pipeline.py),
+    # only stages whose inputs, config or code changed are run
+    from pipeline import main
+    main()
@@ -0,0 +1,143 @@
+"""
+Script to prerender figures for the predefined scenarios
+
+The figures (and figure layouts) shown for the predefined scenarios are
+created once and saved as serialized JSON in the figures directory. The
+dashboard serves them directly instead of creating them on request. The
+figures are keyed by the content of the plot data files, i.e., this script
+needs to be rerun after the preprocessing. Only selections of the
+predefined scenarios (content/sidebar.json, currently two) are covered;
+figures of other selections are created on request and kept in the figure
+cache of the app, which is also used for prerendered figures once they
+have been served.
+
+
+Copyright (C) 2024 Leonhard Hofbauer, Yueh-Chin Lin, licensed under a MIT license
+
+
+"""
+
+import sys
+import os
+import logging
+import itertools
+import shutil
+from pathlib import Path
+
+appdir = str(Path(__file__).parent.parent.resolve())
+sys.path.insert(0, appdir)
+
+import app
+from component import Sidebar, Tabs
+from component.FigureCache import FigureCache, DiskBackend
+
+
+logger = logging.getLogger(__name__)
+
+
+fpath = f'{appdir}/data/figures'
+
+def figure_options(id, lads):
+    """Return the options figure `id` is prerendered with.
+
+    Parameters
+    ----------
+    id : str
+        Id of the figure (see app.figures).
+    lads : list
+        Local authorities selected in the local view.
+
+    Returns
+    -------
+    list
+        List of tuples of options passed to the function creating the figure.
+
+    """
+
+    local = [f for (tab, subtab), ids in app.view_figures.items()
+             if tab == "tab-2" for f in ids]
+    if id in local:
+        return [(lads,)]
+    elif id == "heat_generation_map":
+        # other years only if the year is not changed in the browser
+        return [(year,) for year in (range(2025, 2056, 5)
+                                     if not app.clientside_year_slider
+                                     else [2050])]
+    elif id == "heat_generation_years":
+        return [()] if app.clientside_year_slider else []
+    elif id in ["hcost_maps", "hcost_path"]:
+        return [(prop["value"], ty["value"])
+                for prop in app.heatcost_options_prop
+                for ty in app.heatcost_options_type]
+    return [()]
+
+
+def prerender(path=fpath, max_scenarios=5):
+    """Prerender figures for all selections of predefined scenarios.
+
+    Selections are all ordered selections of up to max_scenarios of the
+    predefined scenarios, e.g., only 4 selections for two predefined
+    scenarios; selections including created scenarios are not covered.
+
+    Parameters
+    ----------
+    path : str, optional
+        Path of the directory the figures are saved to. Existing figures
+        in the directory are deleted. The default is fpath.
+    max_scenarios : int, optional
+        Maximum number of scenarios selected at once. The default is 5.
+
+    Returns
+    -------
+    int
+        Number of prerendered figures.
+
+    """
+
+    shutil.rmtree(path, ignore_errors=True)
+    cache = FigureCache(DiskBackend(path, max_bytes=None))
+
+    scen_naming = {s["value"]:s["label"] for s in Sidebar.predef_scenarios}
+    # default selection of local authorities in the local view
+    lads = [Tabs.local_auth_options[0]]
+
+    # all selections (in order of selection) of predefined scenarios
+    selections = [list(p) for n in range(1, max_scenarios+1)
+                  for p in itertools.permutations(scen_naming.keys(), n)]
+
+    jobs = list()
+    for scenarios in selections:
+        for id, create in app.figures.items():
+            for options in figure_options(id, lads):
+                jobs.append((app.figure_key(id, scenarios, scen_naming,
+                                            *options),
+                             create,
+                             (scenarios, scen_naming, *options)))
+        # values patched into the heating cost figures
+        for prop in app.heatcost_options_prop:
+            for ty in app.heatcost_options_type:
+                for view, create in [("hcost_maps_values", app.create_hcost_maps),
+                                     ("hcost_path_values", app.create_hcost_path)]:
+                    jobs.append((app.figure_key(view, scenarios, scen_naming,
+                                                prop["value"], ty["value"]),
+                                 create,
+                                 (prop["value"], ty["value"], scenarios,
+                                  scen_naming)))
+
+    n = 0
+    for key, create, args in jobs:
+        try:
+            cache.set(key, create(*args))
+            n = n + 1
+        except FileNotFoundError as e:
+            logger.warning("Figure not prerendered, data missing: {}".format(e))
+
+    logger.info("Prerendered {} of {} figures".format(n, len(jobs)))
+
+    return n
+
+
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.INFO)
+    prerender()
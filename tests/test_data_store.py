@@ -0,0 +1,74 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+
+from component.DataStore import DataStore, IndexedData
+from component.DtypePolicy import DtypePolicy
+from component.ScenarioCatalog import ScenarioCatalog
+
+runs = ["nz-2050_hp-00_dh-00_lp-00_h2-00_UK|LA|SO",
+        "nz-2045_hp-00_dh-00_lp-00_h2-00_UK|LA|SO",
+        "nz-2050_hp-01_dh-00_lp-00_h2-00_UK|LA|SO"]
+
+
+@pytest.fixture
+def df():
+    # rows in an order that differs from the sorted index
+    rng = np.random.default_rng(0)
+    idx = pd.MultiIndex.from_product(
+        [runs, ["E2", "E1", "E3"], ["Gas boiler", "Air-source HP"],
+         [2050, 2020, 2035]],
+        names=["RUN", "REGION", "TECHNOLOGY", "YEAR"])
+    df = idx.to_frame(index=False).sample(frac=1, random_state=0)
+    df["VALUE"] = rng.random(len(df))
+    policy = DtypePolicy(catalog=ScenarioCatalog(["other scenario"]))
+    return policy.apply(df.reset_index(drop=True))
+
+
+@pytest.mark.parametrize("criteria", [
+    dict(),
+    dict(RUN=runs[1]),
+    dict(RUN=[runs[2], runs[0]], REGION="E3"),
+    dict(REGION=["E1", "E2"], TECHNOLOGY="Gas boiler"),
+    dict(YEAR=slice(2020, 2035)),
+    dict(YEAR=slice(2035, None), RUN=runs[0]),
+    dict(RUN=runs[0], VALUE=slice(0.2, 0.8)),
+    dict(RUN=None, REGION="E2"),
+])
+def test_select_matches_masks(df, criteria):
+    selected = IndexedData(df).select(**criteria)
+    expected = DataStore.select(df, **criteria)
+    pd.testing.assert_frame_equal(selected, expected)
+
+
+def test_select_keeps_original_order(df):
+    selected = IndexedData(df).select(REGION=["E3", "E1"], YEAR=2050)
+    assert len(selected) == 12
+    assert list(selected.index) == sorted(selected.index)
+
+
+def test_select_slices_are_inclusive(df):
+    selected = IndexedData(df).select(YEAR=slice(2020, 2035))
+    assert sorted(selected["YEAR"].unique()) == [2020, 2035]
+    selected = IndexedData(df).select(YEAR=slice(None, 2020))
+    assert list(selected["YEAR"].unique()) == [2020]
+
+
+@pytest.mark.parametrize("criteria", [
+    dict(RUN="unknown scenario"),
+    # in the categories of RUN but not in the dataset
+    dict(RUN="other scenario"),
+    dict(REGION=["E9"], TECHNOLOGY="Gas boiler"),
+    dict(YEAR=slice(2051, None)),
+])
+def test_select_unknown_labels(df, criteria):
+    selected = IndexedData(df).select(**criteria)
+    assert selected.empty
+    assert list(selected.columns) == list(df.columns)
+    # labels are decoded
+    assert not any(isinstance(t, pd.CategoricalDtype) for t in selected.dtypes)
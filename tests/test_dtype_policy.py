@@ -0,0 +1,86 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+
+from component.DtypePolicy import DtypePolicy
+from component.ScenarioCatalog import ScenarioCatalog
+
+
+@pytest.fixture
+def df():
+    n = 1000
+    return pd.DataFrame({"RUN": np.repeat(["nz-2050_hp-00_dh-00_lp-00_h2-00_UK|LA|SO",
+                                           "nz-2045_hp-00_dh-00_lp-00_h2-00_UK|LA|SO"], n//2),
+                         "REGION": np.tile(["E06000001", "E06000002"], n//2),
+                         "YEAR": np.arange(n) % 40 + 2015,
+                         "VALUE": np.linspace(0, 1, n)})
+
+
+@pytest.mark.parametrize("float32,value", [(False, "float64"),
+                                           (True, "float32")])
+def test_apply_dtypes(df, float32, value):
+    out = DtypePolicy(float32=float32).apply(df)
+    assert isinstance(out["RUN"].dtype, pd.CategoricalDtype)
+    assert isinstance(out["REGION"].dtype, pd.CategoricalDtype)
+    assert out["YEAR"].dtype == np.dtype("int16")
+    assert out["VALUE"].dtype == np.dtype(value)
+    # values are kept
+    assert (out["RUN"].astype(str) == df["RUN"]).all()
+    assert (out["YEAR"] == df["YEAR"]).all()
+    assert np.allclose(out["VALUE"], df["VALUE"])
+    # the frame is not modified in place
+    assert df["REGION"].dtype != out["REGION"].dtype
+
+
+def test_apply_keeps_years_out_of_int16_range(df):
+    df["YEAR"] = df["YEAR"] + 40000
+    assert DtypePolicy().apply(df)["YEAR"].dtype == df["YEAR"].dtype
+
+
+def test_apply_returns_frame_if_unchanged(df):
+    out = DtypePolicy().apply(df)
+    assert DtypePolicy().apply(out) is out
+
+
+def test_apply_multiindex_year_level(df):
+    indexed = df.set_index(["RUN", "REGION", "YEAR"])
+    out = DtypePolicy(float32=True).apply(indexed)
+    assert out.index.levels[2].dtype == np.dtype("int16")
+    assert out.index.names == indexed.index.names
+    assert (out.index.get_level_values("YEAR") ==
+            indexed.index.get_level_values("YEAR")).all()
+    assert out["VALUE"].dtype == np.dtype("float32")
+
+
+def test_apply_encodes_runs_with_catalog(df):
+    catalog = ScenarioCatalog(["nz-2045_hp-00_dh-00_lp-00_h2-00_UK|LA|SO"])
+    out = DtypePolicy(catalog=catalog).apply(df)
+    assert out["RUN"].dtype == catalog.dtype()
+    assert (out["RUN"].cat.codes == df["RUN"].map(catalog.id)).all()
+
+
+def test_report(df):
+    out = DtypePolicy(float32=True).apply(df)
+    report = DtypePolicy.report({"raw": df, "lean": out})
+    for r in report.values():
+        assert r["saved"] == r["default"] - r["bytes"]
+    assert report["raw"]["bytes"] == DtypePolicy.nbytes(df)
+    assert report["lean"]["bytes"] == DtypePolicy.nbytes(out)
+    assert report["lean"]["bytes"] < report["raw"]["bytes"]
+    assert report["lean"]["saved"] > 0
+    # the default size (labels as object columns of strings) is estimated
+    # without converting the frame back
+    raw = df.astype({"RUN": object, "REGION": object})
+    assert report["lean"]["default"] == pytest.approx(
+        DtypePolicy.default_nbytes(raw), rel=0.1)
+
+    text = DtypePolicy.format_report(report).splitlines()
+    assert text[0].split() == ["dataset", "default", "MB", "MB", "saved"]
+    # datasets sorted by the bytes saved, followed by the total
+    assert [l.split()[0] for l in text[1:]] == ["lean", "raw", "total"]
+    assert text[-1].endswith("%")
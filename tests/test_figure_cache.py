@@ -0,0 +1,84 @@
+import sys
+from pathlib import Path
+
+import plotly.graph_objects as go
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+
+from component.FigureCache import (FigureCache, MemoryBackend, DiskBackend,
+                                   nbytes)
+
+
+def figure(n):
+    return go.Figure(go.Scatter(x=list(range(n)), y=[0.5*i for i in range(n)]))
+
+
+@pytest.fixture(params=["memory", "disk"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return MemoryBackend()
+    return DiskBackend(str(tmp_path / "figures"))
+
+
+def test_key_is_stable():
+    key = FigureCache.key("view", ["b", "a"], {"x": 1, "y": [2, 3]})
+    assert key == FigureCache.key("view", ["b", "a"], {"y": [2, 3], "x": 1})
+    assert key != FigureCache.key("view", ["a", "b"], {"x": 1, "y": [2, 3]})
+
+
+def test_set_returns_cached_value(backend):
+    cache = FigureCache(backend)
+    key = FigureCache.key("figure", 1)
+    assert cache.get(key) is None
+
+    value = cache.set(key, figure(10))
+    assert isinstance(value, dict)
+    assert value["data"][0]["y"][:3] == [0.0, 0.5, 1.0]
+    assert cache.get(key) == value
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_memory_backend_eviction_respects_max_bytes():
+    size = nbytes(FigureCache(MemoryBackend()).set("k", figure(100)))
+    backend = MemoryBackend(max_bytes=int(2.5*size))
+    cache = FigureCache(backend)
+    for i in range(4):
+        cache.set(f"k{i}", figure(100))
+        assert backend.size() <= backend.max_bytes
+
+    # least recently used values are evicted first
+    assert cache.get("k0") is None and cache.get("k1") is None
+    assert cache.get("k2") is not None and cache.get("k3") is not None
+
+
+def test_memory_backend_sized_by_memory():
+    backend = MemoryBackend()
+    cache = FigureCache(backend)
+    cache.set("k", figure(1000))
+    # parsed values use more memory than their JSON
+    assert backend.size() == nbytes(backend.get("k"))
+    assert backend.size() > len(str(backend.get("k")))
+
+
+def test_disk_backend_eviction_respects_max_bytes(tmp_path):
+    backend = DiskBackend(str(tmp_path), max_bytes=None)
+    cache = FigureCache(backend)
+    cache.set("k0", figure(100))
+    size = backend.size()
+
+    backend.max_bytes = int(2.5*size)
+    for i in range(1, 4):
+        cache.set(f"k{i}", figure(100))
+        assert backend.size() <= backend.max_bytes
+    assert cache.get("k3") is not None
+
+
+def test_add_value_of_other_cache(backend, tmp_path):
+    prerendered = FigureCache(DiskBackend(str(tmp_path / "prerendered")))
+    value = prerendered.set("k", figure(10))
+
+    cache = FigureCache(backend)
+    cache.add("k", prerendered.get("k"))
+    assert cache.get("k") == value
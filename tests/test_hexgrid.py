@@ -0,0 +1,63 @@
+import json
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+appdir = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(appdir))
+
+from component.Hexgrid import Hexgrid
+
+
+def test_rings_of_all_features_are_closed():
+    with open(appdir / "data" / "uk-local-authority-districts-2023.hexjson") as f:
+        hexjson = json.load(f)
+    geojson = Hexgrid.geojson(hexjson, "LAD23CD")
+
+    assert len(geojson["features"]) == len(hexjson["hexes"])
+    for feature in geojson["features"]:
+        ring = feature["geometry"]["coordinates"][0]
+        assert len(ring) == 7
+        assert ring[0] == ring[-1]
+
+
+@pytest.mark.parametrize("layout", Hexgrid.layouts)
+def test_neighbouring_cells_share_an_edge(layout):
+    # centres of neighbouring cells have a distance of 1
+    if layout.endswith("-r"):
+        q, r = [0, 1, 0], [0, 0, 1]
+    else:
+        q, r = [0, 0, 1], [0, 1, 0]
+    rings = Hexgrid.vertices(q, r, layout)
+    centres = rings[:, :6].mean(axis=1)
+
+    assert rings.shape == (3, 7, 2)
+    assert np.allclose(np.linalg.norm(centres[1:] - centres[0], axis=1), 1)
+    # neighbours share two vertices
+    for other in rings[1:]:
+        shared = (np.linalg.norm(rings[0][:6, None] - other[None, :6],
+                                 axis=-1) < 1e-9).sum()
+        assert shared == 2
+
+
+def test_odd_and_even_layouts_shift_other_rows():
+    odd = Hexgrid.vertices([0, 0], [0, 1], "odd-r")[:, :6].mean(axis=1)
+    even = Hexgrid.vertices([0, 0], [0, 1], "even-r")[:, :6].mean(axis=1)
+    assert np.isclose(odd[1, 0] - odd[0, 0], 0.5)
+    assert np.isclose(even[1, 0] - even[0, 0], -0.5)
+
+
+def test_unknown_layout():
+    with pytest.raises(ValueError):
+        Hexgrid.vertices([0], [0], "odd-x")
+
+
+def test_frame_columns():
+    hexjson = {"layout": "odd-r",
+               "hexes": {"E1": {"n": "One", "q": 0, "r": 0},
+                         "E2": {"n": "Two", "q": 1, "r": 0}}}
+    df = Hexgrid.frame(hexjson, "LAD23CD")
+    assert list(df.columns) == ["LAD23CD", "LAD23NM", "q", "r"]
+    assert list(df["LAD23NM"]) == ["One", "Two"]
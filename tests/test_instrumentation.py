@@ -0,0 +1,95 @@
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+
+from component.Instrumentation import CallbackMetrics, _Histogram, stage
+
+
+def samples(text):
+    # samples of the Prometheus text format as dict
+    return {l.rsplit(" ", 1)[0]: float(l.rsplit(" ", 1)[1])
+            for l in text.splitlines() if l and not l.startswith("#")}
+
+
+def test_histogram_buckets_are_cumulative():
+    h = _Histogram((1, 2, 4))
+    for v in (0.5, 1, 1.5, 3, 10):
+        h.observe(v)
+    out = list(h.samples("x", {"callback": "c"}))
+    assert [(s[1]["le"], s[2]) for s in out[:4]] == [("1", 2), ("2", 3),
+                                                     ("4", 4), ("+Inf", 5)]
+    assert out[4] == ("x_sum", {"callback": "c"}, 16.0)
+    assert out[5] == ("x_count", {"callback": "c"}, 5)
+
+
+def test_finish_records_stages():
+    metrics = CallbackMetrics()
+    metrics.start("fig.figure")
+    with stage("filter"):
+        with stage("load"):
+            time.sleep(0.05)
+        time.sleep(0.01)
+    entry = metrics.finish(200, 2048)
+
+    assert entry["callback"] == "fig.figure"
+    assert entry["status"] == 200
+    assert entry["payload_bytes"] == 2048
+    stages = entry["stages_ms"]
+    assert set(stages) == {"filter", "load", "other"}
+    # time of nested stages is only counted once
+    assert stages["load"] >= 50
+    assert 10 <= stages["filter"] < stages["load"]
+    assert sum(stages.values()) == pytest.approx(entry["duration_ms"], abs=0.01)
+    # no open record afterwards
+    assert metrics.finish(200, 0) is None
+
+
+def test_stage_outside_of_request():
+    with stage("load"):
+        pass
+    assert CallbackMetrics().finish(200, 0) is None
+
+
+def test_timed_records_serialize():
+    metrics = CallbackMetrics()
+    callback = metrics.timed(lambda: "value")
+    metrics.start("fig.figure")
+    assert callback() == "value"
+    time.sleep(0.01)
+    assert metrics.finish(200, 10)["stages_ms"]["serialize"] >= 10
+
+
+def test_prometheus_output():
+    metrics = CallbackMetrics()
+    for status, payload in ((200, 3000), (200, 5000), (500, None)):
+        metrics.start('fig.figure"1"')
+        metrics.finish(status, payload)
+    metrics.collector(lambda: [("cache_hits_total", "counter", "Hits.",
+                                [({}, 3)])])
+    text = metrics.prometheus()
+    values = samples(text)
+
+    assert "# TYPE dash_callback_duration_seconds histogram" in text
+    assert "# TYPE dash_callback_requests_total counter" in text
+    label = 'callback="fig.figure\\"1\\""'
+    assert values[f'dash_callback_requests_total{{{label},status="200"}}'] == 2
+    assert values[f'dash_callback_requests_total{{{label},status="500"}}'] == 1
+    assert values[f'dash_callback_duration_seconds_count{{{label}}}'] == 3
+    assert values[f'dash_callback_duration_seconds_bucket{{{label},le="+Inf"}}'] == 3
+    # failed requests have no payload
+    assert values[f'dash_callback_payload_bytes_count{{{label}}}'] == 2
+    assert values[f'dash_callback_payload_bytes_sum{{{label}}}'] == 8000
+    assert values[f'dash_callback_payload_bytes_bucket{{{label},le="4096"}}'] == 1
+    assert values[f'dash_callback_payload_bytes_bucket{{{label},le="16384"}}'] == 2
+    assert values[f'dash_callback_stage_count_total{{{label},stage="other"}}'] == 3
+    assert values["cache_hits_total"] == 3
+    assert text.endswith("\n")
+
+
+def test_unknown_profiler():
+    with pytest.raises(ValueError):
+        CallbackMetrics(profile="perf")
@@ -0,0 +1,66 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+appdir = Path(__file__).parent.parent.resolve()
+sys.path.insert(0, str(appdir))
+
+source = (appdir / "data" / "pipeline.py").read_text()
+
+inputs = ["naming.csv",
+          "Local_Authority_District_to_Country_(April_2023)_Lookup_in_the_United_Kingdom.csv",
+          "dwelling_tech_caps.csv",
+          "number_properties.csv"]
+
+
+def load_module(name, source, path):
+    # import a (modified) copy of the pipeline module
+    file = path / f"{name}.py"
+    file.write_text(source)
+    spec = importlib.util.spec_from_file_location(name, file)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        del sys.modules[name]
+    return module
+
+
+@pytest.fixture
+def stage_keys(tmp_path):
+    # keys of all stages of the pipeline built by a copy of the module
+    dpath = tmp_path / "data"
+    (dpath / "results").mkdir(parents=True)
+    for f in inputs:
+        (dpath / f).write_text("x\n")
+
+    def keys(name, source):
+        module = load_module(name, source, tmp_path)
+        p = module.build(f"{dpath}/results/", f"{dpath}/",
+                         str(tmp_path / "cache"))
+        return {n: p.key(n) for n in p.stages}
+    return keys
+
+
+@pytest.mark.parametrize("old,new,changed", [
+    # code of an element
+    ("    # Net zero maps\n", "    # Net zero maps (edited)\n", {"05"}),
+    # config of an element
+    ("reduction_value=0.0001", "reduction_value=0.001", {"05"}),
+    # helper of this module used by an element
+    ("    values = index.get_level_values(level)\n",
+     "    values = index.get_level_values(level)\n    values = values.copy()\n",
+     {"11"}),
+])
+def test_edit_only_changes_key_of_dependent_stage(stage_keys, old, new,
+                                                  changed):
+    assert old in source
+    original = stage_keys("pipeline_original", source)
+    edited = stage_keys("pipeline_edited", source.replace(old, new))
+
+    assert {n for n in original if original[n] != edited[n]} == changed
+    # the loaded results and the other elements stay cached
+    assert original["results"] == edited["results"]
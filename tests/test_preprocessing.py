@@ -0,0 +1,60 @@
+import json
+import sys
+import zipfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+
+from data.preprocessing import load_data
+
+
+def write_run(path, name):
+    # results zip of a run with one variable, rows are only unique for
+    # the full primary key (REGION, TECHNOLOGY, FUEL, YEAR)
+    rows = [(r, t, f, y, 1.0)
+            for r in ["R1", "R2"] for t in ["T1", "T2"]
+            for f in ["F1", "F2", "F3"] for y in [2020, 2030]]
+    df = pd.DataFrame(rows, columns=["REGION", "TECHNOLOGY", "FUEL",
+                                     "YEAR", "VALUE"])
+    pack = {"name": name,
+            "resources": [{"title": "Production",
+                           "path": "data/Production.csv",
+                           "schema": {"primaryKey": ["REGION", "TECHNOLOGY",
+                                                     "FUEL", "YEAR"]}}]}
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("datapackage.json", json.dumps(pack))
+        zf.writestr("data/Production.csv", df.to_csv(index=False))
+    return str(path)
+
+
+def test_load_data_single_file_usecols_unique_index(tmp_path):
+    file = write_run(tmp_path / "run1.zip", "run1")
+    usecols = {"Production": ["REGION", "TECHNOLOGY", "YEAR", "VALUE"]}
+
+    single = load_data([file], jobs=1, usecols=usecols)[0]["Production"]
+    assert single.index.names == ["REGION", "TECHNOLOGY", "YEAR"]
+    assert single.index.is_unique
+    assert len(single) == 8
+    assert np.allclose(single["VALUE"], 3.0)
+
+    # same shape as the aggregate of several files
+    other = write_run(tmp_path / "run2.zip", "run2")
+    several = load_data([file, other], jobs=1,
+                        usecols=usecols)[0]["Production"]
+    assert several.index.is_unique
+    assert single.index.sort_values().equals(several.index.sort_values())
+
+
+def test_load_data_single_file_filter_column_dropped(tmp_path):
+    file = write_run(tmp_path / "run1.zip", "run1")
+    usecols = {"Production": ["REGION", "YEAR", "VALUE"]}
+    filters = {"Production": {"FUEL": ["F1", "F2"]}}
+
+    df = load_data([file], jobs=1, usecols=usecols,
+                   filters=filters)[0]["Production"]
+    assert df.index.names == ["REGION", "YEAR"]
+    assert df.index.is_unique
+    assert np.allclose(df["VALUE"], 4.0)
@@ -0,0 +1,82 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.resolve()))
+
+from component.ScenarioCatalog import ScenarioCatalog
+
+names = [ScenarioCatalog.name(v) for v in [(2050, 0, 0, 0, 0),
+                                           (2045, 0, 0, 0, 0),
+                                           (2050, 1, 0, 0, 0),
+                                           (2050, 1, 2, 0, 0),
+                                           (2040, 2, 0, 1, 0)]]
+
+
+@pytest.fixture
+def catalog():
+    return ScenarioCatalog(names)
+
+
+def test_parse_and_name_round_trip():
+    name = "nz-2045_hp-01_dh-00_lp-02_h2-00_UK|LA|SO"
+    values = ScenarioCatalog.parse(name)
+    assert values == (2045, 1, 0, 2, 0)
+    assert ScenarioCatalog.name(values) == name
+    assert ScenarioCatalog.name(dict(zip(ScenarioCatalog.levers, values))) == name
+    assert ScenarioCatalog.parse("baseline") is None
+    assert ScenarioCatalog.parse("nz-2045_hp-01_UK|LA|SO") is None
+
+
+def test_add_and_lookup(catalog):
+    assert len(catalog) == len(names)
+    assert [catalog.id(n) for n in names] == list(range(len(names)))
+    # adding a scenario again keeps its id
+    assert catalog.add(names[2]) == 2
+    assert catalog.add("baseline") == len(names)
+    assert "baseline" in catalog and catalog.lever_values("baseline") is None
+    assert catalog.id("unknown") is None
+
+    assert catalog.lookup((2050, 1, 2, 0, 0)) == 3
+    assert catalog.lookup(dict(nz=2045, hp=0, dh=0, lp=0, h2=0)) == 1
+    assert catalog.lookup((2035, 0, 0, 0, 0)) is None
+    assert catalog.lever_values(names[4]) == (2040, 2, 0, 1, 0)
+
+
+def test_find(catalog):
+    catalog.add("baseline")
+    assert catalog.find(nz=2050) == [names[0], names[2], names[3]]
+    assert catalog.find(nz=2050, hp=[1, 2]) == [names[2], names[3]]
+    assert catalog.find(nz=[2040, 2045], dh=None) == [names[1], names[4]]
+    assert catalog.find(hp=3) == []
+    # all scenarios with lever values
+    assert catalog.find() == names
+
+
+def test_encode_keeps_ids(catalog):
+    values = [names[3], names[0], "new", names[3]]
+    encoded = catalog.encode(values)
+    assert encoded.dtype == catalog.dtype()
+    assert list(encoded.cat.codes) == [3, 0, len(names), 3]
+    # decoded labels are the original names
+    assert list(encoded.astype(str)) == values
+    # later datasets share the dtype and ids
+    other = catalog.encode(pd.Series([names[1], "new"], index=[5, 7], name="RUN"))
+    assert list(other.cat.codes) == [1, len(names)]
+    assert list(other.index) == [5, 7] and other.name == "RUN"
+    assert other.dtype == encoded.dtype
+
+
+def test_encode_missing_and_categorical_values(catalog):
+    values = pd.Series([names[4], np.nan, names[1]], dtype="category")
+    encoded = catalog.encode(values)
+    assert list(encoded.cat.codes) == [4, -1, 1]
+    assert encoded.isna().tolist() == [False, True, False]
+    assert list(encoded.dropna().astype(str)) == [names[4], names[1]]
+    # unused categories of the input are added to the catalog
+    values = values.cat.add_categories(["unused"])
+    catalog.encode(values)
+    assert "unused" in catalog